@@ -0,0 +1,90 @@
+import time
+import threading
+import config
+
+
+class AccountState:
+    """
+    Saldos da conta em memória, compartilhados por compra, venda e equity.
+    - refresh(): um /api/v3/account (peso 20) por ciclo
+    - apply_fill(): ajusta localmente a partir da resposta da ordem (executedQty, cummulativeQuoteQty, fills)
+    - apply_balance(): ponto de entrada para o user-data stream (outboundAccountPosition)
+    Se o estado ficar velho demais (ACCOUNT_MAX_AGE) ou for invalidado, a próxima leitura recarrega.
+    """
+    def __init__(self, api_client, max_age=None):
+        self.api = api_client
+        self.max_age = max_age if max_age is not None else config.ACCOUNT_MAX_AGE
+        self.balances = {}  # asset -> {'free': float, 'locked': float}
+        self.fetched_at = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self.fetched_at > 0
+
+    def refresh(self):
+        """Recarrega os saldos da Binance. Mantém o estado anterior se a API falhar."""
+        acc = self.api.get_account()
+        if not acc: return False
+        balances = {
+            b['asset']: {'free': float(b['free']), 'locked': float(b['locked'])}
+            for b in acc['balances'] if float(b['free']) or float(b['locked'])
+        }
+        with self._lock:
+            self.balances = balances
+            self.fetched_at = time.time()
+        return True
+
+    def invalidate(self):
+        """Força a próxima leitura a buscar na Binance (ex: ordem recusada por saldo)"""
+        with self._lock:
+            self.fetched_at = 0.0
+
+    def _ensure(self):
+        if not self.loaded or time.time() - self.fetched_at > self.max_age:
+            self.refresh()
+
+    # --- Leitura ---
+    def free(self, asset):
+        self._ensure()
+        with self._lock:
+            return self.balances.get(asset, {}).get('free', 0.0)
+
+    def total(self, asset):
+        self._ensure()
+        with self._lock:
+            b = self.balances.get(asset)
+            return b['free'] + b['locked'] if b else 0.0
+
+    # --- Atualização local ---
+    def apply_fill(self, symbol, side, order):
+        """
+        Aplica o resultado de uma ordem a mercado executada (resposta FULL do /api/v3/order).
+        Retorna (qty base executada, USDT movimentado) ou None se a resposta não trouxer a execução.
+        """
+        if not order or 'executedQty' not in order or 'cummulativeQuoteQty' not in order:
+            self.invalidate()  # Sem os números da execução: melhor reler a conta
+            return None
+
+        base = symbol[:-len(config.SYMBOL_QUOTE)]
+        quote = config.SYMBOL_QUOTE
+        qty = float(order['executedQty'])
+        quote_qty = float(order['cummulativeQuoteQty'])
+        sign = 1 if side == 'BUY' else -1
+
+        with self._lock:
+            self._add(base, sign * qty)
+            self._add(quote, -sign * quote_qty)
+            # Comissão sai do ativo informado em cada fill (base, USDT ou BNB)
+            for fill in order.get('fills', []):
+                self._add(fill['commissionAsset'], -float(fill['commission']))
+        return qty, quote_qty
+
+    def apply_balance(self, asset, free, locked=0.0):
+        """Saldo absoluto vindo de fora (user-data stream)"""
+        with self._lock:
+            self.balances[asset] = {'free': float(free), 'locked': float(locked)}
+
+    def _add(self, asset, delta):
+        b = self.balances.setdefault(asset, {'free': 0.0, 'locked': 0.0})
+        b['free'] = max(b['free'] + delta, 0.0)
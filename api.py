@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from storage import PortfolioManager
@@ -24,12 +24,30 @@ app.add_middleware(
 
 from trade_executor import TradeExecutor
 from telegram_notifier import TelegramNotifier
+from exchange_info import SymbolFilters
+from market_store import MarketStore
+from metrics import metrics, load_snapshot, render_prometheus
+from fastapi.responses import PlainTextResponse, StreamingResponse, JSONResponse, Response
+from downsample import downsample, METHODS
+from rate_limiter import PRIORITY_EXIT
+from price_snapshot import PriceSnapshot
+from event_stream import EventHub, RESYNC, sse
+import asyncio
 
 # Services
 db = PortfolioManager()
 api = BinanceClient()
 notifier = TelegramNotifier(config.TELEGRAM_BOT_TOKEN, config.TELEGRAM_CHAT_ID)
-executor = TradeExecutor(api, db, notifier)
+filters = SymbolFilters(api)
+filters.load() # Reaproveita o cache em disco gravado pelo bot
+executor = TradeExecutor(api, db, notifier, filters=filters)
+market = MarketStore() # Somente leitura (quem grava é o bot)
+
+# Preços compartilhados por todos os dashboards abertos: uma busca por vez (single-flight),
+# mantida quente em background; cada request só lê o snapshot em memória
+prices = PriceSnapshot(api, max_age=config.API_PRICE_MAX_AGE)
+if config.API_PRICE_REFRESH:
+    prices.start_background_refresh(config.API_PRICE_REFRESH)
 
 # Models
 class Position(BaseModel):
@@ -57,74 +75,171 @@ def get_summary():
 @app.get("/api/positions")
 def get_positions():
     """Returns active positions with live PnL estimation."""
-    data_raw = db.data['active_positions']
-    result = []
+    # Snapshot compartilhado (não baixa o ticker/24hr a cada request)
+    return [_position_view(symbol, data) for symbol, data in list(db.data['active_positions'].items())]
+
+def _position_view(symbol, data):
+    """Posição crua + preço atual e PnL estimado (mesmo formato no /api/positions e no /api/stream)"""
+    # Se faltar o símbolo no snapshot (ex: erro de sync), cai para o get_price individual
+    current_price = prices.get(symbol)
+
+    pnl_est = 0.0
+    pnl_usdt = 0.0
     
-    # OTIMIZAÇÃO: Busca todos os preços de uma vez (Evita N+1 requests)
-    # Se tiver muitas posições, isso é MUITO mais rápido.
-    tickers = api.get_ticker_24hr()
-    price_map = {}
-    if tickers:
-        for t in tickers:
-            price_map[t['symbol']] = float(t['lastPrice'])
-
-    for symbol, data in data_raw.items():
-        # Tenta pegar do map, se não tiver (ex: erro de sync), tenta individual (fallback)
-        current_price = price_map.get(symbol)
-        if not current_price:
-            current_price = api.get_price(symbol)
-            
-        pnl_est = 0.0
-        pnl_usdt = 0.0
+    if current_price and data['buy_price'] > 0:
+        pnl_est = ((current_price - data['buy_price']) / data['buy_price']) * 100
         
-        if current_price and data['buy_price'] > 0:
-            pnl_est = ((current_price - data['buy_price']) / data['buy_price']) * 100
-            
-            # Calcula PnL em USDT
-            # Quantidade de moedas = Investido / Preço de Compra
-            coin_qty = data['amount_usdt'] / data['buy_price']
-            current_value = coin_qty * current_price
-            pnl_usdt = current_value - data['amount_usdt']
-
-        pos = {
-            "symbol": symbol,
-            "buy_price": data['buy_price'],
-            "highest_price": data['highest_price'],
-            "amount_usdt": data['amount_usdt'],
-            "entry_time": data.get('entry_time', ''),
-            "rsi_entry": data.get('rsi_entry', 0.0),
-            "current_price": current_price,
-            "pnl_est_percent": round(pnl_est, 2),
-            "pnl_usdt": round(pnl_usdt, 2), # NOVO
-            "stop_price": data.get('stop_price', 0.0),
-            "status_label": data.get('status_label', 'HOLD')
-        }
-        result.append(pos)
-        
-    return result
+        # Calcula PnL em USDT
+        # Quantidade de moedas: exata dos fills (base_qty); sem ela, Investido / Preço de Compra
+        coin_qty = data.get('base_qty') or data['amount_usdt'] / data['buy_price']
+        current_value = coin_qty * current_price
+        pnl_usdt = current_value - data['amount_usdt']
+
+    return {
+        "symbol": symbol,
+        "buy_price": data['buy_price'],
+        "highest_price": data['highest_price'],
+        "amount_usdt": data['amount_usdt'],
+        "base_qty": data.get('base_qty', 0.0),
+        "entry_time": data.get('entry_time', ''),
+        "rsi_entry": data.get('rsi_entry', 0.0),
+        "current_price": current_price,
+        "pnl_est_percent": round(pnl_est, 2),
+        "pnl_usdt": round(pnl_usdt, 2), # NOVO
+        "stop_price": data.get('stop_price', 0.0),
+        "status_label": data.get('status_label', 'HOLD')
+    }
+
+# Tailer único do outbox de eventos para todos os clientes do /api/stream
+hub = EventHub(db, _position_view)
 
 @app.get("/api/logs")
 def get_logs(limit: int = 50):
     """Returns system logs."""
-    conn = db._get_conn()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM system_logs ORDER BY id DESC LIMIT ?", (limit,))
-    logs = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return logs
+    with db.pool.reader() as conn:
+        cursor = conn.execute("SELECT * FROM system_logs ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(row) for row in cursor.fetchall()]
 
 @app.get("/api/candidates")
-def get_candidates():
-    """Returns the current watchlist candidates."""
-    return db.get_candidates()
+def get_candidates(generation: Optional[int] = None):
+    """Returns the current watchlist candidates (or those of a past scan generation)."""
+    return db.get_candidates(generation)
+
+@app.get("/api/candidates/generations")
+def get_candidate_generations():
+    """Lists the scan generations kept for diffing (newest first)."""
+    return db.get_candidate_generations()
+
+@app.get("/api/candidates/diff")
+def get_candidates_diff(from_generation: Optional[int] = None, to_generation: Optional[int] = None):
+    """Diff between two scans (default: previous vs active)."""
+    kept = db.get_candidate_generations()
+    generations = [g['generation'] for g in kept]
+    if to_generation is None:
+        to_generation = next((g['generation'] for g in kept if g['active']), None)
+    if from_generation is None:
+        from_generation = next((g for g in generations if to_generation is not None and g < to_generation), None)
+    if from_generation not in generations or to_generation not in generations:
+        raise HTTPException(status_code=404, detail="Generation not available")
+    return db.diff_candidates(from_generation, to_generation)
+
+@app.get("/api/trades")
+def get_trades(symbol: Optional[str] = None, strategy: Optional[str] = None, before: Optional[str] = None,
+               before_id: Optional[int] = None, limit: int = 50):
+    """Closed trades, newest first. Paging cursor: before = closed_at and before_id = id of the last item received."""
+    return db.get_trades(symbol.upper() if symbol else None, strategy.upper() if strategy else None,
+                         before, before_id, min(limit, 500))
+
+@app.get("/api/stats")
+def get_stats(days: int = 30):
+    """Win rate, PnL and hold time overall/per strategy + daily series, served from the rollups."""
+    return db.get_trade_stats(min(days, 366))
 
 @app.get("/api/history")
-def get_history():
-    """Returns balance history for charting."""
-    data = db.data['balance_history']
-    # Limit to last 100 points for performance if needed, but for now return all
-    return data
+def get_history(request: Request, since_id: Optional[int] = None, after_ts: Optional[str] = None,
+                points: Optional[int] = None, method: str = 'lttb', limit: Optional[int] = None):
+    """
+    Returns balance history for charting.
+    since_id/after_ts: only newer points (incremental chart updates)
+    limit: only the N most recent points of the filter
+    points: server-side downsampling target (lttb or minmax); default HISTORY_CHART_POINTS for full loads.
+    The table is pre-bucketed in SQL (min/max per id range), so at most ~2x points rows are read into Python.
+    ETag/304 when the table hasn't changed since the client's copy.
+    """
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {sorted(METHODS)}")
+    incremental = since_id is not None or after_ts is not None
+    if points is None and not incremental:
+        points = config.HISTORY_CHART_POINTS
+
+    first_id, last_id = db.history_version()
+    etag = f'W/"{first_id}-{last_id}-{since_id}-{after_ts}-{limit}-{points}-{method}"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    rows = db.get_history_page(since_id=since_id, after_ts=after_ts, limit=limit, buckets=points)
+    return JSONResponse(downsample(rows, points, method), headers={"ETag": etag})
+
+@app.get("/api/market/{symbol}")
+def get_market(symbol: str, interval: str = '1h', start: Optional[int] = None, end: Optional[int] = None, limit: int = 500):
+    """Returns stored klines from the local market store (no trading DB, no Binance call)."""
+    rows = market.klines(symbol.upper(), interval, start, end)[-limit:]
+    return [
+        {"open_time": t, "close": c, "volume": v}
+        for t, c, v in zip(rows['open_time'].tolist(), rows['close'].tolist(), rows['volume'].tolist())
+    ]
+
+@app.get("/api/market/{symbol}/snapshots")
+def get_market_snapshots(symbol: str, start: Optional[int] = None, end: Optional[int] = None, limit: int = 500):
+    """Returns the scanner snapshots (price, RSI, RVOL, 24h change) recorded for a symbol."""
+    rows = market.snapshots(symbol.upper(), start, end)[-limit:]
+    return [
+        {"time": t, "price": p, "rsi": r, "rvol": rv, "change": ch}
+        for t, p, r, rv, ch in zip(*(rows[f].tolist() for f in ('time', 'price', 'rsi', 'rvol', 'change')))
+    ]
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text format: bot cycle spans/latencies (snapshot file) + this API process."""
+    sources = {'api': metrics.snapshot()}
+    bot = load_snapshot()
+    if bot:
+        sources['bot'] = bot
+    return PlainTextResponse(render_prometheus(sources), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/stream")
+async def stream(request: Request):
+    """
+    Server-Sent Events: 'snapshot' (summary, positions, candidates, history) ao conectar,
+    depois só deltas ('position', 'position_closed', 'summary', 'candidates', 'history', 'log', 'prices').
+    """
+    queue = hub.subscribe()
+
+    async def events():
+        try:
+            yield sse('snapshot', await asyncio.to_thread(_stream_snapshot))
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"  # Mantém proxies/navegador com a conexão aberta
+                    continue
+                if message is RESYNC:
+                    message = sse('snapshot', await asyncio.to_thread(_stream_snapshot))
+                yield message
+        finally:
+            hub.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _stream_snapshot():
+    return {
+        "summary": get_summary(),
+        "positions": get_positions(),
+        "candidates": get_candidates(),
+        "history": downsample(db.get_balance_history(), config.HISTORY_CHART_POINTS),
+    }
 
 @app.post("/api/trade/sell/{symbol}")
 def sell_position(symbol: str, background_tasks: BackgroundTasks):
@@ -135,7 +250,8 @@ def sell_position(symbol: str, background_tasks: BackgroundTasks):
 
 def _execute_sell(symbol: str):
     print(f"API: Triggering manual sell for {symbol}")
-    executor.sell_position(symbol, "Manual via Dashboard")
+    with api.limiter.priority(PRIORITY_EXIT):
+        executor.sell_position(symbol, "Manual via Dashboard")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
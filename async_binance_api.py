@@ -0,0 +1,173 @@
+import time
+import hmac
+import asyncio
+import hashlib
+from urllib.parse import urlencode
+import aiohttp
+import orjson
+import config
+from config import API_KEY, SECRET_KEY, BASE_URL, HTTP_POOL_SIZE
+from metrics import metrics
+from rate_limiter import limiter as shared_limiter, request_weight, PRIORITY_NAMES
+
+
+class AsyncBinanceClient:
+    """
+    Cliente asyncio (aiohttp) com a mesma superfície do BinanceClient.
+    - Pool de conexões keep-alive (TCPConnector) dividido por todas as chamadas concorrentes
+    - Prazo por chamada (HTTP_TIMEOUT, ou timeout= em cada método)
+    - Respostas decodificadas com orjson
+    - Mesmo limitador de peso do cliente síncrono (só espera numa thread quando o balde está vazio)
+    Uso: async with AsyncBinanceClient() as api: await api.get_klines_since(...)
+    """
+    def __init__(self, base_url=None, limiter=None, timeout=None):
+        self.base_url = base_url or BASE_URL
+        self.limiter = limiter or shared_limiter
+        self.timeout = timeout or config.HTTP_TIMEOUT
+        self.session = None
+        self.time_offset = 0
+        self.last_sync_time = 0
+        self.sync_interval = 1800  # Recalibra a cada 30 minutos
+
+    async def start(self):
+        if self.session: return
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,   # Conexões simultâneas com a Binance
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={'X-MBX-APIKEY': API_KEY},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        await self._sync_server_time()
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # --- Internos ---
+    async def _sync_server_time(self):
+        """Sincroniza o tempo local com o servidor Binance para evitar erro -1021"""
+        local_time_before = int(time.time() * 1000)
+        res = await self._send('GET', '/api/v3/time')
+        if res:
+            local_time_avg = (local_time_before + int(time.time() * 1000)) // 2
+            self.time_offset = res['serverTime'] - local_time_avg
+            self.last_sync_time = time.time()
+
+    async def _get_timestamp(self):
+        if time.time() - self.last_sync_time > self.sync_interval:
+            self.last_sync_time = time.time()  # Evita várias tasks recalibrando ao mesmo tempo
+            await self._sync_server_time()
+        return int(time.time() * 1000) + self.time_offset
+
+    async def _acquire(self, weight):
+        if self.limiter.try_acquire(weight): return True
+        # Balde vazio: a espera bloqueante vai para uma thread (o contexto, e a prioridade, vão junto)
+        return await asyncio.to_thread(self.limiter.acquire, weight)
+
+    async def _send(self, method, endpoint, params=None, signed=False, timeout=None):
+        if params is None: params = {}
+
+        if not await self._acquire(request_weight(endpoint, params)):
+            print(f"🚦 {endpoint} adiado: sem peso disponível (prioridade {PRIORITY_NAMES[self.limiter.current_priority()]})")
+            return None
+
+        if signed:
+            # HMAC-SHA256 de uma query curta leva microssegundos: mais barato no próprio loop que numa thread
+            params['timestamp'] = await self._get_timestamp()
+            params['recvWindow'] = 60000
+            query = urlencode(params)
+            sig = hmac.new(SECRET_KEY.encode('utf-8'), query.encode('utf-8'), hashlib.sha256).hexdigest()
+            url = f"{self.base_url}{endpoint}?{query}&signature={sig}"
+            params = None
+        else:
+            url = f"{self.base_url}{endpoint}"
+
+        started = time.perf_counter()
+        try:
+            # timeout=None no aiohttp desliga o prazo: só sobrescreve o da sessão quando informado
+            extra = {'timeout': aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+            async with self.session.request(method, url, params=params, **extra) as response:
+                body = await response.read()
+                metrics.observe('binance_http_seconds', time.perf_counter() - started, endpoint=endpoint, method=method)
+                self.limiter.update_from_headers(response.headers, response.status)
+
+                if response.status == 200:
+                    return orjson.loads(body)
+                metrics.inc('binance_http_errors_total', endpoint=endpoint, status=response.status)
+
+                text = body.decode('utf-8', 'replace')
+                if response.status == 400 and '-1021' in text:
+                    print(f"\n🚨 ERRO API [{response.status}]: {text}")
+                    print("🔄 Ressincronizando com servidor...")
+                    await self._sync_server_time()
+                    return None
+                if response.status == 400 and '-1013' in text:
+                    return None  # Mercado fechado
+
+                print(f"\n🚨 ERRO API [{response.status}]: {text}")
+                return None
+        except asyncio.TimeoutError:
+            metrics.inc('binance_http_errors_total', endpoint=endpoint, status='timeout')
+            print(f"⌛ TIMEOUT: {endpoint}")
+            return None
+        except aiohttp.ClientError as e:
+            metrics.inc('binance_http_errors_total', endpoint=endpoint, status='connection')
+            print(f"❌ ERRO CONEXÃO: {e}")
+            return None
+
+    # --- API (mesmos métodos do BinanceClient) ---
+    async def get_account(self, timeout=None):
+        return await self._send('GET', '/api/v3/account', signed=True, timeout=timeout)
+
+    async def get_ticker_24hr(self, timeout=None):
+        return await self._send('GET', '/api/v3/ticker/24hr', timeout=timeout)
+
+    async def get_price(self, symbol, timeout=None):
+        res = await self._send('GET', '/api/v3/ticker/price', {'symbol': symbol}, timeout=timeout)
+        return float(res['price']) if res else None
+
+    async def get_all_prices(self, timeout=None):
+        res = await self._send('GET', '/api/v3/ticker/price', timeout=timeout)
+        return {x['symbol']: float(x['price']) for x in res} if res else {}
+
+    async def get_klines(self, symbol, interval='1h', limit=110, timeout=None):
+        res = await self._send('GET', '/api/v3/klines', {'symbol': symbol, 'interval': interval, 'limit': limit}, timeout=timeout)
+        return [(float(x[4]), float(x[5])) for x in res] if res else []
+
+    async def get_klines_since(self, symbol, interval='1h', start_time=None, limit=110, timeout=None):
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        res = await self._send('GET', '/api/v3/klines', params, timeout=timeout)
+        return [(int(x[0]), float(x[4]), float(x[5])) for x in res] if res else []
+
+    async def place_order(self, symbol, side, qty_usdt, timeout=None):
+        params = {
+            'symbol': symbol, 'side': side, 'type': 'MARKET',
+            'quoteOrderQty': round(qty_usdt, 2)
+        }
+        return await self._send('POST', '/api/v3/order', params, signed=True, timeout=timeout)
+
+    async def get_exchange_info(self, timeout=None):
+        return await self._send('GET', '/api/v3/exchangeInfo', timeout=timeout)
+
+    async def get_symbol_step_size(self, symbol, timeout=None):
+        data = await self._send('GET', '/api/v3/exchangeInfo', {'symbol': symbol}, timeout=timeout)
+        if not data or 'symbols' not in data:
+            return None
+        for f in data['symbols'][0]['filters']:
+            if f['filterType'] == 'LOT_SIZE':
+                return float(f['stepSize'])
+        return None
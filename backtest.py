@@ -0,0 +1,473 @@
+import os
+import sys
+import json
+import math
+import time
+from types import SimpleNamespace
+import numpy as np
+import config
+from batch_indicators import trailing_wilder_averages, trailing_ema, rsi_series, ema_series, _rsi_from
+from kline_cache import INTERVAL_MS, MAX_FETCH_LIMIT
+from strategy import evaluate_exit, classify_entry, wants_swap, pick_zombie, position_size
+
+# ==============================================================================
+# 🧪 BACKTESTER DA ESTRATÉGIA DUAL
+# Reproduz o loop do bot (manage_portfolio -> scan_market) sobre velas históricas.
+# As regras de entrada/saída/zumbi/tamanho vêm de strategy.py (as mesmas do bot ao vivo);
+# aqui só existe a "simulação da corretora": preços, saldo, taxas e cooldowns.
+# Os indicadores (velas de 1h, como no scanner) são calculados vetorizados uma única vez, cada vela
+# semeada pela mesma janela de KLINE_LIMIT velas que o IndicatorEngine recebe ao vivo;
+# cada barra apenas aplica um passo provisório de Wilder/EMA com o preço atual (vela em formação).
+# ==============================================================================
+
+INDICATOR_INTERVAL = '1h'  # Intervalo das velas usadas pelo scanner (KlineCache.get_series)
+
+
+def make_params(**overrides):
+    """Cópia dos parâmetros do config (MAIÚSCULOS) com sobrescritas, ex: make_params(RSI_BUY_THRESHOLD=25)"""
+    params = {k: getattr(config, k) for k in dir(config) if k.isupper()}
+    unknown = set(overrides) - set(params)
+    if unknown:
+        raise ValueError(f"Parâmetros desconhecidos: {', '.join(sorted(unknown))}")
+    params.update(overrides)
+    return SimpleNamespace(**params)
+
+
+class Backtester:
+    """
+    symbols: lista de N pares
+    times:   open_time (ms) de cada barra, grade comum de T barras
+    closes / volumes: matrizes (N, T) no intervalo `interval` (NaN antes do par existir)
+    Para um ano de 1m com centenas de pares, use float32 e arquivos .npy em mmap (load_dataset).
+    """
+    def __init__(self, symbols, times, closes, volumes, interval='1m', params=None,
+                 start_balance=100.0, fee=None, scan_every=None, ema_period=100):
+        self.params = params or make_params()
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.bar_ms = INTERVAL_MS[interval]
+        self.start_balance = start_balance
+        self.fee = config.BACKTEST_FEE if fee is None else fee
+        self.ema_period = ema_period
+
+        # Barras por vela de indicador (1m -> 60, 1h -> 1)
+        self.k = INTERVAL_MS[INDICATOR_INTERVAL] // self.bar_ms
+        if self.k < 1:
+            raise ValueError(f"Intervalo {interval} maior que o dos indicadores ({INDICATOR_INTERVAL})")
+
+        # Alinha a grade ao início de uma hora e descarta a hora incompleta do fim
+        times = np.asarray(times, dtype=np.int64)
+        skip = int(np.argmax(times % INTERVAL_MS[INDICATOR_INTERVAL] == 0)) if self.k > 1 else 0
+        hours = (len(times) - skip) // self.k
+        end = skip + hours * self.k
+        self.times = times[skip:end]
+        self.closes = np.asarray(closes)[:, skip:end]  # memmap -> ndarray (indexação sem overhead)
+        self.hours = hours
+
+        # Varredura a cada SCAN_INTERVAL (o loop do bot roda a cada 60s)
+        self.scan_every = scan_every or max(1, (self.params.SCAN_INTERVAL * 1000) // self.bar_ms)
+        self.day_bars = 24 * self.k
+        self.cooldown_bars = math.ceil(self.params.COOLDOWN_MINUTES * 60_000 / self.bar_ms)
+
+        self._prepare_indicators(volumes[:, skip:end])
+
+    # --- Pré-cálculo vetorizado ---
+    def _prepare_indicators(self, volumes):
+        n, k, h = len(self.symbols), self.k, self.hours
+
+        # Velas de 1h: fechamento = última barra da hora; volume em USDT somado por par (linha a linha, sem cópia N x T)
+        self.close_h = np.asarray(self.closes[:, k - 1::k], dtype=np.float64)
+        quote_h = np.zeros((n, h))
+        for i in range(n):
+            row = np.asarray(self.closes[i], dtype=np.float64) * np.asarray(volumes[i], dtype=np.float64)
+            quote_h[i] = np.nan_to_num(row).reshape(h, k).sum(axis=1)
+
+        # Volume das últimas 24 velas fechadas (equivalente ao quoteVolume do ticker 24h)
+        csum = np.cumsum(quote_h, axis=1)
+        self.quote_24h = csum.copy()
+        self.quote_24h[:, 24:] -= csum[:, :-24]
+
+        # Estado de Wilder e EMA após cada vela fechada, semeado pelas KLINE_LIMIT-1 velas fechadas
+        # que o scanner busca junto com a vela em formação (NaN na vela = par ainda não listado)
+        window = self.params.KLINE_LIMIT - 1
+        self.avg_gain, self.avg_loss = trailing_wilder_averages(self.close_h, window, self.params.RSI_PERIOD)
+        self.ema_h = trailing_ema(self.close_h, window, self.ema_period)
+        valid = ~np.isnan(self.close_h)
+        self.first_close = np.where(valid.any(axis=1), valid.argmax(axis=1), h)  # Vela de listagem de cada par
+
+        quote, ignored = self.params.SYMBOL_QUOTE, set(self.params.IGNORED_COINS)
+        self.tradable = np.array([s.endswith(quote) and s not in ignored for s in self.symbols], dtype=bool)
+
+    def _provisional(self, idx, prev, prices):
+        """
+        RSI/EMA dos pares `idx` com a vela em formação (mesmo passo de IndicatorState.provisional,
+        feito de uma vez para todo o shortlist). Retorna listas; NaN = sem histórico suficiente.
+        """
+        period = self.params.RSI_PERIOD
+        delta = prices - self.close_h[idx, prev]
+        avg_gain = (self.avg_gain[idx, prev] * (period - 1) + np.maximum(delta, 0.0)) / period
+        avg_loss = (self.avg_loss[idx, prev] * (period - 1) + np.abs(np.minimum(delta, 0.0))) / period
+        rsi = _rsi_from(avg_gain, avg_loss)
+        rsi[np.isnan(avg_gain)] = np.nan
+
+        ema = self.ema_h[idx, prev]
+        multiplier = 2 / (self.ema_period + 1)
+        ema = (prices - ema) * multiplier + ema
+
+        # Par recém-listado: a vela em formação pode completar a semente (mesmas contas do IndicatorState)
+        seed = min(period, self.ema_period - 1)
+        for j in np.flatnonzero(np.isnan(rsi) | np.isnan(ema)):
+            first = self.first_close[idx[j]]
+            if prev - first + 1 < seed: continue
+            closes = np.append(self.close_h[idx[j], first:prev + 1], prices[j])[None, :]
+            rsi[j] = rsi_series(closes, period)[0, -1]
+            ema[j] = ema_series(closes, self.ema_period)[0, -1]
+        return rsi.tolist(), ema.tolist()
+
+    # --- Corretora simulada ---
+    def _price(self, i):
+        price = self.row[i]
+        return price if price > 0 else None  # NaN/0 -> sem preço
+
+    def _buy(self, t, symbol, price, strategy_type):
+        amount = position_size(self.cash)
+        if amount is None:
+            return False
+        self.cash -= amount
+        self.positions[symbol] = {
+            'buy_price': price, 'highest_price': price, 'strategy_type': strategy_type,
+            'qty': amount * (1 - self.fee) / price, 'cost': amount, 'entry_bar': t,
+        }
+        return True
+
+    def _sell(self, t, symbol, price, reason):
+        pos = self.positions.pop(symbol)
+        proceeds = pos['qty'] * price * (1 - self.fee)
+        self.cash += proceeds
+        pnl = proceeds - pos['cost']
+        self.trades.append({
+            'symbol': symbol, 'strategy': pos['strategy_type'],
+            'entry_time': int(self.times[pos['entry_bar']]), 'exit_time': int(self.times[t]),
+            'buy_price': pos['buy_price'], 'sell_price': price,
+            'pnl_usdt': pnl, 'pnl_pct': pnl / pos['cost'] * 100, 'reason': reason,
+        })
+        self.cooldowns[symbol] = t + self.cooldown_bars
+
+    def _equity(self):
+        value = self.cash
+        for symbol, pos in self.positions.items():
+            price = self._price(self.index[symbol])
+            value += pos['qty'] * (price if price else pos['buy_price'])
+        return value
+
+    # --- Loop (mesma ordem do BotController.run) ---
+    def run(self):
+        started = time.time()
+        self.cash = self.start_balance
+        self.positions = {}
+        self.trades = []
+        self.cooldowns = {}
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        equity_curve = []
+        peak, max_dd = self.start_balance, 0.0
+
+        # Aquecimento: 24h para o ranking e RSI_PERIOD velas fechadas
+        first = max(self.day_bars, (self.params.RSI_PERIOD + 1) * self.k)
+        for t in range(first, len(self.times)):
+            # Preços da barra (uma leitura da coluna; o resto do passo usa floats do Python)
+            self.prices = np.asarray(self.closes[:, t], dtype=np.float64)
+            self.row = self.prices.tolist()
+
+            self._manage_portfolio(t)
+            if (t - first) % self.scan_every == 0:
+                self._scan_market(t)
+
+            equity = self._equity()
+            peak = max(peak, equity)
+            max_dd = max(max_dd, (peak - equity) / peak)
+            if (t + 1) % self.k == 0:
+                equity_curve.append((int(self.times[t]), equity))
+
+        self.elapsed = time.time() - started
+        return self._report(equity_curve, max_dd, first)
+
+    def _manage_portfolio(self, t):
+        for symbol in list(self.positions):
+            price = self._price(self.index[symbol])
+            if not price: continue
+            pos = self.positions[symbol]
+            decision = evaluate_exit(symbol, pos, price, self.params)
+            pos['highest_price'] = decision['highest']
+            if decision['exit']:
+                self._sell(t, symbol, price, decision['exit'][2])
+
+    def _scan_market(self, t):
+        p = self.params
+        prev = t // self.k - 1  # Última vela de 1h fechada
+
+        # 1. Filtro bruto: liquidez 24h, par ativo, fora da carteira e do cooldown
+        prices = self.prices
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.abs((prices / self.closes[:, t - self.day_bars] - 1) * 100)
+        eligible = self.tradable & (self.quote_24h[:, prev] >= p.MIN_VOLUME_USDT) & np.isfinite(change) & (prices > 0)
+        for symbol in self.positions:
+            eligible[self.index[symbol]] = False
+        for symbol, until in list(self.cooldowns.items()):
+            if t < until:
+                eligible[self.index[symbol]] = False
+            else:
+                del self.cooldowns[symbol]
+
+        # Ordena pelas que mais caíram/subiram; só o Top N vira candidato (mesmo orçamento do scanner)
+        candidates = np.flatnonzero(eligible)
+        if not len(candidates): return
+        max_candidates = min(p.SCAN_CANDIDATES, p.SCAN_WEIGHT_BUDGET // p.KLINE_REQUEST_WEIGHT)
+        shortlist = candidates[np.argsort(-change[candidates], kind='stable')[:max_candidates]]
+
+        # 2. Filtro fino - DUAL STRATEGY
+        conservative_opportunities, scalp_opportunities = [], []
+        rsis, emas = self._provisional(shortlist, prev, prices[shortlist])
+        for i, rsi, ema in zip(shortlist.tolist(), rsis, emas):
+            if not rsi or rsi != rsi: continue  # Sem RSI (NaN) -> ignorado, como no scanner
+            price = self.row[i]
+            conservative_ok, scalp_ok, _ = classify_entry(rsi, ema if ema == ema else None, price, p)
+            if conservative_ok:
+                conservative_opportunities.append((rsi, self.symbols[i], price, 'CONSERVATIVE'))
+            elif scalp_ok:
+                scalp_opportunities.append((rsi, self.symbols[i], price, 'SCALP'))
+
+        conservative_opportunities.sort(key=lambda x: x[0])
+        scalp_opportunities.sort(key=lambda x: x[0])
+
+        for rsi, symbol, price, strategy_type in conservative_opportunities + scalp_opportunities:
+            if self._buy(t, symbol, price, strategy_type): continue
+
+            # Sistema Zombie: tenta substituir posição pior
+            if wants_swap(strategy_type, rsi):
+                zombie = pick_zombie(self._holdings(t), candidate_rsi=rsi)
+                if zombie:
+                    self._sell(t, zombie, self._price(self.index[zombie]), f"SWAP por {strategy_type}")
+                    self._buy(t, symbol, price, strategy_type)
+
+    def _holdings(self, t):
+        holdings = []
+        for symbol, pos in self.positions.items():
+            price = self._price(self.index[symbol])
+            if not price: continue
+            duration = (t - pos['entry_bar']) * self.bar_ms / 3_600_000
+            holdings.append((symbol, (price - pos['buy_price']) / pos['buy_price'] * 100, duration))
+        return holdings
+
+    # --- Relatório ---
+    def _report(self, equity_curve, max_dd, first):
+        last = len(self.times) - 1
+        final_equity = self._equity() if last >= first else self.cash
+        by_strategy = {}
+        for name in ('CONSERVATIVE', 'SCALP'):
+            trades = [tr for tr in self.trades if tr['strategy'] == name]
+            pnl = [tr['pnl_usdt'] for tr in trades]
+            wins = sum(1 for x in pnl if x > 0)
+
+            # Drawdown do PnL realizado acumulado da estratégia
+            acc, top, dd = 0.0, 0.0, 0.0
+            for x in pnl:
+                acc += x
+                top = max(top, acc)
+                dd = max(dd, top - acc)
+
+            by_strategy[name] = {
+                'trades': len(trades),
+                'wins': wins,
+                'win_rate': wins / len(trades) * 100 if trades else 0.0,
+                'pnl_usdt': sum(pnl),
+                'avg_pnl_pct': sum(tr['pnl_pct'] for tr in trades) / len(trades) if trades else 0.0,
+                'max_drawdown_usdt': dd,
+            }
+
+        return {
+            'start_balance': self.start_balance,
+            'final_equity': final_equity,
+            'return_pct': (final_equity / self.start_balance - 1) * 100,
+            'max_drawdown_pct': max_dd * 100,
+            'by_strategy': by_strategy,
+            'trades': self.trades,
+            'open_positions': {s: dict(p) for s, p in self.positions.items()},
+            'equity_curve': equity_curve,
+            'bars': max(len(self.times) - first, 0),
+            'symbols': len(self.symbols),
+            'elapsed': self.elapsed,
+        }
+
+
+def print_report(result):
+    print("\n🧪 RESULTADO DO BACKTEST")
+    print(f"   💰 Saldo: ${result['start_balance']:.2f} -> ${result['final_equity']:.2f} ({result['return_pct']:+.2f}%)")
+    print(f"   📉 Drawdown máximo: {result['max_drawdown_pct']:.2f}%")
+    for name, s in result['by_strategy'].items():
+        icon = "🛡️" if name == 'CONSERVATIVE' else "⚡"
+        print(f"   {icon} {name:<12} | {s['trades']:>5} trades | Win {s['win_rate']:5.1f}% | "
+              f"PnL ${s['pnl_usdt']:+.2f} (média {s['avg_pnl_pct']:+.2f}%) | DD ${s['max_drawdown_usdt']:.2f}")
+    print(f"   📂 Posições abertas no fim: {len(result['open_positions'])}")
+    print(f"   ⏱️ {result['bars']} barras x {result['symbols']} pares em {result['elapsed']:.1f}s")
+
+
+# ==============================================================================
+# 📦 DADOS HISTÓRICOS
+# ==============================================================================
+def download_klines(api_client, symbol, interval, start_ms, end_ms):
+    """Baixa [(open_time, close, volume)] entre start_ms e end_ms paginando de 1000 em 1000 velas."""
+    rows = []
+    cursor = start_ms
+    while cursor < end_ms:
+        batch = api_client.get_klines_since(symbol, interval, start_time=cursor, limit=MAX_FETCH_LIMIT)
+        if not batch: break
+        rows.extend(r for r in batch if r[0] < end_ms)
+        if len(batch) < MAX_FETCH_LIMIT: break
+        cursor = batch[-1][0] + INTERVAL_MS[interval]
+    return rows
+
+
+def build_dataset(rows_by_symbol, interval, dtype=np.float64):
+    """
+    Alinha {symbol: [(open_time, close, volume)]} numa grade comum.
+    Buracos repetem o último fechamento (volume 0); antes da primeira vela o par fica NaN.
+    Retorna (symbols, times, closes, volumes).
+    """
+    step = INTERVAL_MS[interval]
+    symbols = [s for s, rows in rows_by_symbol.items() if len(rows)]
+    if not symbols:
+        return [], np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=dtype), np.empty((0, 0), dtype=dtype)
+
+    start = int(min(rows_by_symbol[s][0][0] for s in symbols))
+    end = int(max(rows_by_symbol[s][-1][0] for s in symbols))
+    times = np.arange(start, end + step, step, dtype=np.int64)
+    closes = np.full((len(symbols), len(times)), np.nan, dtype=dtype)
+    volumes = np.zeros((len(symbols), len(times)), dtype=dtype)
+
+    for row, symbol in enumerate(symbols):
+        data = np.asarray(rows_by_symbol[symbol], dtype=np.float64)
+        idx = ((data[:, 0].astype(np.int64) - start) // step)
+        filled = np.full(len(times), np.nan)
+        filled[idx] = data[:, 1]
+        volumes[row, idx] = data[:, 2]
+
+        # Forward-fill dos buracos a partir da primeira vela
+        valid = ~np.isnan(filled)
+        last = np.where(valid, np.arange(len(times)), 0)
+        np.maximum.accumulate(last, out=last)
+        first = idx[0]
+        filled[first:] = filled[last[first:]]
+        closes[row] = filled
+
+    return symbols, times, closes, volumes
+
+
+def save_dataset(path, symbols, times, closes, volumes, interval):
+    """Grava em diretório (.npy) para abrir depois em mmap sem carregar tudo na memória."""
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'times.npy'), times)
+    np.save(os.path.join(path, 'closes.npy'), closes)
+    np.save(os.path.join(path, 'volumes.npy'), volumes)
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'symbols': list(symbols), 'interval': interval}, f)
+
+
+def load_dataset(path, mmap=True):
+    """Retorna (symbols, times, closes, volumes, interval)"""
+    mode = 'r' if mmap else None
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    return (meta['symbols'],
+            np.load(os.path.join(path, 'times.npy')),
+            np.load(os.path.join(path, 'closes.npy'), mmap_mode=mode),
+            np.load(os.path.join(path, 'volumes.npy'), mmap_mode=mode),
+            meta['interval'])
+
+
+def load_from_db(db, interval=INDICATOR_INTERVAL, symbols=None):
+    """Velas já guardadas pelo KlineCache (tabela kline_cache) -> (symbols, times, closes, volumes)"""
+    with db.pool.reader() as conn:
+        if symbols is None:
+            symbols = [r[0] for r in conn.execute(
+                "SELECT DISTINCT symbol FROM kline_cache WHERE interval = ? ORDER BY symbol", (interval,))]
+        rows_by_symbol = {
+            s: [tuple(r) for r in conn.execute(
+                "SELECT open_time, close, volume FROM kline_cache WHERE symbol = ? AND interval = ? ORDER BY open_time",
+                (s, interval))]
+            for s in symbols
+        }
+    return build_dataset(rows_by_symbol, interval)
+
+
+def load_from_store(store, interval=INDICATOR_INTERVAL, symbols=None, start=None, end=None, dtype=np.float64):
+    """Velas do MarketStore (gravadas pelo scanner ou baixadas) -> (symbols, times, closes, volumes)"""
+    symbols = symbols or store.symbols(f"klines_{interval}")
+    rows_by_symbol = {}
+    for s in symbols:
+        arr = store.klines(s, interval, start, end)
+        rows_by_symbol[s] = np.column_stack([arr['open_time'], arr['close'], arr['volume']])
+    return build_dataset(rows_by_symbol, interval, dtype)
+
+
+def download_dataset(api_client, path, days=30, interval='1m', top=50, dtype=np.float32):
+    """Baixa os `top` pares mais líquidos (quoteVolume 24h) dos últimos `days` dias e grava em `path`."""
+    tickers = api_client.get_ticker_24hr() or []
+    tickers = [t for t in tickers
+               if t['symbol'].endswith(config.SYMBOL_QUOTE) and t['symbol'] not in config.IGNORED_COINS]
+    tickers.sort(key=lambda t: float(t['quoteVolume']), reverse=True)
+
+    end_ms = int(time.time() * 1000) // INTERVAL_MS['1h'] * INTERVAL_MS['1h']
+    start_ms = end_ms - days * 86_400_000
+    rows_by_symbol = {}
+    for n, t in enumerate(tickers[:top], 1):
+        rows_by_symbol[t['symbol']] = download_klines(api_client, t['symbol'], interval, start_ms, end_ms)
+        print(f"   📥 [{n}/{top}] {t['symbol']}: {len(rows_by_symbol[t['symbol']])} velas")
+
+    symbols, times, closes, volumes = build_dataset(rows_by_symbol, interval, dtype)
+    save_dataset(path, symbols, times, closes, volumes, interval)
+    print(f"💾 Dataset salvo em {path} ({len(symbols)} pares x {len(times)} velas)")
+
+
+def _parse_overrides(args):
+    """KEY=VALUE -> dict (valores em JSON quando possível: 25, 0.03, true)"""
+    overrides = {}
+    for arg in args:
+        key, value = arg.split('=', 1)
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return overrides
+
+
+if __name__ == "__main__":
+    # Uso:
+    #   python backtest.py download DIR [dias] [intervalo] [top]
+    #   python backtest.py run DIR [CHAVE=VALOR ...]
+    #   python backtest.py db [CHAVE=VALOR ...]      (velas do kline_cache do bot)
+    #   python backtest.py store [CHAVE=VALOR ...]   (velas do MarketStore, sem tocar no banco)
+    if len(sys.argv) < 2:
+        print("Uso: python backtest.py download DIR [dias] [intervalo] [top] | run DIR [CHAVE=VALOR ...] | db|store [CHAVE=VALOR ...]")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == 'download':
+        from binance_api import BinanceClient
+        download_dataset(BinanceClient(), sys.argv[2],
+                         days=int(sys.argv[3]) if len(sys.argv) > 3 else 30,
+                         interval=sys.argv[4] if len(sys.argv) > 4 else '1m',
+                         top=int(sys.argv[5]) if len(sys.argv) > 5 else 50)
+    elif command == 'run':
+        symbols, times, closes, volumes, interval = load_dataset(sys.argv[2])
+        params = make_params(**_parse_overrides(sys.argv[3:]))
+        print_report(Backtester(symbols, times, closes, volumes, interval, params).run())
+    elif command == 'db':
+        from storage import PortfolioManager
+        symbols, times, closes, volumes = load_from_db(PortfolioManager())
+        params = make_params(**_parse_overrides(sys.argv[2:]))
+        print_report(Backtester(symbols, times, closes, volumes, INDICATOR_INTERVAL, params).run())
+    elif command == 'store':
+        from market_store import MarketStore
+        symbols, times, closes, volumes = load_from_store(MarketStore())
+        params = make_params(**_parse_overrides(sys.argv[2:]))
+        print_report(Backtester(symbols, times, closes, volumes, INDICATOR_INTERVAL, params).run())
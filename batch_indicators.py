@@ -0,0 +1,204 @@
+import numpy as np
+import config
+
+# Cálculo vetorizado de RSI / EMA / RVOL para muitos símbolos de uma vez.
+# Entrada: matrizes (símbolos x velas). O laço é sobre o tempo (Wilder/EMA são recursivos),
+# mas cada passo opera sobre todos os símbolos numa única operação NumPy.
+# As somas iniciais são feitas na mesma ordem das funções escalares do BotController,
+# então o resultado da última vela é idêntico ao de calculate_rsi / calculate_ema / calculate_rvol.
+
+RVOL_WINDOW = 24
+
+
+def _rsi_from(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + (avg_gain / avg_loss)))
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+def wilder_averages(closes, period=None):
+    """Médias de ganho/perda de Wilder após cada vela (NaN até ter period+1 preços). Retorna (avg_gain, avg_loss), cada (N, T)."""
+    period = period or config.RSI_PERIOD
+    closes = np.asarray(closes, dtype=np.float64)
+    n, t = closes.shape
+    out_gain = np.full((n, t), np.nan)
+    out_loss = np.full((n, t), np.nan)
+    if t < period + 1: return out_gain, out_loss
+
+    delta = np.diff(closes, axis=1)
+    gains = np.maximum(delta, 0.0)
+    losses = np.abs(np.minimum(delta, 0.0))
+
+    avg_gain = np.zeros(n)
+    avg_loss = np.zeros(n)
+    for k in range(period):
+        avg_gain += gains[:, k]
+        avg_loss += losses[:, k]
+    avg_gain /= period
+    avg_loss /= period
+    out_gain[:, period] = avg_gain
+    out_loss[:, period] = avg_loss
+
+    for i in range(period, t - 1):
+        avg_gain = (avg_gain * (period - 1) + gains[:, i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[:, i]) / period
+        out_gain[:, i + 1] = avg_gain
+        out_loss[:, i + 1] = avg_loss
+    return out_gain, out_loss
+
+
+def rsi_series(closes, period=None):
+    """RSI de Wilder para cada vela (NaN até ter period+1 preços). Retorna (N, T)."""
+    avg_gain, avg_loss = wilder_averages(closes, period)
+    rsi = _rsi_from(avg_gain, avg_loss)
+    rsi[np.isnan(avg_gain)] = np.nan
+    return rsi
+
+
+def ema_series(closes, period=100):
+    """EMA iniciada pela SMA das primeiras `period` velas (NaN antes disso). Retorna (N, T)."""
+    closes = np.asarray(closes, dtype=np.float64)
+    n, t = closes.shape
+    out = np.full((n, t), np.nan)
+    if t < period: return out
+
+    multiplier = 2 / (period + 1)
+    ema = np.zeros(n)
+    for k in range(period):
+        ema += closes[:, k]
+    ema /= period
+    out[:, period - 1] = ema
+
+    for i in range(period, t):
+        ema = (closes[:, i] - ema) * multiplier + ema
+        out[:, i] = ema
+    return out
+
+
+def _seed_listing(outs, closes, window, fn):
+    """Pares listados no meio da série (NaN no início): antes de completar a janela, o bot vê só as velas desde a listagem."""
+    for row in np.flatnonzero(np.isnan(closes[:, 0])):
+        valid = np.flatnonzero(~np.isnan(closes[row]))
+        if not len(valid): continue
+        first = valid[0]
+        seeded = fn(closes[row:row + 1, first:first + window - 1])
+        for out, values in zip(outs, seeded):
+            out[row, first:first + values.shape[1]] = values[0]
+
+
+def trailing_wilder_averages(closes, window, period=None):
+    """
+    Como wilder_averages, mas o estado de cada vela é semeado só pelas últimas `window` velas
+    até ela (a janela que o IndicatorEngine recebe do scanner), não pelo histórico inteiro.
+    """
+    period = period or config.RSI_PERIOD
+    closes = np.asarray(closes, dtype=np.float64)
+    n, t = closes.shape
+    out_gain, out_loss = np.full((n, t), np.nan), np.full((n, t), np.nan)
+
+    # Antes de completar a janela, a janela é o próprio início da série
+    head_gain, head_loss = wilder_averages(closes[:, :window - 1], period)
+    out_gain[:, :window - 1], out_loss[:, :window - 1] = head_gain, head_loss
+
+    if t >= window and window >= period + 1:
+        delta = np.diff(closes, axis=1)
+        gains = np.maximum(delta, 0.0)
+        losses = np.abs(np.minimum(delta, 0.0))
+        m = t - window + 1  # Uma coluna por janela (terminando nas velas window-1 .. t-1)
+
+        avg_gain = np.zeros((n, m))
+        avg_loss = np.zeros((n, m))
+        for k in range(period):
+            avg_gain += gains[:, k:k + m]
+            avg_loss += losses[:, k:k + m]
+        avg_gain /= period
+        avg_loss /= period
+        for i in range(period, window - 1):
+            avg_gain = (avg_gain * (period - 1) + gains[:, i:i + m]) / period
+            avg_loss = (avg_loss * (period - 1) + losses[:, i:i + m]) / period
+        out_gain[:, window - 1:], out_loss[:, window - 1:] = avg_gain, avg_loss
+
+    _seed_listing((out_gain, out_loss), closes, window, lambda c: wilder_averages(c, period))
+    return out_gain, out_loss
+
+
+def trailing_ema(closes, window, period=100):
+    """Como ema_series, mas semeada só pelas últimas `window` velas até cada vela (ver trailing_wilder_averages)."""
+    closes = np.asarray(closes, dtype=np.float64)
+    n, t = closes.shape
+    out = np.full((n, t), np.nan)
+    out[:, :window - 1] = ema_series(closes[:, :window - 1], period)
+
+    if t >= window and window >= period:
+        m = t - window + 1
+        multiplier = 2 / (period + 1)
+        ema = np.zeros((n, m))
+        for k in range(period):
+            ema += closes[:, k:k + m]
+        ema /= period
+        for i in range(period, window):
+            ema = (closes[:, i:i + m] - ema) * multiplier + ema
+        out[:, window - 1:] = ema
+
+    _seed_listing((out,), closes, window, lambda c: (ema_series(c, period),))
+    return out
+
+
+def rvol_series(volumes):
+    """Volume da vela / média das 24 anteriores (1.0 sem histórico, 0.0 se média zero). Retorna (N, T)."""
+    volumes = np.asarray(volumes, dtype=np.float64)
+    n, t = volumes.shape
+    out = np.ones((n, t))
+    if t <= RVOL_WINDOW: return out
+
+    acc = np.zeros((n, t - RVOL_WINDOW))
+    for k in range(RVOL_WINDOW, 0, -1):  # Mais antiga primeiro (mesma ordem do sum())
+        acc += volumes[:, RVOL_WINDOW - k:t - k]
+    avg = acc / RVOL_WINDOW
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rvol = volumes[:, RVOL_WINDOW:] / avg
+    out[:, RVOL_WINDOW:] = np.where(avg == 0, 0.0, rvol)
+    return out
+
+
+def compute_batch(closes, volumes, rsi_period=None, ema_period=100):
+    """
+    Indicadores da última vela para todo o universo numa passada.
+    Retorna {'rsi', 'ema', 'rvol', 'price'} como vetores de tamanho N (NaN onde faltou histórico).
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    return {
+        'rsi': rsi_series(closes, rsi_period)[:, -1],
+        'ema': ema_series(closes, ema_period)[:, -1],
+        'rvol': rvol_series(volumes[:, -(RVOL_WINDOW + 1):])[:, -1],
+        'price': closes[:, -1],
+    }
+
+
+def stack_klines(klines_by_symbol, length=None):
+    """
+    Monta as matrizes a partir de {symbol: [(close, volume)]}.
+    Símbolos com histórico menor que `length` ficam de fora. Retorna (symbols, closes, volumes).
+    """
+    length = length or config.KLINE_LIMIT
+    symbols = [s for s, k in klines_by_symbol.items() if len(k) >= length]
+    closes = np.empty((len(symbols), length))
+    volumes = np.empty((len(symbols), length))
+    for row, sym in enumerate(symbols):
+        data = np.asarray(klines_by_symbol[sym][-length:], dtype=np.float64)
+        closes[row] = data[:, 0]
+        volumes[row] = data[:, 1]
+    return symbols, closes, volumes
+
+
+def rank_by_rsi(klines_by_symbol, length=None):
+    """Ranking de todo o universo por RSI (menor primeiro): [(symbol, rsi, ema, rvol, price)]"""
+    symbols, closes, volumes = stack_klines(klines_by_symbol, length)
+    if not symbols: return []
+    ind = compute_batch(closes, volumes)
+    order = np.argsort(ind['rsi'], kind='stable')
+    return [
+        (symbols[i], float(ind['rsi'][i]), float(ind['ema'][i]), float(ind['rvol'][i]), float(ind['price'][i]))
+        for i in order if not np.isnan(ind['rsi'][i])
+    ]
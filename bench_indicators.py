@@ -0,0 +1,57 @@
+import time
+import numpy as np
+from main import BotController
+from batch_indicators import compute_batch
+
+# Benchmark: funções escalares do BotController vs cálculo vetorizado (batch_indicators)
+# Uso: python bench_indicators.py
+
+CANDLES = 110
+UNIVERSES = [15, 300, 2000]
+
+
+def make_universe(n_symbols, seed=7):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.01, size=(n_symbols, CANDLES))
+    closes = 100 * np.cumprod(1 + returns, axis=1)
+    volumes = rng.uniform(0, 1e6, size=(n_symbols, CANDLES))
+    return closes, volumes
+
+
+def run_scalar(closes, volumes):
+    out = []
+    for prices, vols in zip(closes.tolist(), volumes.tolist()):
+        out.append((
+            BotController.calculate_rsi(None, prices),
+            BotController.calculate_ema(None, prices, period=100),
+            BotController.calculate_rvol(None, vols),
+        ))
+    return out
+
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    print(f"📊 Indicadores RSI/EMA-100/RVOL ({CANDLES} velas por símbolo)")
+    print(f"   {'Símbolos':>8} | {'Escalar':>10} | {'NumPy':>10} | {'Ganho':>7} | Idêntico")
+    for n in UNIVERSES:
+        closes, volumes = make_universe(n)
+        t_scalar, scalar = best_of(lambda: run_scalar(closes, volumes))
+        t_batch, batch = best_of(lambda: compute_batch(closes, volumes))
+
+        same = all(
+            (rsi, ema, rvol) == (batch['rsi'][i], batch['ema'][i], batch['rvol'][i])
+            for i, (rsi, ema, rvol) in enumerate(scalar)
+        )
+        print(f"   {n:>8} | {t_scalar*1000:>8.2f}ms | {t_batch*1000:>8.2f}ms | {t_scalar/t_batch:>6.1f}x | {'✅' if same else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
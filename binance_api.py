@@ -2,13 +2,24 @@ import time
 import hmac
 import hashlib
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlencode
-from config import API_KEY, SECRET_KEY, BASE_URL
+from config import API_KEY, SECRET_KEY, BASE_URL, HTTP_POOL_SIZE, HTTP_TIMEOUT
+from metrics import metrics
+from rate_limiter import limiter as shared_limiter, request_weight, PRIORITY_NAMES
 
 class BinanceClient:
-    def __init__(self):
+    def __init__(self, base_url=None, limiter=None):
+        # base_url configurável: permite apontar para um servidor mock local nos testes
+        self.base_url = base_url or BASE_URL
+        self.limiter = limiter or shared_limiter
+
         self.session = requests.Session()
         self.session.headers.update({'X-MBX-APIKEY': API_KEY})
+        # Pool maior para as buscas paralelas do scanner
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         # Sincronização de tempo com servidor Binance
         self.time_offset = 0
@@ -20,7 +31,9 @@ class BinanceClient:
         """Sincroniza o tempo local com o servidor Binance para evitar erro -1021"""
         try:
             local_time_before = int(time.time() * 1000)
-            response = self.session.get(f"{BASE_URL}/api/v3/time")
+            if not self.limiter.acquire(request_weight('/api/v3/time')): return
+            response = self.session.get(f"{self.base_url}/api/v3/time", timeout=HTTP_TIMEOUT)
+            self.limiter.update_from_headers(response.headers, response.status_code)
             
             if response.status_code == 200:
                 server_time = response.json()['serverTime']
@@ -49,24 +62,34 @@ class BinanceClient:
 
     def _send(self, method, endpoint, params=None, signed=False):
         if params is None: params = {}
+
+        # Peso do endpoint no balde compartilhado (saídas > normal > scanner).
+        # Antes de assinar: uma espera longa não pode envelhecer o timestamp.
+        if not self.limiter.acquire(request_weight(endpoint, params)):
+            print(f"🚦 {endpoint} adiado: sem peso disponível (prioridade {PRIORITY_NAMES[self.limiter.current_priority()]})")
+            return None
         
         if signed:
             params['timestamp'] = self._get_timestamp()
             params['recvWindow'] = 60000
             query = urlencode(params)
             sig = hmac.new(SECRET_KEY.encode('utf-8'), query.encode('utf-8'), hashlib.sha256).hexdigest()
-            url = f"{BASE_URL}{endpoint}?{query}&signature={sig}"
+            url = f"{self.base_url}{endpoint}?{query}&signature={sig}"
         else:
-            url = f"{BASE_URL}{endpoint}"
+            url = f"{self.base_url}{endpoint}"
         
+        started = time.perf_counter()
         try:
             if method == 'GET':
-                response = self.session.get(url, params=params if not signed else None)
+                response = self.session.get(url, params=params if not signed else None, timeout=HTTP_TIMEOUT)
             else:
-                response = self.session.request(method, url)
+                response = self.session.request(method, url, timeout=HTTP_TIMEOUT)
+            metrics.observe('binance_http_seconds', time.perf_counter() - started, endpoint=endpoint, method=method)
+            self.limiter.update_from_headers(response.headers, response.status_code)
                 
             if response.status_code == 200:
                 return response.json()
+            metrics.inc('binance_http_errors_total', endpoint=endpoint, status=response.status_code)
             
             # Se receber erro -1021, tenta sincronizar novamente
             if response.status_code == 400 and '-1021' in response.text:
@@ -82,7 +105,12 @@ class BinanceClient:
             
             print(f"\n🚨 ERRO API [{response.status_code}]: {response.text}")
             return None
+        except requests.Timeout:
+            metrics.inc('binance_http_errors_total', endpoint=endpoint, status='timeout')
+            print(f"⌛ TIMEOUT: {endpoint}")
+            return None
         except Exception as e:
+            metrics.inc('binance_http_errors_total', endpoint=endpoint, status='connection')
             print(f"❌ ERRO CONEXÃO: {e}")
             return None
 
@@ -96,12 +124,25 @@ class BinanceClient:
         res = self._send('GET', '/api/v3/ticker/price', {'symbol': symbol})
         return float(res['price']) if res else None
 
+    def get_all_prices(self):
+        """Preço de todos os pares numa única chamada (Snapshot do ciclo)"""
+        res = self._send('GET', '/api/v3/ticker/price')
+        return {x['symbol']: float(x['price']) for x in res} if res else {}
+
     def get_klines(self, symbol, interval='1h', limit=110): # <--- Aumentado para 110
         res = self._send('GET', '/api/v3/klines', {'symbol': symbol, 'interval': interval, 'limit': limit})
         # Retorna tupla (Close, Volume) para calcularmos preço e RVOL
         # Index 4 = Close Price, Index 5 = Volume
         return [(float(x[4]), float(x[5])) for x in res] if res else []
 
+    def get_klines_since(self, symbol, interval='1h', start_time=None, limit=110):
+        """Velas com horário de abertura [(open_time, close, volume)]. start_time permite busca incremental."""
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        res = self._send('GET', '/api/v3/klines', params)
+        return [(int(x[0]), float(x[4]), float(x[5])) for x in res] if res else []
+
     def place_order(self, symbol, side, qty_usdt):
         params = {
             'symbol': symbol, 'side': side, 'type': 'MARKET',
@@ -109,6 +150,10 @@ class BinanceClient:
         }
         return self._send('POST', '/api/v3/order', params, signed=True)
     
+    def get_exchange_info(self):
+        """exchangeInfo completo (todos os pares) - usado pelo índice local SymbolFilters"""
+        return self._send('GET', '/api/v3/exchangeInfo')
+
     def get_symbol_step_size(self, symbol):
         """Busca a precisão (LOT_SIZE) exigida pela Binance para o par."""
         # Endpoint público, não gasta peso de API assinada
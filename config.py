@@ -45,6 +45,16 @@ SCALP_RSI_MAX = 40            # RSI máximo para entrar em scalp (mais permissiv
 SCALP_STOP_LOSS = 0.01        # Stop loss fixo para scalp: -1%
 SCALP_TAKE_PROFIT = 0.025     # Take profit fixo para scalp: +2.5%
 
+# Cooldown após venda (não recompra a mesma moeda por X minutos)
+COOLDOWN_MINUTES = 30
+
+# Backtest: taxa por operação (taker da Binance, 0.1%)
+BACKTEST_FEE = 0.001
+
+# Otimizador de parâmetros (sweep.py)
+SWEEP_WORKERS = None                 # Processos paralelos (None = todos os núcleos)
+SWEEP_RESULTS_DIR = 'sweep_results'  # Cache por hash de parâmetros + Parquet de todas as rodadas
+
 # NOTA: Sem limite de posições! Sistema Zombie troca por melhores oportunidades
 # MAX_SCALP_POSITIONS = 3       # (REMOVIDO - usa saldo disponível)
 # MAX_CONSERVATIVE_POSITIONS = 3 # (REMOVIDO - usa saldo disponível)
@@ -62,11 +72,84 @@ SIMULATION_MODE = False
 # Configurações de Scan
 KLINE_LIMIT = 110
 SCAN_INTERVAL = 60
+SCAN_CANDIDATES = 15         # Candidatos que passam pelo filtro fino (klines + RSI)
+SCAN_WORKERS = 8             # Buscas de klines simultâneas
+SCAN_WEIGHT_BUDGET = 400     # Peso máximo de API gasto em klines por scan
+KLINE_REQUEST_WEIGHT = 2     # Peso Binance de /api/v3/klines
+HTTP_POOL_SIZE = 20          # Conexões HTTP mantidas abertas com a Binance
+HTTP_TIMEOUT = 10            # Prazo (s) de cada chamada REST
+ASYNC_LOOP = True            # Carteira e scanner no mesmo ciclo, em paralelo (asyncio + aiohttp)
+
+# Limitador de peso da API (REQUEST_WEIGHT por IP, janela de 1 minuto)
+RATE_LIMIT_WEIGHT_PER_MIN = 6000
+RATE_LIMIT_RESERVE = {'exit': 0.0, 'normal': 0.10, 'scan': 0.40}  # Fração do limite que cada prioridade deixa livre
+RATE_LIMIT_MAX_WAIT = {'exit': 120, 'normal': 30, 'scan': 2}      # Segundos de espera antes de desistir da chamada
+
+# Snapshot de Preços (1 chamada por ciclo para todas as posições)
+PRICE_SNAPSHOT_MAX_AGE = 30  # Segundos até o snapshot ser considerado velho
+ACCOUNT_MAX_AGE = 120        # Segundos até os saldos locais serem relidos (normalmente 1 /account por ciclo)
+API_PRICE_MAX_AGE = 10       # Cache de preços da API (dashboard): idade máxima servida
+API_PRICE_REFRESH = 3        # Intervalo (s) do refresher em background da API (0 = só sob demanda)
+
+# Reconciliação conta Binance x banco (reconcile.py / sync.py)
+RECONCILE_ON_STARTUP = True     # Sincroniza posições e equity com a conta real antes do primeiro ciclo (ignorado em SIMULATION_MODE)
+RECONCILE_DUST_USDT = 1.0       # Saldos abaixo disso (em USDT) são poeira: não viram posição
+RECONCILE_QTY_TOLERANCE = 0.01  # Saldo real até 1% abaixo do base_qty é comissão/arredondamento: não corrige
+
+# Stream de preços em tempo real (saídas avaliadas a cada tick)
+PRICE_STREAM_ENABLED = True
+PRICE_STREAM_URL = 'wss://stream.binance.com:9443'  # ws://127.0.0.1:8765 para o replay local
+PRICE_STREAM_RECORD_FILE = None                     # Ex: 'ticks.jsonl' para gravar ticks para replay
+PRICE_STREAM_EXIT_RETRY = 60                        # Segundos sem nova tentativa após uma saída via stream falhar (~1 ciclo)
+
+# Índice local de filtros (exchangeInfo)
+EXCHANGE_INFO_CACHE_FILE = 'exchange_info_cache.json'
+EXCHANGE_INFO_REFRESH = 6 * 3600  # Segundos entre renovações em segundo plano
+
+# Cache de Klines (busca incremental via startTime)
+KLINE_CACHE_MAX_SYMBOLS = 40   # LRU: séries mantidas em memória (manter >= SCAN_CANDIDATES)
+KLINE_CACHE_PERSIST = True     # Salva no SQLite para aquecer após restart
+
+# Armazém de séries temporais (velas + snapshots do scanner), fora do banco de trading
+MARKET_STORE_ENABLED = True
+MARKET_STORE_DIR = 'market_data'
+
+# Banco de Dados (estado em memória + write-behind)
+DB_FLUSH_INTERVAL = 5          # Segundos máximos entre commits de topo/status/equity
+DB_READER_POOL_SIZE = 4        # Conexões de leitura (API/Dashboard)
+DB_STATEMENT_CACHE = 256       # Statements compilados reaproveitados por conexão
+DB_CACHE_SIZE_KB = 16_384      # PRAGMA cache_size (16 MB)
+DB_MMAP_SIZE = 134_217_728     # PRAGMA mmap_size (128 MB)
+
+# Retenção das tabelas de log (limpeza agendada por marca d'água de id)
+DB_RETENTION = {
+    'system_logs': 2000,
+    'history': 43_200,          # ~30 dias de ciclos (o gráfico recebe a série reduzida)
+    'market_data_history': 10_000,
+    'events': 5000,
+}
+DB_RETENTION_INTERVAL = 300    # Segundos entre limpezas
+
+# Push para o dashboard (/api/stream, Server-Sent Events)
+EVENTS_ENABLED = True          # Bot grava os eventos de mudança na tabela events (outbox)
+STREAM_POLL_INTERVAL = 0.5     # Segundos entre leituras do outbox pela API (uma leitura para todos os clientes)
+STREAM_PRICE_INTERVAL = 3      # Segundos entre ticks de PnL das posições abertas
+STREAM_QUEUE_SIZE = 1000       # Eventos pendentes por cliente antes de forçar um novo snapshot
+HISTORY_CHART_POINTS = 500     # Pontos do gráfico de equity numa carga completa (downsampling no servidor)
+CANDIDATE_GENERATIONS_KEEP = 60 # Scans da watchlist guardados para diff no dashboard (~1h de ciclos)
+
+# Instrumentação (spans por ciclo, latência HTTP/SQLite/Telegram -> /api/metrics)
+METRICS_ENABLED = True
+METRICS_RING_SIZE = 100                  # Últimos ciclos guardados em memória
+METRICS_FILE = 'metrics_snapshot.json'   # Snapshot do bot lido pela API
 
 # Telegram
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 TELEGRAM_ENABLED = True
+TELEGRAM_QUEUE_SIZE = 100       # Mensagens pendentes antes de descartar por prioridade
+TELEGRAM_COALESCE_WINDOW = 2.0  # Segundos para juntar rajadas em um único resumo
+TELEGRAM_MAX_RETRIES = 5
 
 if TELEGRAM_ENABLED and (not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID):
     print("⚠️ AVISO: Configuração do Telegram habilitada mas chaves não encontradas no .env")
@@ -0,0 +1,134 @@
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+import config
+from metrics import metrics
+
+
+class ConnectionManager:
+    """
+    Conexões SQLite de vida longa:
+    - 1 conexão de escrita (protegida por lock), com commits agrupáveis via transaction()
+      (synchronous=FULL só nos commits duráveis: transaction(durable=True))
+    - pool pequeno de leitura (query_only); cada thread tende a reaproveitar a mesma conexão
+    Todas com WAL + synchronous=NORMAL, mmap e cache de statements compilados.
+    """
+    def __init__(self, db_file, readers=None):
+        self.db_file = db_file
+        self.pool_size = readers or config.DB_READER_POOL_SIZE
+
+        self.lock = threading.RLock()
+        self.writer = self._connect()
+
+        self._local = threading.local()
+        self._readers_cond = threading.Condition()
+        self._all_readers = []
+        self._free_readers = []
+
+    def _connect(self, readonly=False):
+        conn = sqlite3.connect(self.db_file, check_same_thread=False,
+                               cached_statements=config.DB_STATEMENT_CACHE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Seguro em WAL (pode perder só o último commit em queda de energia)
+        conn.execute(f"PRAGMA cache_size=-{config.DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={config.DB_MMAP_SIZE}")
+        conn.execute("PRAGMA busy_timeout=5000")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    # --- Escrita ---
+    @contextmanager
+    def write(self):
+        """Bloco de escrita: comita ao sair, a menos que esteja dentro de um transaction(). Erro = rollback."""
+        with self.lock:
+            try:
+                yield self.writer
+            except BaseException:
+                self.writer.rollback()  # Nada pela metade fica pendente para o próximo commit de outra thread
+                raise
+            self.commit()
+
+    def commit(self):
+        """Comita agora, ou adia até o fim do transaction() aberto por esta thread."""
+        with self.lock:
+            if not getattr(self._local, 'tx_depth', 0):
+                self._commit('write')
+
+    @contextmanager
+    def transaction(self, durable=False):
+        """
+        Bloco atômico CURTO: segura o lock de escrita do início ao fim, então nenhuma outra thread
+        comita (nem leva junto) escritas pela metade; write()/commit() internos viram um único commit.
+        Comita só se o bloco terminar sem erro; qualquer exceção desfaz tudo (rollback).
+        durable=True (compra/venda): o commit roda com synchronous=FULL (fsync do WAL), valendo para
+        o bloco mais externo; o SQLite não troca o nível no meio de uma transação.
+        Não fazer chamadas de rede aqui dentro: o lock do SQLite fica preso até o fim do bloco.
+        """
+        with self.lock:
+            depth = getattr(self._local, 'tx_depth', 0)
+            full = durable and depth == 0
+            if full:
+                if self.writer.in_transaction:
+                    self._commit('write')  # Pendência solta de antes: não entra no commit durável
+                self.writer.execute("PRAGMA synchronous=FULL")
+            self._local.tx_depth = depth + 1
+            try:
+                yield self.writer
+                self._local.tx_depth = depth
+                if depth == 0:
+                    self._commit('durable' if full else 'transaction')
+            except BaseException:
+                self._local.tx_depth = depth
+                self.writer.rollback()
+                raise
+            finally:
+                if full:
+                    self.writer.execute("PRAGMA synchronous=NORMAL")
+
+    def _commit(self, kind):
+        started = time.perf_counter()
+        self.writer.commit()
+        metrics.observe('sqlite_commit_seconds', time.perf_counter() - started, kind=kind)
+
+    # --- Leitura ---
+    @contextmanager
+    def reader(self):
+        """Empresta uma conexão de leitura (sqlite3.Row), preferindo a última usada por esta thread."""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            with self._readers_cond:
+                self._free_readers.append(conn)
+                self._readers_cond.notify()
+
+    def _acquire_reader(self):
+        preferred = getattr(self._local, 'reader', None)
+        with self._readers_cond:
+            while True:
+                if preferred is not None and preferred in self._free_readers:
+                    self._free_readers.remove(preferred)
+                    return preferred
+                if self._free_readers:
+                    conn = self._free_readers.pop()
+                    break
+                if len(self._all_readers) < self.pool_size:
+                    conn = self._connect(readonly=True)
+                    self._all_readers.append(conn)
+                    break
+                self._readers_cond.wait()
+        self._local.reader = conn
+        return conn
+
+    def close(self):
+        with self.lock:
+            self.writer.commit()
+            self.writer.close()
+        with self._readers_cond:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers = []
+            self._free_readers = []
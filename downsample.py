@@ -0,0 +1,75 @@
+from datetime import datetime
+
+# ==============================================================================
+# 📉 DOWNSAMPLING DE SÉRIES PARA GRÁFICOS
+# - lttb: Largest-Triangle-Three-Buckets (mantém o formato visual da curva)
+# - minmax: mínimo e máximo de cada bucket (nunca esconde picos/quedas)
+# Ambos mantêm o primeiro e o último ponto (o último é o cursor do cliente).
+# ==============================================================================
+
+
+def _x(point):
+    """Eixo X em segundos a partir do timestamp 'YYYY-MM-DD HH:MM:SS' (buracos de downtime contam)"""
+    return datetime.fromisoformat(point['timestamp']).timestamp()
+
+
+def lttb(points, threshold, key='equity'):
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    xs = [_x(p) for p in points]
+    ys = [p[key] for p in points]
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0  # Último ponto escolhido
+
+    for i in range(threshold - 2):
+        # Média do próximo bucket (o terceiro vértice do triângulo)
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[start:end]) / (end - start)
+        avg_y = sum(ys[start:end]) / (end - start)
+
+        # Ponto do bucket atual que forma o maior triângulo com `a` e a média
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points, buckets, key='equity'):
+    n = len(points)
+    if buckets * 2 >= n or buckets < 1:
+        return list(points)
+
+    size = (n - 2) / buckets
+    sampled = [points[0]]
+    for i in range(buckets):
+        chunk = range(int(i * size) + 1, int((i + 1) * size) + 1)
+        lo = min(chunk, key=lambda j: points[j][key])
+        hi = max(chunk, key=lambda j: points[j][key])
+        for j in sorted({lo, hi}):  # Ordem cronológica dentro do bucket
+            sampled.append(points[j])
+    sampled.append(points[-1])
+    return sampled
+
+
+METHODS = {'lttb': lttb, 'minmax': minmax}
+
+
+def downsample(points, resolution, method='lttb', key='equity'):
+    """resolution = pontos desejados (minmax usa resolution/2 buckets)"""
+    if not resolution:
+        return points
+    if method == 'minmax':
+        return minmax(points, max(resolution // 2, 1), key)
+    return lttb(points, resolution, key)
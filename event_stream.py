@@ -0,0 +1,105 @@
+import json
+import asyncio
+import config
+
+# ==============================================================================
+# 📡 PUSH PARA O DASHBOARD (Server-Sent Events)
+# O bot grava cada mudança na tabela `events` (outbox, mesmo commit da alteração).
+# Um único tailer por processo da API lê só as linhas novas (WHERE id > cursor, pela PK)
+# e distribui para todos os clientes conectados: leituras do banco não crescem com o
+# número de abas abertas. Cliente novo recebe um snapshot e depois só os deltas.
+# ==============================================================================
+
+RESYNC = object()  # Cliente ficou para trás: manda um snapshot novo em vez dos deltas perdidos
+
+
+def sse(kind, data, event_id=None):
+    """Uma mensagem no formato text/event-stream"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventHub:
+    """
+    db: PortfolioManager (read_events / last_event_id / data)
+    position_view(symbol, data): converte a posição crua no formato do /api/positions (com preço e PnL)
+    """
+    def __init__(self, db, position_view, poll_interval=None, price_interval=None, queue_size=None):
+        self.db = db
+        self.position_view = position_view
+        self.poll_interval = poll_interval or config.STREAM_POLL_INTERVAL
+        self.price_interval = price_interval or config.STREAM_PRICE_INTERVAL
+        self.queue_size = queue_size or config.STREAM_QUEUE_SIZE
+
+        self.cursor = None      # Último id do outbox já distribuído
+        self._subscribers = set()
+        self._task = None
+        self._last_pnl = {}     # symbol -> (preço, pnl%) do último tick enviado
+
+    # --- Clientes ---
+    def subscribe(self):
+        """Registra um cliente (antes de montar o snapshot: nada entre os dois se perde)"""
+        self._ensure_started()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def _broadcast(self, message):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Cliente lento: descarta o atraso e pede um snapshot completo
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    # --- Tailer ---
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            # Cursor no fim do outbox ANTES do snapshot do cliente: o que vier depois chega como delta
+            self.cursor = self.db.last_event_id()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_prices = loop.time()
+        while self._subscribers:
+            try:
+                events = await asyncio.to_thread(self.db.read_events, self.cursor)
+                for event_id, kind, payload in events:
+                    self.cursor = event_id
+                    self._broadcast(self._render(event_id, kind, payload))
+
+                if loop.time() >= next_prices:
+                    next_prices = loop.time() + self.price_interval
+                    ticks = await asyncio.to_thread(self._price_ticks)
+                    if ticks:
+                        self._broadcast(sse('prices', ticks))
+            except Exception as e:
+                print(f"⚠️ Erro no stream de eventos: {e}")
+            await asyncio.sleep(self.poll_interval)
+        self._task = None  # Sem clientes: para de ler o outbox até o próximo conectar
+
+    def _render(self, event_id, kind, payload):
+        if kind == 'position':
+            symbol = payload.pop('symbol')
+            payload = self.position_view(symbol, payload)
+            self._last_pnl[symbol] = (payload['current_price'], payload['pnl_est_percent'])
+        elif kind == 'position_closed':
+            self._last_pnl.pop(payload['symbol'], None)
+        return sse(kind, payload, event_id)
+
+    def _price_ticks(self):
+        """PnL ao vivo das posições abertas (preço do cache da API); só manda o que mudou"""
+        ticks = {}
+        for symbol, data in list(self.db.data['active_positions'].items()):
+            view = self.position_view(symbol, data)
+            key = (view['current_price'], view['pnl_est_percent'])
+            if self._last_pnl.get(symbol) != key:
+                self._last_pnl[symbol] = key
+                ticks[symbol] = {k: view[k] for k in ('current_price', 'pnl_est_percent', 'pnl_usdt')}
+        return ticks
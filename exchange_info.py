@@ -0,0 +1,128 @@
+import os
+import json
+import math
+import time
+import threading
+import config
+
+
+class SymbolFilters:
+    """
+    Índice local dos filtros de todos os pares (LOT_SIZE, MIN_NOTIONAL/NOTIONAL, PRICE_FILTER, status).
+    Carregado uma vez (disco ou /api/v3/exchangeInfo completo) e renovado em segundo plano,
+    para que compras e vendas normalizem quantidades sem nenhuma chamada extra.
+    """
+    def __init__(self, api_client, cache_file=None, max_age=None):
+        self.api = api_client
+        self.cache_file = cache_file or config.EXCHANGE_INFO_CACHE_FILE
+        self.max_age = max_age or config.EXCHANGE_INFO_REFRESH
+        self.symbols = {}
+        self.loaded_at = 0.0
+        self._thread = None
+
+    # --- Carga ---
+    def load(self):
+        """Usa o cache em disco se ainda estiver fresco; senão baixa da Binance."""
+        if self._load_disk() and time.time() - self.loaded_at < self.max_age:
+            print(f"📐 Filtros de {len(self.symbols)} pares carregados do disco")
+            return True
+        return self.refresh()
+
+    def refresh(self):
+        data = self.api.get_exchange_info()
+        if not data or 'symbols' not in data:
+            print("⚠️ Falha ao atualizar exchangeInfo (mantendo índice atual)")
+            return False
+
+        self.symbols = {s['symbol']: self._parse(s) for s in data['symbols']}
+        self.loaded_at = time.time()
+        self._save_disk()
+        print(f"📐 Filtros de {len(self.symbols)} pares atualizados (exchangeInfo)")
+        return True
+
+    def start_background_refresh(self):
+        """Renova o índice periodicamente numa thread daemon."""
+        if self._thread: return
+        def loop():
+            while True:
+                time.sleep(max(self.max_age - (time.time() - self.loaded_at), 60))
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Erro ao renovar exchangeInfo: {e}")
+        self._thread = threading.Thread(target=loop, name="exchange-info-refresh", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _parse(s):
+        info = {
+            'status': s.get('status'),
+            'step_size': None, 'min_qty': 0.0,
+            'tick_size': None, 'min_notional': 0.0,
+        }
+        for f in s.get('filters', []):
+            if f['filterType'] == 'LOT_SIZE':
+                info['step_size'] = float(f['stepSize'])
+                info['min_qty'] = float(f['minQty'])
+            elif f['filterType'] == 'PRICE_FILTER':
+                info['tick_size'] = float(f['tickSize'])
+            elif f['filterType'] in ('MIN_NOTIONAL', 'NOTIONAL'):
+                info['min_notional'] = float(f.get('minNotional', 0.0))
+        return info
+
+    def _load_disk(self):
+        if not os.path.exists(self.cache_file): return False
+        try:
+            with open(self.cache_file, 'r') as f:
+                cached = json.load(f)
+            self.symbols = cached['symbols']
+            self.loaded_at = cached['loaded_at']
+            return True
+        except Exception as e:
+            print(f"⚠️ Cache de exchangeInfo inválido: {e}")
+            return False
+
+    def _save_disk(self):
+        tmp = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'loaded_at': self.loaded_at, 'symbols': self.symbols}, f)
+            os.replace(tmp, self.cache_file)
+        except Exception as e:
+            print(f"⚠️ Não foi possível salvar exchangeInfo em disco: {e}")
+
+    # --- Consultas (sem rede) ---
+    def get(self, symbol):
+        return self.symbols.get(symbol)
+
+    def is_trading(self, symbol):
+        """Par negociável? Sem índice carregado, não bloqueia nada."""
+        if not self.symbols: return True
+        info = self.symbols.get(symbol)
+        return bool(info) and info['status'] == 'TRADING'
+
+    def step_size(self, symbol):
+        info = self.symbols.get(symbol)
+        if info: return info['step_size']
+        # Par desconhecido (listado depois da última carga): consulta pontual
+        return self.api.get_symbol_step_size(symbol)
+
+    def normalize_qty(self, symbol, qty):
+        """Arredonda a quantidade para baixo no múltiplo do stepSize (LOT_SIZE)."""
+        step_size = self.step_size(symbol)
+        if not step_size: return qty
+        precision = int(round(-math.log(step_size, 10), 0))
+        qty = math.floor(qty / step_size) * step_size
+        return round(qty, precision)
+
+    def min_qty(self, symbol):
+        info = self.symbols.get(symbol)
+        return info['min_qty'] if info else 0.0
+
+    def min_notional(self, symbol):
+        info = self.symbols.get(symbol)
+        return info['min_notional'] if info else 0.0
+
+    def check_notional(self, symbol, quote_amount):
+        """Valor em USDT atende o mínimo do par?"""
+        return quote_amount >= self.min_notional(symbol)
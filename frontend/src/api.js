@@ -1,12 +1,21 @@
 import axios from 'axios';
 
-const API_URL = 'http://localhost:8000/api';
+export const API_URL = 'http://localhost:8000/api';
+export const HISTORY_POINTS = 500; // Same size as a full /api/history load (HISTORY_CHART_POINTS)
+
+// Appends only points newer than the last cached id (no duplicates) and keeps the chart bounded
+export const mergeHistory = (current, fresh) => {
+    const lastId = current.length ? current[current.length - 1].id : -Infinity;
+    const newer = fresh.filter(p => p.id > lastId);
+    return newer.length ? [...current, ...newer].slice(-HISTORY_POINTS) : current;
+};
 
 export const api = {
     getSummary: () => axios.get(`${API_URL}/summary`).then(res => res.data),
     getPositions: () => axios.get(`${API_URL}/positions`).then(res => res.data),
-    getHistory: async () => {
-        const response = await axios.get(`${API_URL}/history`);
+    // params: { since_id } for only the new points, { points, method } for server-side downsampling
+    getHistory: async (params = {}) => {
+        const response = await axios.get(`${API_URL}/history`, { params });
         return response.data;
     },
     getLogs: async () => {
@@ -17,6 +26,14 @@ export const api = {
         const response = await axios.get(`${API_URL}/candidates`);
         return response.data;
     },
+    getTrades: async (params = {}) => {
+        const response = await axios.get(`${API_URL}/trades`, { params });
+        return response.data;
+    },
+    getStats: async (days = 30) => {
+        const response = await axios.get(`${API_URL}/stats`, { params: { days } });
+        return response.data;
+    },
     sellPosition: async (symbol) => {
         const response = await axios.post(`${API_URL}/trade/sell/${symbol}`);
         return response.data;
@@ -1,6 +1,7 @@
 import React from 'react';
-import { useQuery } from '@tanstack/react-query';
-import { api } from '../api';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
+import { api, mergeHistory } from '../api';
+import { useLiveStream } from '../useLiveStream';
 import KPISection from './KPISection';
 import EquityChart from './EquityChart';
 import PositionsTable from './PositionsTable';
@@ -8,32 +9,41 @@ import CandidatesTable from './CandidatesTable';
 import { RefreshCw } from 'lucide-react';
 
 const Dashboard = () => {
+    // 0. Live push (SSE). While connected, polling is off; if it drops, the intervals below take over
+    const live = useLiveStream();
+    const queryClient = useQueryClient();
+
     // 1. Fetch Summary (Wallet KPIs)
     const { data: summary, isLoading: loadingSummary, refetch: refetchSummary } = useQuery({
         queryKey: ['summary'],
         queryFn: api.getSummary,
-        refetchInterval: 5000, // 5s
+        refetchInterval: live ? false : 5000, // 5s (polling fallback)
     });
 
     // 2. Fetch Positions
     const { data: positions, isLoading: loadingPositions, refetch: refetchPositions } = useQuery({
         queryKey: ['positions'],
         queryFn: api.getPositions,
-        refetchInterval: 3000, // 3s (Faster for PnL)
+        refetchInterval: live ? false : 3000, // 3s (Faster for PnL)
     });
 
-    // 3. Fetch History (Chart)
+    // 3. Fetch History (Chart): full (downsampled) load once, then only points after the last id
     const { data: history, isLoading: loadingHistory, refetch: refetchHistory } = useQuery({
         queryKey: ['history'],
-        queryFn: api.getHistory,
-        refetchInterval: 60000, // 1m
+        queryFn: async () => {
+            const current = queryClient.getQueryData(['history']);
+            if (!current?.length) return api.getHistory();
+            const fresh = await api.getHistory({ since_id: current[current.length - 1].id });
+            return mergeHistory(current, fresh);
+        },
+        refetchInterval: live ? false : 60000, // 1m
     });
 
     // 4. Fetch Candidates (Watchlist)
     const { data: candidates, isLoading: loadingCandidates, refetch: refetchCandidates } = useQuery({
         queryKey: ['candidates'],
         queryFn: api.getCandidates,
-        refetchInterval: 5000, // 5s
+        refetchInterval: live ? false : 5000, // 5s
     });
 
     const handleRefresh = () => {
@@ -88,6 +98,7 @@ const Dashboard = () => {
                                     <span className="relative inline-flex rounded-full h-3 w-3 bg-emerald-500"></span>
                                 </span>
                                 <span className="text-sm text-emerald-400 font-medium">Running</span>
+                                <span className="text-xs text-slate-500 ml-auto">{live ? 'Live' : 'Polling'}</span>
                             </div>
                             <p className="text-xs text-slate-600 mt-2">
                                 Last update: {summary?.updated_at || '...'}
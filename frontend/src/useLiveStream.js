@@ -0,0 +1,47 @@
+import { useEffect, useState } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import { API_URL, mergeHistory } from './api';
+
+// Applies /api/stream (Server-Sent Events) straight into the react-query cache.
+// Returns true while the stream is connected; the dashboard falls back to polling otherwise.
+export const useLiveStream = () => {
+    const queryClient = useQueryClient();
+    const [live, setLive] = useState(false);
+
+    useEffect(() => {
+        if (typeof EventSource === 'undefined') return; // Old browser: keep polling
+
+        const source = new EventSource(`${API_URL}/stream`);
+        const on = (kind, handler) => source.addEventListener(kind, (e) => handler(JSON.parse(e.data)));
+        const setPositions = (update) => queryClient.setQueryData(['positions'], (old) => update(old || []));
+
+        // Full state on connect (and again if this client falls behind)
+        on('snapshot', (snap) => {
+            queryClient.setQueryData(['summary'], snap.summary);
+            queryClient.setQueryData(['positions'], snap.positions);
+            queryClient.setQueryData(['candidates'], snap.candidates);
+            queryClient.setQueryData(['history'], snap.history);
+            setLive(true);
+        });
+
+        // Deltas
+        on('summary', (summary) => queryClient.setQueryData(['summary'], summary));
+        on('position', (pos) => setPositions((old) =>
+            old.some(p => p.symbol === pos.symbol)
+                ? old.map(p => (p.symbol === pos.symbol ? pos : p))
+                : [...old, pos]
+        ));
+        on('position_closed', ({ symbol }) => setPositions((old) => old.filter(p => p.symbol !== symbol)));
+        on('prices', (ticks) => setPositions((old) => old.map(p => (ticks[p.symbol] ? { ...p, ...ticks[p.symbol] } : p))));
+        on('candidates', (candidates) => queryClient.setQueryData(['candidates'], candidates));
+        on('history', (point) => queryClient.setQueryData(['history'], (old) => (old ? mergeHistory(old, [point]) : old)));
+        on('log', (log) => queryClient.setQueryData(['logs'], (old) => (old ? [log, ...old].slice(0, 50) : old)));
+
+        // EventSource reconnects by itself; polling covers the gap
+        source.onerror = () => setLive(false);
+
+        return () => source.close();
+    }, [queryClient]);
+
+    return live;
+};
@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict, deque
+import config
+
+
+def _rsi_value(avg_gain, avg_loss):
+    if avg_loss == 0: return 100.0
+    return 100 - (100 / (1 + (avg_gain / avg_loss)))
+
+
+class IndicatorState:
+    """
+    Estado incremental de RSI (Wilder), EMA e RVOL de um símbolo.
+    update() consome uma vela FECHADA em O(1); provisional() calcula os valores
+    incluindo a vela em formação sem alterar o estado.
+    As contas seguem exatamente a mesma ordem de BotController.calculate_*,
+    então os resultados são idênticos (bit a bit) aos das funções escalares sobre a mesma série.
+    """
+    RVOL_WINDOW = 24  # Média das 24 velas anteriores (igual a calculate_rvol)
+
+    def __init__(self, rsi_period=None, ema_period=100):
+        self.rsi_period = rsi_period or config.RSI_PERIOD
+        self.ema_period = ema_period
+        self.multiplier = 2 / (ema_period + 1)
+
+        self.count = 0
+        self.last_close = None
+
+        # RSI: ganhos/perdas até completar o período, depois médias de Wilder
+        self._seed_gains, self._seed_losses = [], []
+        self.avg_gain = None
+        self.avg_loss = None
+
+        # EMA: preços até completar o período (SMA inicial), depois EMA
+        self._seed_prices = []
+        self.ema = None
+
+        # RVOL: últimos 25 volumes fechados
+        self.volumes = deque(maxlen=self.RVOL_WINDOW + 1)
+
+    # --- Passos puros (não alteram o estado) ---
+    def _rsi_step(self, close):
+        if self.last_close is None:
+            return None, None, self._seed_gains, self._seed_losses
+
+        delta = close - self.last_close
+        gain = max(delta, 0)
+        loss = abs(min(delta, 0))
+        period = self.rsi_period
+
+        if self.avg_gain is not None:
+            avg_gain = (self.avg_gain * (period - 1) + gain) / period
+            avg_loss = (self.avg_loss * (period - 1) + loss) / period
+            return avg_gain, avg_loss, self._seed_gains, self._seed_losses
+
+        seed_gains = self._seed_gains + [gain]
+        seed_losses = self._seed_losses + [loss]
+        if len(seed_gains) == period:
+            return sum(seed_gains) / period, sum(seed_losses) / period, [], []
+        return None, None, seed_gains, seed_losses
+
+    def _ema_step(self, close):
+        if self.ema is not None:
+            return (close - self.ema) * self.multiplier + self.ema, self._seed_prices
+
+        seed_prices = self._seed_prices + [close]
+        if len(seed_prices) == self.ema_period:
+            return sum(seed_prices) / self.ema_period, []
+        return None, seed_prices
+
+    def _rvol(self, current_vol, previous):
+        if len(previous) < self.RVOL_WINDOW: return 1.0
+        avg_vol = sum(previous) / self.RVOL_WINDOW
+        if avg_vol == 0: return 0.0
+        return current_vol / avg_vol
+
+    # --- API ---
+    def update(self, close, volume):
+        """Consome uma vela fechada (O(1))."""
+        self.avg_gain, self.avg_loss, self._seed_gains, self._seed_losses = self._rsi_step(close)
+        self.ema, self._seed_prices = self._ema_step(close)
+        self.volumes.append(volume)
+        self.last_close = close
+        self.count += 1
+
+    def values(self):
+        """Indicadores da última vela fechada: (rsi, ema, rvol)"""
+        rsi = _rsi_value(self.avg_gain, self.avg_loss) if self.avg_gain is not None else None
+        previous = list(self.volumes)[:-1] if len(self.volumes) > self.RVOL_WINDOW else []
+        rvol = self._rvol(self.volumes[-1], previous) if self.volumes else 1.0
+        return rsi, self.ema, rvol
+
+    def provisional(self, close, volume):
+        """Indicadores considerando a vela em formação, sem alterar o estado: (rsi, ema, rvol)"""
+        avg_gain, avg_loss, _, _ = self._rsi_step(close)
+        rsi = _rsi_value(avg_gain, avg_loss) if avg_gain is not None else None
+        ema, _ = self._ema_step(close)
+        previous = list(self.volumes)[-self.RVOL_WINDOW:] if len(self.volumes) >= self.RVOL_WINDOW else []
+        return rsi, ema, self._rvol(volume, previous)
+
+
+class IndicatorEngine:
+    """
+    Mantém um IndicatorState por símbolo, alimentado pelas séries do KlineCache.
+    O estado é semeado SEMPRE pela janela que o scanner buscou (as mesmas velas que
+    calculate_rsi/calculate_ema veriam), nunca carregado de scans anteriores: o resultado
+    não depende de quanto tempo o cache está quente, de evicção do LRU nem de restart.
+    Enquanto as velas fechadas da janela não mudam (scans dentro da mesma vela), o estado é
+    reaproveitado e só a vela em formação é calculada (O(1)); fechou vela nova, re-semeia.
+    """
+    def __init__(self, max_symbols=None, ema_period=100):
+        self.max_symbols = max_symbols or config.KLINE_CACHE_MAX_SYMBOLS
+        self.ema_period = ema_period
+        self._states = OrderedDict()  # symbol -> (IndicatorState, chave da janela fechada)
+        self._lock = threading.Lock()
+
+    def sync(self, symbol, series):
+        """
+        series: [(open_time, close, volume)] com a última vela ainda em formação.
+        Retorna (rsi, ema, rvol) provisórios para a vela atual, idênticos às funções escalares sobre a série.
+        """
+        if not series: return None, None, 1.0
+        closed, (_, close, volume) = series[:-1], series[-1]
+        # Velas fechadas não mudam: primeira/última open_time + tamanho identificam a janela
+        key = (closed[0][0], closed[-1][0], len(closed)) if closed else None
+
+        with self._lock:
+            state, last_key = self._states.get(symbol, (None, None))
+            if state is None or last_key != key:
+                state = IndicatorState(ema_period=self.ema_period)
+                for _, c, v in closed:
+                    state.update(c, v)
+
+            self._states[symbol] = (state, key)
+            self._states.move_to_end(symbol)
+            while len(self._states) > self.max_symbols:
+                self._states.popitem(last=False)
+
+            return state.provisional(close, volume)
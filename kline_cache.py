@@ -0,0 +1,142 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+import config
+
+# Duração de cada intervalo em ms (para detectar buracos na série)
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '12h': 43_200_000, '1d': 86_400_000,
+}
+
+MAX_FETCH_LIMIT = 1000  # Limite da Binance por chamada de klines
+
+
+class KlineCache:
+    """
+    Ring buffer de velas por (symbol, interval).
+    Na primeira vez baixa a série completa; depois busca apenas as velas novas
+    a partir da última abertura conhecida (startTime), substituindo a vela ainda em formação.
+    Séries que saem do Top N são descartadas por LRU e podem ser persistidas no SQLite.
+    """
+    def __init__(self, api_client, db=None, size=None, max_symbols=None, async_api=None):
+        self.api = api_client
+        self.async_api = async_api # AsyncBinanceClient (opcional, para aget_series)
+        self.db = db if config.KLINE_CACHE_PERSIST else None
+        self.size = size or config.KLINE_LIMIT
+        self.max_symbols = max_symbols or config.KLINE_CACHE_MAX_SYMBOLS
+
+        self._series = OrderedDict()  # (symbol, interval) -> deque[(open_time, close, volume)]
+        self._dirty = {}              # (symbol, interval) -> menor open_time ainda não persistido
+        self._lock = threading.Lock() # scan_market busca vários símbolos em paralelo
+
+    def get_series(self, symbol, interval='1h'):
+        """Atualiza e retorna a série crua [(open_time, close, volume)], última vela em formação."""
+        key, series, request = self._plan(symbol, interval)
+        new_rows = self.api.get_klines_since(symbol, interval, **request)
+        result, evicted = self._apply(key, series, new_rows)
+        self._save_evicted(evicted)
+        return result
+
+    async def aget_series(self, symbol, interval='1h'):
+        """Mesmo que get_series, buscando pelo AsyncBinanceClient (self.async_api). Leituras/escritas no SQLite saem do event loop."""
+        if self.db and not self._cached(symbol, interval):
+            key, series, request = await asyncio.to_thread(self._plan, symbol, interval)
+        else:
+            key, series, request = self._plan(symbol, interval)
+        new_rows = await self.async_api.get_klines_since(symbol, interval, **request)
+        result, evicted = self._apply(key, series, new_rows)
+        if evicted:
+            await asyncio.to_thread(self._save_evicted, evicted)
+        return result
+
+    def get_klines(self, symbol, interval='1h', limit=110):
+        """Mesmo formato de BinanceClient.get_klines: [(close, volume)]"""
+        series = self.get_series(symbol, interval)
+        return [(c, v) for _, c, v in series[-limit:]]
+
+    def persist(self):
+        """Grava no SQLite apenas as velas alteradas desde a última persistência."""
+        if not self.db: return
+        with self._lock:
+            pending = [(key, since, list(self._series.get(key, ()))) for key, since in self._dirty.items()]
+            self._dirty.clear()
+        for (symbol, interval), since, series in pending:
+            if series:
+                rows = [r for r in series if r[0] >= since]
+                self.db.save_klines(symbol, interval, rows, keep_from=series[0][0])
+
+    # --- Internos ---
+    def _cached(self, symbol, interval):
+        with self._lock:
+            return (symbol, interval) in self._series
+
+    def _plan(self, symbol, interval):
+        """
+        Decide a busca: (key, série atual ou None, parâmetros de get_klines_since).
+        Série None = busca completa; senão, só as velas a partir da última abertura conhecida.
+        """
+        key = (symbol, interval)
+        with self._lock:
+            series = self._series.get(key)
+            series = deque(series, maxlen=self.size) if series else None # Cópia: a busca roda fora do lock
+
+        if series is None and self.db:
+            rows = self.db.load_klines(symbol, interval, self.size)
+            if rows:
+                series = deque(rows, maxlen=self.size)
+
+        if series and self._can_extend(series, interval):
+            return key, series, {'start_time': series[-1][0], 'limit': self._delta_limit(series, interval)}
+        return key, None, {'limit': self.size}
+
+    def _apply(self, key, series, new_rows):
+        """Grava a série no buffer. Retorna (série, velas descartadas pelo LRU a persistir fora do lock)."""
+        if not new_rows: return [], []
+        with self._lock:
+            if series is not None:
+                self._merge(key, series, new_rows)
+            else:
+                series = deque(new_rows, maxlen=self.size)
+                self._dirty[key] = new_rows[0][0]
+            self._series[key] = series
+            self._series.move_to_end(key)
+            evicted = self._evict()
+        return list(series), evicted
+
+    def _can_extend(self, series, interval):
+        """Só vale a busca incremental se o buraco desde a última vela couber no buffer."""
+        step = INTERVAL_MS.get(interval)
+        if not step: return False
+        missing = (int(time.time() * 1000) - series[-1][0]) // step
+        return len(series) >= self.size and missing < self.size
+
+    def _delta_limit(self, series, interval):
+        missing = (int(time.time() * 1000) - series[-1][0]) // INTERVAL_MS[interval]
+        return int(min(max(missing + 2, 2), MAX_FETCH_LIMIT))
+
+    def _merge(self, key, series, new_rows):
+        # Descarta a vela em formação (e qualquer sobreposição) antes de anexar as novas
+        first_new = new_rows[0][0]
+        while series and series[-1][0] >= first_new:
+            series.pop()
+        series.extend(new_rows)
+        self._dirty[key] = min(self._dirty.get(key, first_new), first_new)
+
+    def _evict(self):
+        """Descarta as séries menos usadas (chamado com o lock). Retorna o que precisa ser persistido."""
+        evicted = []
+        while len(self._series) > self.max_symbols:
+            key, series = self._series.popitem(last=False)
+            # Persiste antes de descartar para o restart/retorno ao Top N sair barato
+            if self.db and key in self._dirty:
+                since = self._dirty.pop(key)
+                evicted.append((key, [r for r in series if r[0] >= since], series[0][0]))
+        return evicted
+
+    def _save_evicted(self, evicted):
+        """Escreve no SQLite as séries descartadas (fora do lock: os outros símbolos do scan não esperam o disco)."""
+        for (symbol, interval), rows, keep_from in evicted:
+            self.db.save_klines(symbol, interval, rows, keep_from=keep_from)
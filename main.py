@@ -2,24 +2,54 @@ import time
 import config
 from storage import PortfolioManager
 from binance_api import BinanceClient
+from async_binance_api import AsyncBinanceClient
 from telegram_notifier import TelegramNotifier
-from trade_executor import TradeExecutor
+from trade_executor import TradeExecutor, summarize_order
+from strategy import evaluate_exit, classify_entry, wants_swap, zombie_min_hours, pick_zombie, position_size
+from price_stream import PriceStreamEngine
+from price_snapshot import PriceSnapshot
+from kline_cache import KlineCache
+from market_store import MarketStore
+from metrics import metrics
+from rate_limiter import PRIORITY_EXIT, PRIORITY_SCAN
+from indicators import IndicatorEngine
+from exchange_info import SymbolFilters
+from account_state import AccountState
+from reconcile import reconcile
 from datetime import datetime, timedelta, timezone
 import math
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Fuso do entry_time gravado pelo storage (get_timestamp_brt)
+BRT = timezone(timedelta(hours=-3))
 
 class BotController:
     def __init__(self):
         self.db = PortfolioManager()
         self.api = BinanceClient()
         self.notifier = TelegramNotifier(config.TELEGRAM_BOT_TOKEN, config.TELEGRAM_CHAT_ID)
-        self.executor = TradeExecutor(self.api, self.db, self.notifier)
+        self.prices = PriceSnapshot(self.api)
+        self.account = AccountState(self.api) # Saldos: 1 /account por ciclo + fills das ordens
+        self.filters = SymbolFilters(self.api)
+        self.filters.load()
+        self.filters.start_background_refresh()
+        self.klines = KlineCache(self.api, self.db)
+        self.indicators = IndicatorEngine()
+        self.market = MarketStore() if config.MARKET_STORE_ENABLED else None
+        self.executor = TradeExecutor(self.api, self.db, self.notifier, self.prices, self.filters, self.account)
         
         self.last_equity = 0.0
         self.alert_tracker = set() # Para evitar spam de alertas de PnL
         
         # Cooldown System
         self.cooldowns = {} 
-        self.COOLDOWN_TIME_MINUTES = 30
+        self.COOLDOWN_TIME_MINUTES = config.COOLDOWN_MINUTES
+
+        # Vendas podem vir do loop ou do stream de preços: uma de cada vez
+        self._trade_lock = threading.RLock()
+        self.stream = PriceStreamEngine(self.db, self.on_stream_exit) if config.PRICE_STREAM_ENABLED else None
 
     # --- LÓGICA DE INDICADORES ---
     def calculate_rsi(self, prices, period=14):
@@ -64,14 +94,10 @@ class BotController:
 
     # --- GESTÃO DE CARTEIRA ---
     def update_financials(self):
-        # 1. Atualiza Saldo USDT
-        acc = self.api.get_account()
+        # 1. Atualiza Saldo USDT (estado local da conta, sem chamada extra)
         usdt_free = 0.0
-        if acc:
-            for b in acc['balances']:
-                if b['asset'] == 'USDT':
-                    usdt_free = float(b['free'])
-                    break
+        if self.account.loaded:
+            usdt_free = self.account.free(config.SYMBOL_QUOTE)
         else:
             # Em simulação, estimamos o livre subtraindo o alocado do inicial
             invested = sum(p['amount_usdt'] for p in self.db.data['active_positions'].values())
@@ -82,10 +108,13 @@ class BotController:
         positions = self.db.data['active_positions']
         
         for symbol, data in positions.items():
-            current_price = self.api.get_price(symbol)
+            current_price = self.prices.get(symbol)
             if current_price:
-                # Estima quantidade de moedas
-                coin_qty = data['amount_usdt'] / data['buy_price']
+                # Quantidade exata da posição (fills); posições antigas: saldo da conta ou estimativa
+                coin_qty = data.get('base_qty')
+                if not coin_qty:
+                    held = self.account.total(symbol[:-len(config.SYMBOL_QUOTE)]) if self.account.loaded else 0.0
+                    coin_qty = held or data['amount_usdt'] / data['buy_price']
                 positions_value += (coin_qty * current_price)
             else:
                 positions_value += data['amount_usdt'] # Fallback
@@ -112,98 +141,29 @@ class BotController:
         print(f"   💼 Gerenciando {len(positions)} posições...")
         
         for symbol, data in list(positions.items()):
-            current_price = self.api.get_price(symbol)
+            current_price = self.prices.get(symbol)
             if not current_price: continue
 
-            buy_price = data['buy_price']
-            highest = data['highest_price']
-            strategy_type = data.get('strategy_type', 'CONSERVATIVE')
-            
-            # Atualiza Topo
-            if current_price > highest:
-                highest = current_price
-                self.db.update_position_high(symbol, highest)
+            # Regras de saída compartilhadas com o motor em tempo real e o backtester
+            decision = evaluate_exit(symbol, data, current_price)
 
-            # Cálculos
-            pnl_pct = (current_price - buy_price) / buy_price
-            max_profit_pct = (highest - buy_price) / buy_price
-            
-            # === LÓGICA DIFERENCIADA POR ESTRATÉGIA ===
-            
-            if strategy_type == 'SCALP':
-                # 🔥 SCALP: Stop Fixo -1% / Take Profit Fixo +2.5%
-                stop_price = buy_price * (1 - config.SCALP_STOP_LOSS)
-                tp_price = buy_price * (1 + config.SCALP_TAKE_PROFIT)
-                
-                status_label = "SCALP"
-                if pnl_pct > 0: status_label = "SCALP_PROFIT"
-                if pnl_pct < 0: status_label = "SCALP_LOSS"
-                
-                self.db.update_position_status(symbol, stop_price, status_label)
-                
-                # Stop Loss Scalp (-1%)
-                if current_price <= stop_price:
-                    reason = f"Scalp Stop -1%"
-                    self.log_event("INFO", "SELL", f"⚡ SCALP STOP {symbol} | PnL: {pnl_pct*100:.2f}%")
-                    self.close_position(symbol, current_price, reason)
-                    continue
-                
-                # Take Profit Scalp (+2.5%)
-                if current_price >= tp_price:
-                    reason = f"Scalp TP +2.5%"
-                    self.log_event("SUCCESS", "SELL", f"⚡💰 SCALP TP {symbol} | PnL: {pnl_pct*100:.2f}%")
-                    self.close_position(symbol, current_price, reason)
-                    continue
-                    
-            else:
-                # 🛡️ CONSERVATIVE: Trailing Stop Dinâmico (Escadinha)
-                if max_profit_pct < config.LADDER_1_THRESHOLD:
-                    drop_limit = config.LADDER_1_STOP
-                    mode = "🛡️ PROTEÇÃO"
-                elif max_profit_pct < config.LADDER_2_THRESHOLD:
-                    drop_limit = config.LADDER_2_STOP
-                    mode = "📈 TENDÊNCIA"
-                else:
-                    drop_limit = config.LADDER_3_STOP
-                    mode = "🚀 MOONSHOT"
-
-                stop_price = highest * (1 - drop_limit)
-                
-                status_label = "HOLD"
-                if pnl_pct > 0.01: status_label = "PROFIT"
-                if pnl_pct < -0.01: status_label = "LOSS"
-                
-                self.db.update_position_status(symbol, stop_price, status_label)
+            # Atualiza Topo
+            if decision['highest'] > data['highest_price']:
+                self.db.update_position_high(symbol, decision['highest'])
 
-                # Trailing Stop Loss Dinâmico
-                if current_price <= stop_price:
-                    reason = f"Trailing Stop {mode} (Topo ${highest:.4f})"
-                    self.log_event("INFO", "SELL", f"🔻 SAÍDA {symbol} | PnL: {pnl_pct*100:.2f}% | {mode}")
-                    self.close_position(symbol, current_price, reason)
-                    continue
+            self.db.update_position_status(symbol, decision['stop_price'], decision['status_label'])
 
-                # Stop Loss de Emergência
-                if pnl_pct <= -config.STOP_LOSS_PERCENT:
-                    reason = "Stop Loss Fixo"
-                    self.log_event("WARNING", "SELL", f"🛑 STOP LOSS {symbol} | PnL: {pnl_pct*100:.2f}%")
-                    self.close_position(symbol, current_price, reason)
-                    continue
-                
-                # Take Profit (Alvo Alto)
-                if pnl_pct >= config.TAKE_PROFIT_PERCENT:
-                    reason = "Take Profit Alvo"
-                    self.log_event("SUCCESS", "SELL", f"💰 TAKE PROFIT {symbol} | PnL: {pnl_pct*100:.2f}%")
-                    self.close_position(symbol, current_price, reason)
-                    continue
+            if decision['exit']:
+                level, message, reason = decision['exit']
+                self.log_event(level, "SELL", message)
+                self.close_position(symbol, current_price, reason)
+                continue
 
-                # Notificações de PnL (Telegram)
-                if pnl_pct > 0.03 and f"{symbol}_3%" not in self.alert_tracker:
-                    self.notifier.send_alert(symbol, "Lucro > 3%", "HOLD", current_price, f"📈 PnL: +{pnl_pct*100:.1f}%")
-                    self.alert_tracker.add(f"{symbol}_3%")
-                
-                if pnl_pct > 0.05 and f"{symbol}_5%" not in self.alert_tracker:
-                    self.notifier.send_alert(symbol, "Lucro > 5%", "HOLD", current_price, f"🚀 PnL: +{pnl_pct*100:.1f}%")
-                    self.alert_tracker.add(f"{symbol}_5%")
+            # Notificações de PnL (Telegram)
+            for key, title, text in decision['alerts']:
+                if key not in self.alert_tracker:
+                    self.notifier.send_alert(symbol, title, "HOLD", current_price, text)
+                    self.alert_tracker.add(key)
 
 
 
@@ -213,72 +173,134 @@ class BotController:
         Se o RSI da nova oportunidade for MUITO baixo (<18), ignora o tempo de casa.
         """
         positions = self.db.data['active_positions']
-        worst_symbol = None
-        worst_pnl = 0.0
         
-        # Define urgência
-        # Padrão: 2 horas de paciência
-        # Urgência (RSI < 18): 0 horas de paciência (Vende qualquer coisa negativa)
-        min_hours = 2.0
-        if candidate_rsi < 18.0:
-            min_hours = 0.0
+        # Urgência (RSI < 18): ignora o tempo de casa
+        if zombie_min_hours(candidate_rsi) == 0.0:
             self.log_event("WARNING", "SWAP", f"🚨 URGÊNCIA DETECTADA (RSI {candidate_rsi:.1f}): Ignorando tempo mínimo de posição.")
 
         now = datetime.now(timezone.utc)
+        holdings = []
         
         for symbol, data in positions.items():
-            # 1. Calcula tempo de casa
+            # 1. Calcula tempo de casa (storage grava entry_time em BRT, UTC-3)
             try:
                 entry_dt = datetime.strptime(data['entry_time'], '%Y-%m-%d %H:%M:%S')
-                # Adiciona info de timezone se o python reclamar de offset-naive vs aware
-                # Assumindo que o storage salva sem timezone info explícito mas é UTC/BRT
-                entry_dt = entry_dt.replace(tzinfo=datetime.now(timezone.utc)) 
-                
+                entry_dt = entry_dt.replace(tzinfo=BRT)
                 duration = (now - entry_dt).total_seconds() / 3600 
-            except:
+            except (TypeError, ValueError):
                 duration = 0
 
             # 2. Calcula PnL atual
-            current_price = self.api.get_price(symbol)
+            current_price = self.prices.get(symbol)
             if not current_price: continue
             
             pnl_pct = ((current_price - data['buy_price']) / data['buy_price']) * 100
-
-            # CRITÉRIO DE CORTE DINÂMICO:
-            # Se tem mais tempo que o minimo exigido E está no prejuízo
-            if duration >= min_hours and pnl_pct < -0.05: # -0.05% margem para não vender 0x0
-                # self.log_event("INFO", "ZOMBIE", f"💀 Candidato a Zumbi: {symbol} (PnL {pnl_pct:.2f}% | {duration:.1f}h)")
-                
-                # Queremos o PIOR desempenho para eliminar (Stop Loss tático)
-                if pnl_pct < worst_pnl:
-                    worst_pnl = pnl_pct
-                    worst_symbol = symbol
+            holdings.append((symbol, pnl_pct, duration))
         
-        return worst_symbol
+        return pick_zombie(holdings, candidate_rsi)
+
+    def on_stream_exit(self, symbol, price, decision):
+        """Saída disparada por um tick do stream (milissegundos, sem esperar o próximo ciclo). False = venda falhou."""
+        level, message, reason = decision['exit']
+        self.log_event(level, "SELL", f"📡 {message}")
+        return self.close_position(symbol, price, reason)
 
     def close_position(self, symbol, price, reason):
-        # Usa o TradeExecutor para vender
-        success = self.executor.sell_position(symbol, reason)
-        if success:
-            # Atualiza equity imediatamente após a venda para manter baseline correto
-            self.update_financials()
-            
-            # Limpa tracker de alertas
-            keys_to_remove = [k for k in self.alert_tracker if k.startswith(symbol)]
-            for k in keys_to_remove: self.alert_tracker.remove(k)
-            
-            # Cooldown: Não compra a mesma moeda por X minutos
-            self.cooldowns[symbol] = datetime.now() + timedelta(minutes=self.COOLDOWN_TIME_MINUTES)
-            self.log_event("INFO", "COOLDOWN", f"❄️ {symbol} em cooldown por {self.COOLDOWN_TIME_MINUTES}min")
+        """Vende a posição. Retorna False se a venda falhou (já vendida pelo outro caminho conta como sucesso)."""
+        with self._trade_lock:
+            # Pode já ter sido vendida pelo outro caminho (loop x stream de preços)
+            if symbol not in self.db.data['active_positions']: return True
+
+            # Usa o TradeExecutor para vender (prioridade máxima no limitador de peso)
+            with self.api.limiter.priority(PRIORITY_EXIT):
+                success = self.executor.sell_position(symbol, reason)
+            if success:
+                # Atualiza equity imediatamente após a venda para manter baseline correto
+                self.update_financials()
+                
+                # Limpa tracker de alertas
+                keys_to_remove = [k for k in list(self.alert_tracker) if k.startswith(symbol)]
+                for k in keys_to_remove: self.alert_tracker.discard(k)
+                
+                # Cooldown: Não compra a mesma moeda por X minutos
+                self.cooldowns[symbol] = datetime.now() + timedelta(minutes=self.COOLDOWN_TIME_MINUTES)
+                self.log_event("INFO", "COOLDOWN", f"❄️ {symbol} em cooldown por {self.COOLDOWN_TIME_MINUTES}min")
+            return success
 
     # --- SCANNER ---
+    def evaluate_candidate(self, symbol):
+        """Klines + indicadores de um candidato (roda nas threads do scanner). Retorna (rsi, ema, rvol, preço) ou None."""
+        with metrics.span("klines"), self.api.limiter.priority(PRIORITY_SCAN):
+            series = self.klines.get_series(symbol)
+        return self._candidate_indicators(symbol, series)
+
+    async def evaluate_candidate_async(self, symbol, slots, closed=None):
+        """
+        Mesmo que evaluate_candidate, com os klines pelo cliente async (slots = semáforo do scanner).
+        closed: lista onde as velas fechadas são juntadas para uma gravação em lote fora do loop
+        (o MarketStore grava arquivo com lock: no loop, travaria todas as buscas em andamento).
+        """
+        async with slots:
+            with metrics.span("klines"):
+                series = await self.klines.aget_series(symbol)
+        if series and closed is not None:
+            closed.append((symbol, series[:-1]))
+        return self._candidate_indicators(symbol, series, store=closed is None)
+
+    def _store_klines(self, closed):
+        """Histórico local: só velas fechadas (append-only, ignora as já gravadas)"""
+        for symbol, rows in closed:
+            self.market.append_klines(symbol, '1h', rows)
+
+    def _candidate_indicators(self, symbol, series, store=True):
+        if not series: return None
+
+        if store and self.market:
+            self._store_klines([(symbol, series[:-1])])
+
+        # Indicadores sobre a janela buscada (iguais a calculate_*): estado reaproveitado
+        # enquanto nenhuma vela fecha, a vela em formação gera valores provisórios
+        with metrics.span("indicators"):
+            rsi, ema, rvol = self.indicators.sync(symbol, series)
+        if not rsi: return None
+
+        return rsi, ema, rvol, series[-1][1]
+
     def scan_market(self):
         print("\n🔍 ESCANEANDO (Dual Strategy: Conservative + Scalp)...")
-        tickers = self.api.get_ticker_24hr()
+        with self.api.limiter.priority(PRIORITY_SCAN):
+            tickers = self.api.get_ticker_24hr()
         if not tickers: return
 
+        shortlist = self.shortlist_candidates(tickers)
+        with ThreadPoolExecutor(max_workers=config.SCAN_WORKERS) as pool:
+            evaluated = list(pool.map(self.evaluate_candidate, [c['symbol'] for c in shortlist]))
+        self.process_candidates(shortlist, evaluated)
+
+    async def fetch_candidates_async(self, async_api):
+        """Parte de rede do scan no loop asyncio: ticker 24h + klines de todos os candidatos ao mesmo tempo."""
+        print("\n🔍 ESCANEANDO (Dual Strategy: Conservative + Scalp)...")
+        with self.api.limiter.priority(PRIORITY_SCAN):
+            tickers = await async_api.get_ticker_24hr()
+            if not tickers: return [], []
+
+            shortlist = self.shortlist_candidates(tickers)
+            slots = asyncio.Semaphore(config.SCAN_WORKERS)
+            closed = []
+            evaluated = await asyncio.gather(*(self.evaluate_candidate_async(c['symbol'], slots, closed) for c in shortlist))
+
+        # Gravação do histórico depois das buscas, numa thread (disco fora do event loop)
+        if self.market and closed:
+            with metrics.span("market_store"):
+                await asyncio.to_thread(self._store_klines, closed)
+        return shortlist, evaluated
+
+    def shortlist_candidates(self, tickers):
+        """Filtro bruto (liquidez, cooldown, pares ativos) + orçamento de peso. Retorna os candidatos na ordem de interesse."""
+        self.prices.load_tickers(tickers) # Reaproveita como snapshot de preços
+
         candidates = []
-        active_symbols = self.db.data['active_positions']
+        active_symbols = dict(self.db.data['active_positions']) # Cópia: a carteira pode estar mudando em paralelo
         
         # Conta posições por tipo de estratégia (apenas para info)
         conservative_count = sum(1 for p in active_symbols.values() if p.get('strategy_type', 'CONSERVATIVE') == 'CONSERVATIVE')
@@ -290,6 +312,7 @@ class BotController:
         for t in tickers:
             sym = t['symbol']
             if not sym.endswith(config.SYMBOL_QUOTE) or sym in config.IGNORED_COINS: continue
+            if not self.filters.is_trading(sym): continue # Pares em BREAK/HALT (índice local)
             if sym in active_symbols: continue
             if float(t['quoteVolume']) < config.MIN_VOLUME_USDT: continue
             
@@ -304,50 +327,32 @@ class BotController:
 
         # Ordena pelas que mais caíram/subiram (Interesse do mercado)
         candidates.sort(key=lambda x: abs(x['change']), reverse=True)
-        
+
+        # O orçamento encolhe com o peso que o limitador ainda libera para o scanner (evita 429/418)
+        budget = min(config.SCAN_WEIGHT_BUDGET, self.api.limiter.available(PRIORITY_SCAN))
+        max_candidates = min(config.SCAN_CANDIDATES, budget // config.KLINE_REQUEST_WEIGHT)
+        if max_candidates < config.SCAN_CANDIDATES:
+            print(f"   🚦 Peso de API baixo: analisando {max_candidates}/{config.SCAN_CANDIDATES} candidatos")
+        return candidates[:max_candidates]
+
+    def process_candidates(self, shortlist, evaluated):
+        """
+        Filtro fino + compras/swaps a partir dos indicadores já calculados.
+        `evaluated` vem na ordem dos candidatos (busca paralela ou async),
+        então a prioridade de compra é a mesma da busca sequencial.
+        """
         # 2. Filtro Fino - DUAL STRATEGY
         watchlist = []
         conservative_opportunities = []  # Lista de oportunidades conservadoras
         scalp_opportunities = []         # Lista de oportunidades scalp
-        
-        for cand in candidates[:15]: 
-            sym = cand['symbol']
-            klines_data = self.api.get_klines(sym, limit=110)
-            if not klines_data: continue
-
-            prices = [x[0] for x in klines_data]
-            volumes = [x[1] for x in klines_data]
 
-            # Calcula indicadores
-            rsi = self.calculate_rsi(prices)
-            if not rsi: continue
-            
-            ema = self.calculate_ema(prices, period=100)
-            current_price = prices[-1]
-            rvol = self.calculate_rvol(volumes)
-            
-            # === FILTRO DUAL ===
-            conservative_ok = False
-            scalp_ok = False
-            status_reason = "WAIT"
-            
-            # FILTRO 1: CONSERVATIVE (RSI < 23, segue EMA)
-            if rsi <= config.RSI_BUY_THRESHOLD:
-                conservative_ok = True
-                status_reason = "🛡️ CONSERVATIVE"
-                
-                if ema and current_price < ema:
-                    if rsi > 20:
-                        conservative_ok = False
-                        status_reason = "Downtrend"
+        for cand, result in zip(shortlist, evaluated):
+            if not result: continue
+            sym = cand['symbol']
+            rsi, ema, rvol, current_price = result
             
-            # FILTRO 2: SCALP (RSI < 40, ignora EMA)
-            if config.SCALP_ENABLED and rsi <= config.SCALP_RSI_MAX:
-                scalp_ok = True
-                if not conservative_ok:  # Só marca como scalp se não for conservadora
-                    status_reason = "⚡ SCALP"
-            elif rsi > config.RSI_BUY_THRESHOLD:
-                status_reason = f"RSI High ({rsi:.1f})"
+            # === FILTRO DUAL === (mesma regra usada pelo backtester)
+            conservative_ok, scalp_ok, status_reason = classify_entry(rsi, ema, current_price)
             
             # Adiciona à Watchlist
             watchlist.append({
@@ -355,7 +360,8 @@ class BotController:
                 'price': current_price,
                 'rsi': rsi,
                 'rvol': rvol,
-                'status': status_reason
+                'status': status_reason,
+                'change': cand['change']
             })
             
             # LOG DO CANDIDATO
@@ -378,6 +384,9 @@ class BotController:
                     'priority': 2  # Scalp tem prioridade menor
                 })
         
+        # Persiste apenas as velas novas (restart aquece sem rebaixar tudo)
+        self.klines.persist()
+
         # Ordena oportunidades por RSI (menor = melhor)
         conservative_opportunities.sort(key=lambda x: x['rsi'])
         scalp_opportunities.sort(key=lambda x: x['rsi'])
@@ -396,13 +405,13 @@ class BotController:
             
             if not success:
                 # Sistema Zombie: tenta substituir posição pior
-                if (strategy == 'CONSERVATIVE' and rsi < 20) or (strategy == 'SCALP' and rsi < 25):
+                if wants_swap(strategy, rsi):
                     zombie = self.find_zombie_position(candidate_rsi=rsi)
                     
                     if zombie:
                         icon = "🛡️" if strategy == 'CONSERVATIVE' else "⚡"
                         self.log_event("WARNING", "SWAP", f"{icon} SWAP: {zombie} → {sym}")
-                        self.close_position(zombie, self.api.get_price(zombie), f"SWAP por {strategy}")
+                        self.close_position(zombie, self.prices.get(zombie), f"SWAP por {strategy}")
                         time.sleep(2)
                         self.execute_buy(sym, price, rsi, strategy)
             
@@ -411,6 +420,8 @@ class BotController:
         # Salva Watchlist
         if watchlist:
             self.db.save_candidates(watchlist)
+            if self.market:
+                self.market.append_snapshot(int(time.time() * 1000), watchlist)
 
 
     def execute_buy(self, symbol, price, rsi, strategy_type='CONSERVATIVE'):
@@ -419,37 +430,40 @@ class BotController:
         
         balance = 0.0
         if not config.SIMULATION_MODE:
-            acc = self.api.get_account()
-            if acc:
-                for b in acc['balances']:
-                    if b['asset'] == 'USDT': balance = float(b['free'])
+            balance = self.account.free(config.SYMBOL_QUOTE) # Já desconta as compras anteriores do ciclo
         else:
             balance = 100.0 # Simulação
 
-        # Custo mínimo operacional (Binance pede $5, usamos $5.5 para garantir taxas e flutuação)
-        MIN_VIABLE_TRADE = 5.5 
-
-        if balance < MIN_VIABLE_TRADE:
+        # Valor da compra (mínimo viável; regra compartilhada com o backtester)
+        amount = position_size(balance)
+        if amount is None:
             return False
 
-        # Definimos o valor da compra.
-        amount = MIN_VIABLE_TRADE
-
-        # Trava de segurança: Se o saldo for tipo $5.80, usa tudo ($5.80) em vez de tentar guardar $0.30
-        if balance < (MIN_VIABLE_TRADE * 1.5):
-            amount = balance
-
-        # Arredonda para 2 casas para evitar erros de precisão na API
-        amount = round(amount - 0.1, 2) # Tira 10 centavos para garantir que não vai faltar taxa
+        # Valida contra o MIN_NOTIONAL do par (índice local, sem chamada extra)
+        if not self.filters.check_notional(symbol, amount):
+            print(f"   ⚠️ {symbol}: ${amount:.2f} abaixo do mínimo do par (${self.filters.min_notional(symbol):.2f})")
+            return False
 
         strategy_icon = "⚡" if strategy_type == 'SCALP' else "🛡️"
         self.log_event("SUCCESS", "BUY", f"{strategy_icon} COMPRANDO {symbol} [{strategy_type}] | RSI {rsi:.2f} | Alvo: ${amount:.2f}")
         
+        base_qty, entry_fee = None, 0.0
         if not config.SIMULATION_MODE:
             res = self.api.place_order(symbol, 'BUY', amount)
-            if not res: return False
+            if not res:
+                self.account.invalidate() # Ex: saldo insuficiente -> relê a conta na próxima leitura
+                return False
+            self.account.apply_fill(symbol, 'BUY', res)
+
+            # Execução real: preço médio, USDT gasto e moedas recebidas (já sem a comissão em base)
+            fill = summarize_order(symbol, res)
+            if fill:
+                self.db.record_executions(symbol, 'BUY', fill)
+                price, amount = fill['price'], fill['quote_qty']
+                base_qty = fill['qty'] - fill['base_fee']
+                entry_fee = fill['fees_usdt']
         
-        self.db.add_position(symbol, price, amount, rsi, strategy_type)
+        self.db.add_position(symbol, price, amount, rsi, strategy_type, base_qty, entry_fee)
         
         # Atualiza equity imediatamente após a compra para manter baseline correto
         self.update_financials()
@@ -462,29 +476,127 @@ class BotController:
 
 
     # --- LOOP ---
+    def portfolio_pass(self):
+        """
+        Saldos + Equity + Auditoria e Trailing Stop. Logs e write-behind da passada vão para o disco
+        numa transação curta no fim (nenhuma transação aberta durante vendas/Telegram); vendas são duráveis na hora.
+        """
+        with metrics.span("account"):
+            self.account.refresh()
+        with self.db.deferred_writes():
+            with metrics.span("update_financials"):
+                self.update_financials()
+            with metrics.span("manage_portfolio"):
+                self.manage_portfolio()
+
+    def finish_cycle(self):
+        # Grava pendências do ciclo (topos, stops, equity) em um único commit
+        with metrics.span("db_flush"):
+            self.db.flush()
+
+        # Retenção dos logs (agendada, não a cada INSERT)
+        with metrics.span("retention"):
+            for r in self.db.run_retention():
+                if r['deleted']:
+                    print(f"   🧹 Retenção {r['table']}: -{r['deleted']} linhas ({r['ms']:.1f}ms)")
+
+        # Resumo do ciclo + snapshot para o /api/metrics
+        if metrics.end_cycle():
+            print(f"\n{metrics.summary()}")
+            metrics.write_file()
+
     def run(self):
         print(f"🤖 BOT V2 INICIADO (Trailing Stop Dinâmico)")
         print(f"📂 Configuração: Escadinha (2.5% -> 4.5% -> 6.0%)")
+
+        # Posições e equity batendo com a conta real antes de qualquer decisão
+        # (em simulação as posições não existem na conta: reconciliar apagaria todas)
+        if config.RECONCILE_ON_STARTUP and not config.SIMULATION_MODE:
+            print("🔄 Reconciliando com a conta Binance...")
+            reconcile(self.api, self.db, self.prices, self.filters, self.account)
+
+        # Saídas em tempo real (trailing/stop/TP avaliados a cada tick)
+        if self.stream:
+            self.stream.start()
+
+        if config.ASYNC_LOOP:
+            try:
+                asyncio.run(self.run_async())
+            except KeyboardInterrupt:
+                print("\n🛑 Parando...")
+                if self.stream: self.stream.stop()
+            return
         
         while True:
             try:
+                metrics.start_cycle()
 
-                equity = self.update_financials()    
-                # 1. Auditoria e Trailing Stop
-                self.manage_portfolio()
+                # 0. Snapshot único de preços para todo o ciclo
+                with metrics.span("prices"):
+                    self.prices.refresh()
+
+                # 1. Carteira
+                self.portfolio_pass()
                 
                 # 2. Novas Compras
-                self.scan_market()
+                with metrics.span("scan_market"):
+                    self.scan_market()
+
+                # 3. Flush, retenção e métricas
+                self.finish_cycle()
                 
                 print("\n⏳ Aguardando 60s...")
                 time.sleep(60)
                 
             except KeyboardInterrupt:
                 print("\n🛑 Parando...")
+                if self.stream: self.stream.stop()
                 break
             except Exception as e:
                 print(f"❌ Erro Loop: {e}")
                 time.sleep(10)
 
+    async def run_async(self):
+        """
+        Mesmo ciclo do run(), com carteira e scanner ao mesmo tempo:
+        a passada da carteira (SQLite + vendas) roda numa thread enquanto o loop asyncio
+        busca ticker 24h e klines dos candidatos pelo pool keep-alive do aiohttp.
+        As compras só acontecem depois que as duas partes terminam (a carteira já está atualizada).
+        """
+        async with AsyncBinanceClient() as async_api:
+            self.klines.async_api = async_api
+            while True:
+                try:
+                    await self.run_cycle_async(async_api)
+                    print("\n⏳ Aguardando 60s...")
+                    await asyncio.sleep(60)
+                except Exception as e:
+                    print(f"❌ Erro Loop: {e}")
+                    await asyncio.sleep(10)
+
+    async def run_cycle_async(self, async_api):
+        metrics.start_cycle()
+
+        # 0. Snapshot único de preços para todo o ciclo
+        with metrics.span("prices"):
+            await asyncio.to_thread(self.prices.refresh)
+
+        # 1 + 2. Carteira (thread) e busca do scanner (asyncio) em paralelo
+        async def scan_fetch():
+            with metrics.span("scan_market"):
+                return await self.fetch_candidates_async(async_api)
+
+        _, (shortlist, evaluated) = await asyncio.gather(
+            asyncio.to_thread(self.portfolio_pass),
+            scan_fetch(),
+        )
+
+        # 2b. Novas compras com a carteira já atualizada
+        with metrics.span("scan_decide"):
+            await asyncio.to_thread(self.process_candidates, shortlist, evaluated)
+
+        # 3. Flush, retenção e métricas
+        await asyncio.to_thread(self.finish_cycle)
+
 if __name__ == "__main__":
     BotController().run()
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import threading
+from datetime import datetime, timezone
+import numpy as np
+import config
+
+# ==============================================================================
+# 🗄️ ARMAZÉM DE DADOS DE MERCADO (séries temporais fora do banco de trading)
+# Arquivos binários append-only de registros fixos (dtype NumPy), particionados por
+# tipo / símbolo / dia UTC:   market_data/klines_1h/BTCUSDT/2024-05-01.bin
+# Leitura via np.memmap: uma consulta dentro de uma partição devolve uma view (zero cópia);
+# consultas que cruzam dias concatenam as views das partições.
+# Um único processo escreve (o bot); API e backtests só leem.
+# ==============================================================================
+
+KLINE_DTYPE = np.dtype([('open_time', '<i8'), ('close', '<f8'), ('volume', '<f8')])
+SNAPSHOT_DTYPE = np.dtype([('time', '<i8'), ('price', '<f8'), ('rsi', '<f8'), ('rvol', '<f8'), ('change', '<f8')])
+
+DAY_MS = 86_400_000
+
+
+def _day_name(day):
+    return datetime.fromtimestamp(day * 86_400, timezone.utc).strftime('%Y-%m-%d')
+
+
+class MarketStore:
+    def __init__(self, root=None):
+        self.root = root or config.MARKET_STORE_DIR
+        self._last = {}               # (kind, symbol) -> último timestamp gravado
+        self._lock = threading.Lock() # O scanner grava de várias threads
+
+    # --- Escrita ---
+    def append_klines(self, symbol, interval, rows):
+        """Velas FECHADAS [(open_time, close, volume)]; só as mais novas que a última gravada entram."""
+        if not rows: return 0
+        return self._append(f"klines_{interval}", symbol, np.array(rows, dtype=KLINE_DTYPE))
+
+    def append_snapshot(self, time_ms, rows):
+        """Um registro por par do scanner: [{'symbol', 'price', 'rsi', 'rvol', 'change'}]"""
+        written = 0
+        for r in rows:
+            record = np.array([(time_ms, r['price'], r['rsi'], r.get('rvol', 1.0), r.get('change', 0.0))],
+                              dtype=SNAPSHOT_DTYPE)
+            written += self._append('snapshots', r['symbol'], record)
+        return written
+
+    def _append(self, kind, symbol, records):
+        field = records.dtype.names[0]
+        with self._lock:
+            last = self._last_time(kind, symbol)
+            if last is not None:
+                records = records[records[field] > last]
+            if not len(records): return 0
+
+            # Append-only por partição diária
+            days = records[field] // DAY_MS
+            os.makedirs(self._dir(kind, symbol), exist_ok=True)
+            itemsize = records.dtype.itemsize
+            for day in np.unique(days):
+                with open(self._path(kind, symbol, _day_name(int(day))), 'ab') as f:
+                    # Registro incompleto de um crash no meio da escrita: descarta para não desalinhar o que vem depois
+                    size = f.seek(0, os.SEEK_END)
+                    if size % itemsize:
+                        f.truncate(size - size % itemsize)
+                    f.write(records[days == day].tobytes())
+
+            self._last[(kind, symbol)] = int(records[field][-1])
+            return len(records)
+
+    def _last_time(self, kind, symbol):
+        key = (kind, symbol)
+        if key not in self._last:
+            # Primeira escrita desde o start: lê o último registro da partição mais recente
+            self._last[key] = None
+            for name in reversed(self._partitions(kind, symbol)):
+                arr = self._map(os.path.join(self._dir(kind, symbol), name), self._dtype(kind))
+                if len(arr):
+                    self._last[key] = int(arr[-1][0])
+                    break
+        return self._last[key]
+
+    # --- Leitura ---
+    def klines(self, symbol, interval='1h', start=None, end=None):
+        """Velas com open_time em [start, end) (ms). Retorna array estruturado KLINE_DTYPE."""
+        return self.read(f"klines_{interval}", symbol, start, end)
+
+    def snapshots(self, symbol, start=None, end=None):
+        return self.read('snapshots', symbol, start, end)
+
+    def read(self, kind, symbol, start=None, end=None):
+        dtype = self._dtype(kind)
+        field = dtype.names[0]
+        first_day = _day_name(start // DAY_MS) if start is not None else None
+        last_day = _day_name((end - 1) // DAY_MS) if end is not None else None
+
+        parts = []
+        for name in self._partitions(kind, symbol):
+            day = name[:-4]
+            if first_day and day < first_day: continue
+            if last_day and day > last_day: break
+
+            arr = self._map(os.path.join(self._dir(kind, symbol), name), dtype)
+            times = arr[field]
+            lo = np.searchsorted(times, start) if start is not None else 0
+            hi = np.searchsorted(times, end) if end is not None else len(arr)
+            if hi > lo:
+                parts.append(arr[lo:hi])
+
+        if not parts: return np.empty(0, dtype=dtype)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def symbols(self, kind='klines_1h'):
+        path = os.path.join(self.root, kind)
+        return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+    # --- Internos ---
+    @staticmethod
+    def _dtype(kind):
+        return SNAPSHOT_DTYPE if kind == 'snapshots' else KLINE_DTYPE
+
+    def _dir(self, kind, symbol):
+        return os.path.join(self.root, kind, symbol)
+
+    def _path(self, kind, symbol, day):
+        return os.path.join(self._dir(kind, symbol), f"{day}.bin")
+
+    def _partitions(self, kind, symbol):
+        path = self._dir(kind, symbol)
+        if not os.path.isdir(path): return []
+        return sorted(n for n in os.listdir(path) if n.endswith('.bin'))
+
+    @staticmethod
+    def _map(path, dtype):
+        # Ignora um registro final incompleto (leitura concorrente com a escrita do bot)
+        count = os.path.getsize(path) // dtype.itemsize
+        if count == 0: return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
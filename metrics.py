@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+import config
+
+# ==============================================================================
+# ⏱️ INSTRUMENTAÇÃO DO HOT PATH
+# - spans aninhados por ciclo do bot (with metrics.span("scan_market"): ...)
+# - histogramas de latência (HTTP por endpoint, commits do SQLite, Telegram)
+# - ring limitado com os últimos ciclos + exportação em texto Prometheus
+# Com METRICS_ENABLED = False, span() devolve um context manager vazio compartilhado
+# e observe() retorna na primeira linha: custo de uma chamada de função.
+# ==============================================================================
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    'bot_span_seconds': "Duração dos spans do ciclo do bot",
+    'binance_http_seconds': "Latência das chamadas REST da Binance por endpoint",
+    'sqlite_commit_seconds': "Duração dos commits do SQLite",
+    'telegram_send_seconds': "Latência de entrega das mensagens do Telegram",
+    'binance_http_errors_total': "Chamadas REST da Binance sem resposta 200",
+    'bot_last_cycle_seconds': "Duração do último ciclo completo do bot",
+}
+
+
+class _NoopSpan:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NOOP = _NoopSpan()
+
+
+# Span pai do contexto atual (thread ou task asyncio: tasks concorrentes não se misturam)
+_parent = contextvars.ContextVar('metrics_span', default=None)
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'path', 'start', 'token')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        parent = _parent.get()
+        self.path = f"{parent}/{self.name}" if parent else self.name
+        self.token = _parent.set(self.path)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        _parent.reset(self.token)
+        self.metrics._record_span(self.path, elapsed)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=None, ring_size=None):
+        self.enabled = config.METRICS_ENABLED if enabled is None else enabled
+        self.cycles = deque(maxlen=ring_size or config.METRICS_RING_SIZE)  # Últimos ciclos completos
+        self._lock = threading.Lock()
+        self._hist = {}      # (métrica, labels) -> [contagem por bucket..., soma, total]
+        self._counters = {}  # (métrica, labels) -> valor
+        self._cycle = None   # span path -> [segundos, chamadas] do ciclo em andamento
+
+    # --- API do hot path ---
+    def span(self, name):
+        if not self.enabled: return _NOOP
+        return _Span(self, name)
+
+    def observe(self, metric, seconds, **labels):
+        if not self.enabled: return
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._hist.get(key)
+            if h is None:
+                h = self._hist[key] = [0] * (len(BUCKETS) + 2)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    h[i] += 1
+                    break
+            h[-2] += seconds
+            h[-1] += 1
+
+    def inc(self, metric, value=1, **labels):
+        if not self.enabled: return
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    # --- Ciclos ---
+    def start_cycle(self):
+        if not self.enabled: return
+        with self._lock:
+            self._cycle = {}
+            self._cycle_http = self._http_count()
+            self._cycle_started = time.time()
+
+    def end_cycle(self):
+        """Fecha o ciclo atual e guarda no ring. Retorna o registro (ou None se desativado)."""
+        if not self.enabled or self._cycle is None: return None
+        with self._lock:
+            record = {
+                'started': self._cycle_started,
+                'seconds': time.time() - self._cycle_started,
+                'spans': self._cycle,
+                'http_requests': self._http_count() - self._cycle_http,
+            }
+            self._cycle = None
+            self.cycles.append(record)
+        return record
+
+    def summary(self, record=None):
+        """Uma linha de console com os spans de nível mais alto do ciclo (os aninhados ficam no /api/metrics)"""
+        record = record or (self.cycles[-1] if self.cycles else None)
+        if not record: return ""
+        parts = [f"⏱️ Ciclo {record['seconds']:.2f}s"]
+        for path, (seconds, calls) in sorted(record['spans'].items(), key=lambda x: -x[1][0]):
+            if '/' in path: continue
+            parts.append(f"{path} {seconds:.2f}s" + (f" x{calls}" if calls > 1 else ""))
+        parts.append(f"HTTP {record['http_requests']} req")
+        return " | ".join(parts)
+
+    # --- Exportação ---
+    def snapshot(self):
+        """Estado bruto serializável (histogramas, contadores, último ciclo)"""
+        with self._lock:
+            return {
+                'hist': [[m, list(map(list, labels)), list(v)] for (m, labels), v in self._hist.items()],
+                'counters': [[m, list(map(list, labels)), v] for (m, labels), v in self._counters.items()],
+                'last_cycle': self.cycles[-1]['seconds'] if self.cycles else None,
+            }
+
+    def write_file(self, path=None):
+        """Grava o snapshot para a API servir (bot e API são processos separados)"""
+        if not self.enabled: return
+        path = path or config.METRICS_FILE
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    # --- Internos ---
+    def _record_span(self, path, seconds):
+        self.observe('bot_span_seconds', seconds, span=path)
+        with self._lock:
+            if self._cycle is not None:
+                entry = self._cycle.setdefault(path, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += 1
+
+    def _http_count(self):
+        return sum(v[-1] for (metric, _), v in self._hist.items() if metric == 'binance_http_seconds')
+
+
+def _labels(process, labels):
+    return ",".join([f'process="{process}"'] + [f'{k}="{v}"' for k, v in labels])
+
+
+def load_snapshot(path=None):
+    """Snapshot gravado por outro processo (None se ainda não existe)"""
+    try:
+        with open(path or config.METRICS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def render_prometheus(sources):
+    """
+    Texto no formato de exposição do Prometheus (0.0.4) a partir de {processo: snapshot}.
+    Cada família aparece uma única vez, com as séries de todos os processos (label process).
+    """
+    families = {}
+    for process, snap in sources.items():
+        for metric, labels, values in snap['hist']:
+            families.setdefault((metric, 'histogram'), []).append((process, labels, values))
+        for metric, labels, value in snap['counters']:
+            families.setdefault((metric, 'counter'), []).append((process, labels, value))
+        if snap.get('last_cycle') is not None:
+            families.setdefault(('bot_last_cycle_seconds', 'gauge'), []).append((process, [], snap['last_cycle']))
+
+    lines = []
+    for (metric, kind), series in sorted(families.items()):
+        lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for process, labels, values in sorted(series, key=lambda x: (x[0], x[1])):
+            base = _labels(process, labels)
+            if kind != 'histogram':
+                lines.append(f"{metric}{{{base}}} {values}")
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS, values):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{base},le="+Inf"}} {values[-1]}')
+            lines.append(f"{metric}_sum{{{base}}} {values[-2]:.6f}")
+            lines.append(f"{metric}_count{{{base}}} {values[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+# Instância única do processo
+metrics = Metrics()
@@ -0,0 +1,103 @@
+import time
+import threading
+import config
+
+
+class PriceSnapshot:
+    """
+    Snapshot de preços compartilhado por todos os consumidores de um ciclo.
+    Uma única chamada /api/v3/ticker/price substitui N chamadas get_price(symbol).
+    Se o snapshot estiver velho, é recarregado inteiro (1 chamada);
+    se mesmo assim faltar o símbolo, ou o snapshot continuar velho (busca completa falhando),
+    cai para o get_price individual: preço velho nunca é servido como atual.
+    Thread-safe com single-flight: várias threads pedindo refresh ao mesmo tempo
+    esperam a mesma busca em andamento em vez de abrir uma chamada cada.
+    """
+    def __init__(self, api_client, max_age=None):
+        self.api = api_client
+        self.max_age = max_age if max_age is not None else config.PRICE_SNAPSHOT_MAX_AGE
+        self.prices = {}
+        self.fetched_at = 0.0
+        self.failed_at = 0.0   # Última busca completa que falhou (evita repetir a cada get() numa queda)
+        self._single = {}      # symbol -> (preço, time) do get_price individual (fora do snapshot, mesma validade)
+        self._lock = threading.Lock()
+        self._inflight = None  # {'done': Event, 'ok': bool} da busca em andamento
+        self._thread = None
+
+    def refresh(self):
+        """Recarrega todos os preços. Mantém o snapshot anterior se a API falhar."""
+        with self._lock:
+            flight = self._inflight
+            leader = flight is None
+            if leader:
+                flight = self._inflight = {'done': threading.Event(), 'ok': False}
+
+        if not leader:
+            # Já tem uma busca no ar: espera o resultado dela
+            flight['done'].wait()
+            return flight['ok']
+
+        try:
+            prices = self.api.get_all_prices()
+            if prices:
+                self.prices = prices
+                self.fetched_at = time.time()
+            else:
+                self.failed_at = time.time()
+            flight['ok'] = bool(prices)
+        finally:
+            with self._lock:
+                self._inflight = None
+            flight['done'].set()
+        return flight['ok']
+
+    def start_background_refresh(self, interval):
+        """Mantém o snapshot quente numa thread daemon (leitores nunca esperam a Binance)."""
+        if self._thread: return
+        def loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Erro ao renovar preços: {e}")
+                time.sleep(interval)
+        self._thread = threading.Thread(target=loop, name="price-snapshot-refresh", daemon=True)
+        self._thread.start()
+
+    def load_tickers(self, tickers):
+        """Reaproveita um /ticker/24hr já baixado (ex: scan_market) como snapshot."""
+        if not tickers: return
+        self.prices = {t['symbol']: float(t['lastPrice']) for t in tickers}
+        self.fetched_at = time.time()
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def is_fresh(self):
+        return self.fetched_at > 0 and self.age() <= self.max_age
+
+    def get(self, symbol, fallback=True):
+        """
+        Preço do símbolo a partir do snapshot.
+        fallback=False nunca faz chamada individual (útil para símbolos que podem não existir):
+        com o snapshot velho, retorna None em vez de um preço antigo.
+        Se a última busca completa falhou há menos de max_age, não tenta de novo: vai direto ao get_price.
+        """
+        if not self.is_fresh() and time.time() - self.failed_at > self.max_age:
+            self.refresh()
+
+        if self.is_fresh():
+            price = self.prices.get(symbol)
+            if price or not fallback:
+                return price
+        elif not fallback:
+            return None
+
+        # Individual: cache próprio com a mesma validade (não entra no snapshot como se fosse da busca completa)
+        cached = self._single.get(symbol)
+        if cached and time.time() - cached[1] <= self.max_age:
+            return cached[0]
+        price = self.api.get_price(symbol)
+        if price:
+            self._single[symbol] = (price, time.time())
+        return price
@@ -0,0 +1,199 @@
+import sys
+import json
+import time
+import threading
+import config
+from strategy import evaluate_exit
+
+
+class WebSocketTransport:
+    """
+    Transporte padrão: stream combinado da Binance (ou qualquer servidor compatível,
+    como o replay local abaixo). Mensagens no formato {"stream": ..., "data": {...}}.
+    """
+    def __init__(self, url=None):
+        self.url = url or config.PRICE_STREAM_URL
+        self.ws = None
+
+    def connect(self, streams):
+        from websockets.sync.client import connect
+        self.ws = connect(f"{self.url}/stream?streams={'/'.join(streams)}", open_timeout=10)
+
+    def recv(self, timeout):
+        """Retorna a próxima mensagem (str) ou None se nada chegou dentro do timeout."""
+        try:
+            return self.ws.recv(timeout=timeout)
+        except TimeoutError:
+            return None
+
+    def close(self):
+        if self.ws:
+            self.ws.close()
+            self.ws = None
+
+
+class PriceStreamEngine:
+    """
+    Motor de saídas orientado a eventos: assina miniTicker + bookTicker dos pares em carteira
+    e avalia trailing stop, stop/TP do SCALP e stop de emergência a cada tick, usando as
+    mesmas regras do manage_portfolio (strategy.evaluate_exit).
+    Quando uma regra dispara, chama on_exit(symbol, price, decision) numa thread separada,
+    sem travar a leitura do stream. Se on_exit retornar False (ordem recusada, poeira abaixo
+    do LOT_SIZE), o par fica exit_retry segundos sem nova tentativa pelo stream: o ciclo da
+    carteira volta a avaliar, e os ticks seguintes não viram uma enxurrada de ordens e logs.
+    """
+    def __init__(self, db, on_exit, transport=None, record_file=None, exit_retry=None):
+        self.db = db
+        self.on_exit = on_exit
+        self.transport = transport or WebSocketTransport()
+        self.record_file = record_file or config.PRICE_STREAM_RECORD_FILE
+
+        self.last_prices = {}     # symbol -> último preço avaliado
+        self.ticks = 0
+        self._exiting = set()     # Saídas em andamento (evita venda dupla)
+        self._retry_at = {}       # symbol -> time.time() liberado para nova saída após falha
+        self.exit_retry = config.PRICE_STREAM_EXIT_RETRY if exit_retry is None else exit_retry
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._record = None
+
+    def start(self):
+        if self._thread: return
+        if self.record_file:
+            self._record = open(self.record_file, 'a')
+        self._thread = threading.Thread(target=self._run, name="price-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._record:
+            self._record.close()
+            self._record = None
+
+    # --- Loop de conexão ---
+    def _held_symbols(self):
+        return frozenset(self.db.data['active_positions'])
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            symbols = self._held_symbols()
+            if not symbols:
+                self._stop.wait(1)
+                continue
+
+            streams = [f"{s.lower()}@{kind}" for s in sorted(symbols) for kind in ("miniTicker", "bookTicker")]
+            try:
+                self.transport.connect(streams)
+                print(f"📡 Stream de preços conectado ({len(symbols)} pares)")
+                backoff = 1
+                last_check = time.time()
+
+                while not self._stop.is_set():
+                    msg = self.transport.recv(timeout=1.0)
+                    if msg is not None:
+                        self.handle_message(msg)
+
+                    # Reassina quando a carteira muda (compra/venda)
+                    if time.time() - last_check >= 1.0:
+                        last_check = time.time()
+                        if self._held_symbols() != symbols:
+                            break
+            except Exception as e:
+                print(f"⚠️ Stream de preços caiu: {e} (reconectando em {backoff}s)")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                self.transport.close()
+
+    # --- Ticks ---
+    def handle_message(self, msg):
+        if self._record:
+            self._record.write(msg.rstrip('\n') + '\n')
+
+        payload = json.loads(msg)
+        data = payload.get('data', payload)
+        symbol = data.get('s')
+        if not symbol: return
+
+        # bookTicker: melhor bid (preço que uma venda a mercado recebe); miniTicker: último negócio
+        if 'b' in data and 'e' not in data:
+            price = float(data['b'])
+        elif data.get('e') == '24hrMiniTicker':
+            price = float(data['c'])
+        else:
+            return
+
+        self.on_tick(symbol, price)
+
+    def on_tick(self, symbol, price):
+        self.ticks += 1
+        self.last_prices[symbol] = price
+
+        position = self.db.get_position(symbol)
+        if not position or price <= 0: return
+
+        decision = evaluate_exit(symbol, position, price)
+        if decision['highest'] > position['highest_price']:
+            self.db.update_position_high(symbol, decision['highest'])
+
+        if not decision['exit']: return
+        with self._lock:
+            if symbol in self._exiting: return
+            if self._retry_at.get(symbol, 0) > time.time(): return  # Saída falhou há pouco
+            self._exiting.add(symbol)
+
+        threading.Thread(target=self._dispatch_exit, args=(symbol, price, decision),
+                         name=f"exit-{symbol}", daemon=True).start()
+
+    def _dispatch_exit(self, symbol, price, decision):
+        ok = False
+        try:
+            ok = self.on_exit(symbol, price, decision) is not False
+        except Exception as e:
+            print(f"❌ Erro na saída via stream de {symbol}: {e}")
+        finally:
+            with self._lock:
+                self._exiting.discard(symbol)
+                if ok:
+                    self._retry_at.pop(symbol, None)
+                else:
+                    self._retry_at[symbol] = time.time() + self.exit_retry
+                    print(f"⏸️ Saída de {symbol} pelo stream falhou: nova tentativa em {self.exit_retry}s")
+
+
+# ==============================================================================
+# 🎞️ REPLAY LOCAL (testes): serve ticks gravados como se fosse a Binance
+# ==============================================================================
+def serve_replay(path, host='127.0.0.1', port=8765, speed=0.0):
+    """
+    Servidor WebSocket local que reenvia um arquivo de ticks gravado (PRICE_STREAM_RECORD_FILE).
+    Aponte PRICE_STREAM_URL para ws://host:port e o PriceStreamEngine roda sem tocar na Binance.
+    speed = intervalo em segundos entre mensagens (0 = o mais rápido possível).
+    """
+    from websockets.sync.server import serve
+
+    with open(path) as f:
+        messages = [line.rstrip('\n') for line in f if line.strip()]
+
+    def handler(ws):
+        for msg in messages:
+            ws.send(msg)
+            if speed: time.sleep(speed)
+        # Mantém a conexão aberta até o cliente sair (evita reconexão em loop)
+        for _ in ws: pass
+
+    with serve(handler, host, port) as server:
+        print(f"🎞️ Replay de {len(messages)} ticks em ws://{host}:{port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    # Uso: python price_stream.py ticks.jsonl [porta] [intervalo_s]
+    serve_replay(sys.argv[1],
+                 port=int(sys.argv[2]) if len(sys.argv) > 2 else 8765,
+                 speed=float(sys.argv[3]) if len(sys.argv) > 3 else 0.0)
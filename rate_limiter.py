@@ -0,0 +1,144 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+import config
+from metrics import metrics
+
+# ==============================================================================
+# 🚦 LIMITADOR DE PESO (REQUEST_WEIGHT da Binance)
+# Token bucket com o peso de cada endpoint, sincronizado com o X-MBX-USED-WEIGHT-1m
+# devolvido pelo servidor e com o Retry-After dos 429/418.
+# Prioridades: saídas (vendas/stops) > loop normal/dashboard > scanner.
+# A prioridade vale para o contexto atual (thread ou task asyncio), via contextvars.
+# Cada prioridade precisa deixar uma reserva intacta no balde, então o scanner
+# nunca consome o peso que uma venda vai precisar.
+# ==============================================================================
+
+PRIORITY_EXIT = 0    # Vendas, stops, saídas do stream
+PRIORITY_NORMAL = 1  # Loop principal, compras, dashboard
+PRIORITY_SCAN = 2    # Scanner (ticker 24h + klines dos candidatos)
+
+PRIORITY_NAMES = ('exit', 'normal', 'scan')
+
+# endpoint -> (peso com symbol, peso sem symbol / todos os pares)
+ENDPOINT_WEIGHTS = {
+    '/api/v3/ticker/24hr': (2, 80),
+    '/api/v3/ticker/price': (2, 4),
+    '/api/v3/klines': (2, 2),
+    '/api/v3/account': (20, 20),
+    '/api/v3/exchangeInfo': (20, 20),
+    '/api/v3/order': (1, 1),
+    '/api/v3/time': (1, 1),
+}
+
+
+def request_weight(endpoint, params=None):
+    single, full = ENDPOINT_WEIGHTS.get(endpoint, (1, 1))
+    return single if params and 'symbol' in params else full
+
+
+class RateLimiter:
+    def __init__(self, limit=None, reserves=None, max_wait=None):
+        self.limit = limit or config.RATE_LIMIT_WEIGHT_PER_MIN
+        reserves = reserves or config.RATE_LIMIT_RESERVE
+        max_wait = max_wait or config.RATE_LIMIT_MAX_WAIT
+        self.floors = [reserves[name] * self.limit for name in PRIORITY_NAMES]
+        self.max_wait = [max_wait[name] for name in PRIORITY_NAMES]
+
+        self.rate = self.limit / 60.0  # Reposição por segundo (janela de 1 minuto)
+        self.tokens = float(self.limit)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0       # Retry-After / ban (418)
+        self.server_used = 0           # Último X-MBX-USED-WEIGHT-1m visto
+
+        self._cond = threading.Condition()
+        self._priority = contextvars.ContextVar('rate_limit_priority', default=PRIORITY_NORMAL)
+
+    # --- Prioridade do contexto atual ---
+    @contextmanager
+    def priority(self, priority):
+        """with limiter.priority(PRIORITY_EXIT): ... (todas as chamadas do bloco herdam a prioridade)"""
+        token = self._priority.set(priority)
+        try:
+            yield
+        finally:
+            self._priority.reset(token)
+
+    def current_priority(self):
+        return self._priority.get()
+
+    # --- Bucket ---
+    def _refill(self, now):
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, weight, priority=None):
+        """
+        Reserva `weight` do balde, esperando até o tempo máximo da prioridade.
+        Retorna False se não couber a tempo (quem chama pula a requisição em vez de arriscar ban).
+        """
+        priority = self.current_priority() if priority is None else priority
+        floor = self.floors[priority]
+        deadline = time.monotonic() + self.max_wait[priority]
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens - weight >= floor:
+                    self.tokens -= weight
+                    return True
+                else:
+                    wait = (weight + floor - self.tokens) / self.rate
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    metrics.inc('binance_rate_limited_total', priority=PRIORITY_NAMES[priority])
+                    return False
+                self._cond.wait(min(wait, remaining))
+
+    def try_acquire(self, weight, priority=None):
+        """Versão sem espera (cliente async: só cai para acquire() numa thread se precisar esperar)"""
+        priority = self.current_priority() if priority is None else priority
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until and self.tokens - weight >= self.floors[priority]:
+                self.tokens -= weight
+                return True
+            return False
+
+    def update_from_headers(self, headers, status_code):
+        """Alinha o balde com o que o servidor diz já ter contado (e respeita 429/418)."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+
+            used = headers.get('X-MBX-USED-WEIGHT-1m')
+            if used is not None:
+                self.server_used = int(used)
+                self.tokens = min(self.tokens, self.limit - self.server_used)
+
+            if status_code in (418, 429):
+                retry_after = float(headers.get('Retry-After') or 60)
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                self.tokens = 0.0
+                metrics.inc('binance_http_bans_total', status=status_code)
+                print(f"🚦 Binance {status_code}: pausando requisições por {retry_after:.0f}s")
+
+            self._cond.notify_all()
+
+    def available(self, priority=PRIORITY_SCAN):
+        """Peso que a prioridade ainda pode gastar agora sem invadir a reserva das outras"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until: return 0
+            return max(int(self.tokens - self.floors[priority]), 0)
+
+
+# Balde único do processo (todas as instâncias de BinanceClient dividem o mesmo limite de IP)
+limiter = RateLimiter()
@@ -0,0 +1,110 @@
+import config
+from account_state import AccountState
+from price_snapshot import PriceSnapshot
+from exchange_info import SymbolFilters
+
+# ==============================================================================
+# 🔄 RECONCILIAÇÃO CONTA BINANCE x BANCO LOCAL
+# 1 /api/v3/account + 1 /api/v3/ticker/price (todos os pares) + exchangeInfo do cache em disco.
+# A comparação é toda em memória; as correções entram no banco em um único commit.
+# Usada pelo sync.py (CLI) e pelo BotController no start (RECONCILE_ON_STARTUP).
+# ==============================================================================
+
+
+def diff(balances, price_map, filters, positions, dust=None):
+    """
+    Compara saldos reais com as posições do bot (sem I/O).
+    balances: {asset: {'free', 'locked'}} | price_map: {symbol: preço} | positions: db.data['active_positions']
+    Retorna o plano: imports, removals, qty_updates, equity, usdt.
+    """
+    dust = config.RECONCILE_DUST_USDT if dust is None else dust
+    quote = config.SYMBOL_QUOTE
+
+    usdt = 0.0
+    held = {}
+    unpriced = set()  # Tem saldo mas sem preço/par negociável agora: não dá para afirmar que é poeira
+    for asset, b in balances.items():
+        amount = b['free'] + b['locked']
+        if asset == quote:
+            usdt = amount
+            continue
+        symbol = f"{asset}{quote}"
+        price = price_map.get(symbol)
+        # Sem par USDT negociável (LD*, NFT, delistados): ignorado sem chamada nenhuma (-1121)
+        if not price or not filters.is_trading(symbol):
+            unpriced.add(symbol)
+            continue
+        if amount * price > dust:  # Filtro de poeira
+            held[symbol] = (amount, price)
+
+    imports = {}
+    for symbol, (amount, price) in held.items():
+        if symbol not in positions:
+            imports[symbol] = {'price': price, 'amount_usdt': amount * price, 'base_qty': amount}
+
+    # Posição sem preço mas com saldo na conta fica como está (par em BREAK, preço ausente no snapshot)
+    removals = [symbol for symbol in positions if symbol not in held and symbol not in unpriced]
+
+    qty_updates = {}
+    for symbol, data in positions.items():
+        if symbol not in held: continue
+        amount = held[symbol][0]
+        base_qty = data.get('base_qty') or 0.0
+        # A posição não pode ter mais moedas do que a conta (comissão/venda parcial); posições antigas sem qty adotam o saldo
+        if not base_qty or amount < base_qty * (1 - config.RECONCILE_QTY_TOLERANCE):
+            qty_updates[symbol] = amount
+
+    equity = usdt
+    for symbol, (amount, price) in held.items():
+        if symbol in imports:
+            equity += amount * price
+        elif symbol in positions:
+            equity += qty_updates.get(symbol, positions[symbol].get('base_qty') or amount) * price
+    for symbol in unpriced:
+        data = positions.get(symbol)
+        if data:  # Sem preço atual: entra pelo preço de compra
+            equity += (data.get('base_qty') or 0.0) * data['buy_price']
+
+    return {
+        'imports': imports,
+        'removals': removals,
+        'qty_updates': qty_updates,
+        'equity': equity,
+        'usdt': usdt,
+    }
+
+
+def reconcile(api, db, prices=None, filters=None, account=None, dry_run=False):
+    """Busca conta e preços, compara e aplica (a menos que dry_run). Retorna o plano, ou None se a conta ou os preços não responderam."""
+    account = account or AccountState(api)
+    if not account.refresh():
+        print("❌ Reconciliação: não foi possível ler a conta na Binance")
+        return None
+
+    prices = prices or PriceSnapshot(api)
+    # Sem preços, toda posição pareceria poeira e seria apagada: melhor não reconciliar
+    if not prices.refresh() or not prices.prices:
+        print("❌ Reconciliação: não foi possível ler os preços na Binance (nada alterado)")
+        return None
+    if filters is None:
+        filters = SymbolFilters(api)
+        filters.load()  # Cache em disco do bot: normalmente nenhuma chamada
+
+    plan = diff(account.balances, prices.prices, filters, db.data['active_positions'])
+    if not dry_run:
+        db.apply_reconciliation(plan['imports'], plan['removals'], plan['qty_updates'], plan['equity'])
+    print_report(plan, dry_run)
+    return plan
+
+
+def print_report(plan, dry_run=False):
+    prefix = "🧪 (simulação) " if dry_run else ""
+    for symbol, p in plan['imports'].items():
+        print(f"   📥 {prefix}IMPORTANDO: {symbol} | Qtd: {p['base_qty']:.6f} | ${p['amount_usdt']:.2f} (na Binance, ausente no bot)")
+    for symbol in plan['removals']:
+        print(f"   🗑️ {prefix}LIMPANDO: {symbol} (consta no bot, saldo zero/poeira na Binance)")
+    for symbol, qty in plan['qty_updates'].items():
+        print(f"   📐 {prefix}AJUSTANDO QTD: {symbol} -> {qty:.6f}")
+    if not (plan['imports'] or plan['removals'] or plan['qty_updates']):
+        print("   ✅ Conta e banco já estão em sincronia")
+    print(f"   💰 Equity: ${plan['equity']:.2f} | 💵 Caixa (USDT): ${plan['usdt']:.2f}")
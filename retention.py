@@ -0,0 +1,41 @@
+import time
+import config
+
+
+class RetentionManager:
+    """
+    Limpeza periódica das tabelas de log por marca d'água de id.
+    Em vez de DELETE ... NOT IN (...) a cada INSERT, apaga de uma vez tudo abaixo de
+    MAX(id) - limite, usando apenas a chave primária (faixa contígua, sem ordenação).
+    """
+    def __init__(self, pool, policies=None, interval=None):
+        self.pool = pool
+        self.policies = policies or config.DB_RETENTION  # tabela -> linhas mantidas
+        self.interval = interval if interval is not None else config.DB_RETENTION_INTERVAL
+        self.last_run = 0.0
+        self.last_report = []
+
+    def due(self):
+        return time.time() - self.last_run >= self.interval
+
+    def run(self, force=False):
+        """Executa a limpeza se estiver no horário. Retorna [{table, deleted, ms}]."""
+        if not force and not self.due():
+            return []
+
+        report = []
+        for table, keep in self.policies.items():
+            start = time.perf_counter()
+            with self.pool.write() as conn:
+                max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+                if max_id is None: continue
+                cursor = conn.execute(f"DELETE FROM {table} WHERE id <= ?", (max_id - keep,))
+            report.append({
+                'table': table,
+                'deleted': cursor.rowcount,
+                'ms': (time.perf_counter() - start) * 1000,
+            })
+
+        self.last_run = time.time()
+        self.last_report = report
+        return report
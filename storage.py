@@ -1,19 +1,96 @@
 import sqlite3
 import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from collections.abc import Mapping
 from datetime import datetime, timedelta, timezone
 import os
+import config
+from db_pool import ConnectionManager
+from retention import RetentionManager
 
 # Nome do Banco de Dados
 DB_FILE = 'bot_database.db'
 
+
+class PortfolioView(Mapping):
+    """Leitura compatível com o antigo dicionário `data`, servida da memória."""
+    KEYS = ("metadata", "wallet_summary", "active_positions", "balance_history")
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getitem__(self, key):
+        m = self._manager
+        if key == "active_positions":
+            return m._positions
+        if key == "wallet_summary":
+            return {"current_equity": m._wallet['current_equity']}
+        if key == "metadata":
+            return {"updated_at": m._wallet['updated_at']}
+        if key == "balance_history":
+            return m.get_balance_history()
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+
 class PortfolioManager:
     def __init__(self):
         self.conn = None
         self._init_db()
 
+        # Conexões persistentes (1 escrita + pool de leitura)
+        self.pool = ConnectionManager(DB_FILE)
+        self.conn = self.pool.writer # Também detecta escritas externas (data_version)
+
+        # Estado autoritativo em memória; SQLite recebe as alterações em lote (write-behind)
+        self._lock = self.pool.lock
+        self.retention = RetentionManager(self.pool)
+        self._positions = {}
+        self._wallet = {'current_equity': 0.0, 'updated_at': ""}
+        self._dirty_positions = set()
+        self._wallet_dirty = False
+        self._last_flush = time.time()
+        self._data_version = None
+        self._local = threading.local() # Buffer de escritas adiadas da thread (deferred_writes)
+        self._load_state()
+        atexit.register(self.flush)
+
     def _get_conn(self):
         return sqlite3.connect(DB_FILE, check_same_thread=False)
 
+    def transaction(self):
+        """Agrupa as escritas do bloco em um único commit (ver ConnectionManager.transaction)"""
+        return self.pool.transaction()
+
+    @contextmanager
+    def deferred_writes(self):
+        """
+        Adia as escritas desta thread (logs + flush do write-behind) para o fim do bloco, onde entram
+        numa transação curta. O bloco pode fazer chamadas de rede sem deixar transação aberta no SQLite.
+        Escritas duráveis (compra/venda) continuam indo para o disco na hora.
+        """
+        if getattr(self._local, 'logs', None) is not None:
+            yield  # Já dentro de um bloco adiado
+            return
+        self._local.logs = []
+        try:
+            yield
+        finally:
+            logs, self._local.logs = self._local.logs, None
+            with self.transaction():
+                for row in logs:
+                    self._insert_log(*row)
+                self.flush()
+            self._last_flush = time.time()
+
     def _init_db(self):
         conn = self._get_conn()
         cursor = conn.cursor()
@@ -76,6 +153,7 @@ class PortfolioManager:
             )
         ''')
 
+        # Legado: watchlist antiga (só lida na migração para candidate_snapshots)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS candidates (
                 symbol TEXT PRIMARY KEY,
@@ -87,6 +165,124 @@ class PortfolioManager:
             )
         ''')
 
+        # Watchlist por geração: cada scan grava um lote novo e só então vira o ponteiro ativo.
+        # Leitores sempre veem um lote completo (o anterior ou o novo), nunca a tabela pela metade
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS candidate_snapshots (
+                generation INTEGER,
+                symbol TEXT,
+                price REAL,
+                rsi REAL,
+                rvol REAL,
+                change_pct REAL,
+                status TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (generation, symbol)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS candidate_generation (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                active INTEGER
+            )
+        ''')
+
+        # Cache de velas (KlineCache) para aquecer após restart sem rebaixar tudo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS kline_cache (
+                symbol TEXT,
+                interval TEXT,
+                open_time INTEGER,
+                close REAL,
+                volume REAL,
+                PRIMARY KEY (symbol, interval, open_time)
+            ) WITHOUT ROWID
+        ''')
+
+        # Ledger de execuções: um registro por fill das ordens (preço, qty e comissão reais)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS executions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                order_id INTEGER,
+                symbol TEXT,
+                side TEXT,
+                price REAL,
+                qty REAL,
+                quote_qty REAL,
+                commission REAL,
+                commission_asset TEXT
+            )
+        ''')
+
+        # Trades fechados com PnL realizado (preços médios dos fills de compra e venda)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS trades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT,
+                strategy_type TEXT,
+                opened_at TEXT,
+                closed_at TEXT,
+                buy_price REAL,
+                sell_price REAL,
+                base_qty REAL,
+                cost_usdt REAL,
+                proceeds_usdt REAL,
+                fees_usdt REAL,
+                pnl_usdt REAL,
+                pnl_pct REAL,
+                reason TEXT,
+                hold_seconds REAL
+            )
+        ''')
+        cursor.execute("PRAGMA table_info(trades)")
+        if 'hold_seconds' not in [info[1] for info in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE trades ADD COLUMN hold_seconds REAL DEFAULT 0.0")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_symbol_closed ON trades(symbol, closed_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_strategy_closed ON trades(strategy_type, closed_at)")
+
+        # Agregados dos trades mantidos a cada fechamento (UPSERT no mesmo commit do trade).
+        # day = 'YYYY-MM-DD' (BRT) ou '*' para o acumulado: estatísticas sem varrer a tabela trades
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS trade_stats (
+                day TEXT,
+                strategy_type TEXT,
+                trades INTEGER,
+                wins INTEGER,
+                pnl_usdt REAL,
+                fees_usdt REAL,
+                cost_usdt REAL,
+                hold_seconds REAL,
+                best_pnl_usdt REAL,
+                worst_pnl_usdt REAL,
+                PRIMARY KEY (day, strategy_type)
+            ) WITHOUT ROWID
+        ''')
+        if (cursor.execute("SELECT COUNT(*) FROM trade_stats").fetchone()[0] == 0
+                and cursor.execute("SELECT COUNT(*) FROM trades").fetchone()[0] > 0):
+            # Trades gravados antes dos agregados: reconstrói uma única vez
+            for day_expr in ("substr(closed_at, 1, 10)", "'*'"):
+                cursor.execute(f'''
+                    INSERT INTO trade_stats
+                    SELECT {day_expr}, strategy_type, COUNT(*), SUM(pnl_usdt > 0), SUM(pnl_usdt), SUM(fees_usdt),
+                           SUM(cost_usdt), SUM(hold_seconds), MAX(pnl_usdt), MIN(pnl_usdt)
+                    FROM trades GROUP BY 1, 2
+                ''')
+
+        # Consultas do gráfico por intervalo de tempo (/api/history?after_ts=...)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp)")
+
+        # Outbox de eventos: cada alteração relevante vira uma linha no MESMO commit da alteração.
+        # A API acompanha por id (WHERE id > ?) e empurra os deltas para o dashboard (SSE)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL,
+                kind TEXT,
+                payload TEXT
+            )
+        ''')
+
         # --- MIGRAÇÃO AUTOMÁTICA (Adiciona colunas novas se não existirem) ---
         # Verifica se stop_price existe na tabela positions
         cursor.execute("PRAGMA table_info(positions)")
@@ -104,6 +300,16 @@ class PortfolioManager:
             print("⚙️ Migrando DB: Adicionando coluna 'strategy_type'...")
             cursor.execute("ALTER TABLE positions ADD COLUMN strategy_type TEXT DEFAULT 'CONSERVATIVE'")
 
+        if 'base_qty' not in columns:
+            print("⚙️ Migrando DB: Adicionando coluna 'base_qty'...")
+            cursor.execute("ALTER TABLE positions ADD COLUMN base_qty REAL DEFAULT 0.0")
+            # Posições antigas: melhor estimativa disponível (valor investido / preço de entrada)
+            cursor.execute("UPDATE positions SET base_qty = amount_usdt / buy_price WHERE buy_price > 0")
+
+        if 'entry_fee_usdt' not in columns:
+            print("⚙️ Migrando DB: Adicionando coluna 'entry_fee_usdt'...")
+            cursor.execute("ALTER TABLE positions ADD COLUMN entry_fee_usdt REAL DEFAULT 0.0")
+
         # Verifica se status existe na tabela candidates
         cursor.execute("PRAGMA table_info(candidates)")
         c_columns = [info[1] for info in cursor.fetchall()]
@@ -112,6 +318,15 @@ class PortfolioManager:
             print("⚙️ Migrando DB: Adicionando coluna 'status' em candidates...")
             cursor.execute("ALTER TABLE candidates ADD COLUMN status TEXT")
         
+        # Bancos antigos: a última watchlist da tabela `candidates` vira a geração 1
+        if cursor.execute("SELECT COUNT(*) FROM candidate_generation").fetchone()[0] == 0:
+            cursor.execute('''
+                INSERT INTO candidate_snapshots (generation, symbol, price, rsi, rvol, change_pct, status, updated_at)
+                SELECT 1, symbol, price, rsi, rvol, 0.0, status, updated_at FROM candidates
+            ''')
+            cursor.execute("INSERT INTO candidate_generation (id, active) VALUES (1, ?)",
+                           (1 if cursor.rowcount > 0 else 0,))
+
         conn.commit()
         conn.close()
 
@@ -119,181 +334,600 @@ class PortfolioManager:
         brt_time = datetime.now(timezone.utc) - timedelta(hours=3)
         return brt_time.strftime('%Y-%m-%d %H:%M:%S')
 
+    # ==============================================================================
+    # 🧠 ESTADO EM MEMÓRIA (Fonte da verdade do processo)
+    # ==============================================================================
+    def _load_state(self):
+        """Carrega posições e wallet do SQLite para memória"""
+        with self._lock:
+            self.conn.row_factory = sqlite3.Row
+            cursor = self.conn.cursor()
+
+            positions = {}
+            cursor.execute("SELECT * FROM positions")
+            for row in cursor.fetchall():
+                positions[row['symbol']] = self._row_to_position(row)
+
+            cursor.execute("SELECT current_equity, updated_at FROM wallet WHERE id=1")
+            w_row = cursor.fetchone()
+            self._wallet = {
+                'current_equity': w_row['current_equity'] if w_row else 0.0,
+                'updated_at': w_row['updated_at'] if w_row else ""
+            }
+
+            self._positions = positions
+            self._data_version = cursor.execute("PRAGMA data_version").fetchone()[0]
+            self.conn.row_factory = None
+
+    @staticmethod
+    def _row_to_position(row):
+        return {
+            'buy_price': row['buy_price'],
+            'highest_price': row['highest_price'],
+            'amount_usdt': row['amount_usdt'],
+            'rsi_at_entry': row['rsi_at_entry'],
+            'entry_time': row['entry_time'],
+            'stop_price': row['stop_price'] if 'stop_price' in row.keys() else 0.0,
+            'status_label': row['status_label'] if 'status_label' in row.keys() else 'HOLD',
+            'strategy_type': row['strategy_type'] if 'strategy_type' in row.keys() else 'CONSERVATIVE',
+            'base_qty': row['base_qty'] if 'base_qty' in row.keys() else 0.0,
+            'entry_fee_usdt': row['entry_fee_usdt'] if 'entry_fee_usdt' in row.keys() else 0.0
+        }
+
+    def _sync_external(self):
+        """
+        Recarrega o estado se OUTRO processo gravou no banco (ex: venda manual pela API).
+        PRAGMA data_version só muda com commits de outras conexões, então é barato.
+        """
+        with self._lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self.flush()
+                self._load_state()
+
+    def flush(self):
+        """Grava em um único commit todas as alterações pendentes (write-behind)"""
+        with self._lock:
+            if not self._dirty_positions and not self._wallet_dirty:
+                return
+
+            with self.pool.transaction(): # Erro no meio = rollback (nada pela metade no próximo commit)
+                rows = []
+                for symbol in self._dirty_positions:
+                    pos = self._positions.get(symbol)
+                    if pos:
+                        rows.append((pos['highest_price'], pos['stop_price'], pos['status_label'], symbol))
+                        self._emit('position', {'symbol': symbol, **pos})
+                if rows:
+                    self.conn.executemany(
+                        "UPDATE positions SET highest_price = ?, stop_price = ?, status_label = ? WHERE symbol = ?", rows
+                    )
+                if self._wallet_dirty:
+                    self.conn.execute("UPDATE wallet SET current_equity = ?, updated_at = ? WHERE id = 1",
+                                      (self._wallet['current_equity'], self._wallet['updated_at']))
+                    self._emit('summary', self._summary())
+
+            self._dirty_positions = set()
+            self._wallet_dirty = False
+            self._last_flush = time.time()
+
+    # ==============================================================================
+    # 📣 EVENTOS (outbox lido pelo /api/stream)
+    # ==============================================================================
+    def _emit(self, kind, payload, conn=None):
+        """Enfileira um evento na conexão de escrita: vai para o disco no mesmo commit da alteração."""
+        if not config.EVENTS_ENABLED: return
+        (conn or self.conn).execute("INSERT INTO events (created_at, kind, payload) VALUES (?, ?, ?)",
+                                    (time.time(), kind, json.dumps(payload)))
+
+    def read_events(self, after_id, limit=500):
+        """Eventos com id > after_id, em ordem: [(id, kind, payload dict)]"""
+        with self.pool.reader() as conn:
+            rows = conn.execute("SELECT id, kind, payload FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                                (after_id, limit)).fetchall()
+        return [(r['id'], r['kind'], json.loads(r['payload'])) for r in rows]
+
+    def last_event_id(self):
+        with self.pool.reader() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def _summary(self):
+        """Mesmo formato do /api/summary"""
+        return {
+            "wallet_summary": {"current_equity": self._wallet['current_equity']},
+            "updated_at": self._wallet['updated_at'],
+            "active_positions_count": len(self._positions),
+        }
+
+    def _maybe_flush(self):
+        if getattr(self._local, 'logs', None) is not None: return # Flush no fim do deferred_writes
+        if time.time() - self._last_flush >= config.DB_FLUSH_INTERVAL:
+            self.flush()
+
+    @contextmanager
+    def _durable_change(self, positions=None):
+        """
+        Escrita durável (compra/venda/reconciliação): troca o dict de posições e grava tudo, com as
+        pendências do write-behind, numa transação com synchronous=FULL. Se o SQL falhar, rollback
+        e a memória volta ao estado anterior (nunca diverge do disco).
+        """
+        with self._lock:
+            previous, wallet = self._positions, self._wallet
+            if positions is not None:
+                self._positions = positions
+            try:
+                with self.pool.transaction(durable=True):
+                    yield self.conn
+                    self.flush()
+            except BaseException:
+                self._positions, self._wallet = previous, wallet
+                raise
+
     # ==============================================================================
     # 🎩 A MÁGICA DA COMPATIBILIDADE (Dashboard lê isso aqui)
     # ==============================================================================
     @property
     def data(self):
         """
-        Reconstrói o dicionário antigo on-the-fly lendo do SQLite.
-        Isso permite que main.py e dashboard.py funcionem sem refatoração pesada.
+        Visão dict-compatível do estado em memória (sem tocar no SQLite).
+        'balance_history' só é lido do banco se alguém pedir por ele.
         """
-        conn = self._get_conn()
-        conn.row_factory = sqlite3.Row # Permite acessar colunas por nome
-        cursor = conn.cursor()
-        
-        # 1. Posições
-        active_positions = {}
-        cursor.execute("SELECT * FROM positions")
-        for row in cursor.fetchall():
-            active_positions[row['symbol']] = {
-                'buy_price': row['buy_price'],
-                'highest_price': row['highest_price'],
-                'amount_usdt': row['amount_usdt'],
-                'rsi_at_entry': row['rsi_at_entry'],
-                'entry_time': row['entry_time'],
-                'stop_price': row['stop_price'] if 'stop_price' in row.keys() else 0.0,
-                'status_label': row['status_label'] if 'status_label' in row.keys() else 'HOLD',
-                'strategy_type': row['strategy_type'] if 'strategy_type' in row.keys() else 'CONSERVATIVE'
-            }
-            
-        # 2. Histórico (Pega os últimos 1000 para não pesar)
-        balance_history = []
-        cursor.execute("SELECT timestamp, equity, fluctuation, positions_count FROM history ORDER BY id ASC")
-        for row in cursor.fetchall():
-            balance_history.append({
-                'timestamp': row['timestamp'],
-                'equity': row['equity'], # Nome unificado
-                'equity_usdt': row['equity'], # Compatibilidade
-                'fluctuation': row['fluctuation'],
-                'positions': row['positions_count']
-            })
-            
-        # 3. Wallet
-        cursor.execute("SELECT current_equity, updated_at FROM wallet WHERE id=1")
-        w_row = cursor.fetchone()
-        
-        conn.close()
-        
+        self._sync_external()
+        return PortfolioView(self)
+
+    def get_position(self, symbol):
+        """Leitura direta da memória (caminho quente do stream de preços, sem checar o banco)"""
+        return self._positions.get(symbol)
+
+    def get_balance_history(self):
+        """Histórico de equity para o gráfico (já reduzido no SQL para HISTORY_CHART_POINTS faixas)"""
+        return self.get_history_page(buckets=config.HISTORY_CHART_POINTS)
+
+    def get_history_page(self, since_id=None, after_ts=None, limit=None, buckets=None):
+        """
+        Pontos de equity em ordem cronológica, direto da tabela (sem passar pelo estado em memória).
+        since_id: só ids maiores (cursor incremental do gráfico, pela PK)
+        after_ts: só timestamps maiores ('YYYY-MM-DD HH:MM:SS', usa idx_history_timestamp)
+        limit: os N pontos mais recentes do filtro
+        buckets: reduz no SQL para o mínimo e o máximo de cada uma das N faixas de id (+ primeiro e último):
+                 no máximo ~2N linhas chegam ao Python, nunca a tabela inteira
+        """
+        where, params = [], []
+        if since_id is not None:
+            where.append("id > ?"); params.append(since_id)
+        if after_ts is not None:
+            where.append("timestamp > ?"); params.append(after_ts)
+        base = "SELECT id, timestamp, equity, fluctuation, positions_count FROM history"
+        if where:
+            base += " WHERE " + " AND ".join(where)
+        if limit:
+            base += " ORDER BY id DESC LIMIT ?"
+            params.append(limit)
+
+        with self.pool.reader() as conn:
+            if buckets:
+                first_id, last_id, count = conn.execute(
+                    f"SELECT MIN(id), MAX(id), COUNT(*) FROM ({base})", params).fetchone()
+                if count > 2 * buckets:
+                    step = -(-(last_id - first_id + 1) // buckets)  # ceil
+                    # MIN/MAX com colunas "soltas": o SQLite devolve a linha que tem o extremo
+                    sql = f'''
+                        WITH base AS ({base})
+                        SELECT id, timestamp, MIN(equity) AS equity, fluctuation, positions_count
+                            FROM base GROUP BY (id - ?) / ?
+                        UNION
+                        SELECT id, timestamp, MAX(equity) AS equity, fluctuation, positions_count
+                            FROM base GROUP BY (id - ?) / ?
+                        UNION
+                        SELECT * FROM base WHERE id IN (?, ?)
+                        ORDER BY id
+                    '''
+                    rows = conn.execute(sql, params + [first_id, step, first_id, step, first_id, last_id]).fetchall()
+                    return [self._history_point(row) for row in rows]
+            rows = conn.execute(f"SELECT * FROM ({base}) ORDER BY id ASC", params).fetchall()
+            return [self._history_point(row) for row in rows]
+
+    def history_version(self):
+        """(menor id, maior id) da tabela history: muda a cada INSERT e a cada retenção (ETag barato, só PK)"""
+        with self.pool.reader() as conn:
+            return tuple(conn.execute("SELECT MIN(id), MAX(id) FROM history").fetchone())
+
+    @staticmethod
+    def _history_point(row):
         return {
-            "metadata": {"updated_at": w_row['updated_at'] if w_row else ""},
-            "wallet_summary": {"current_equity": w_row['current_equity'] if w_row else 0.0},
-            "active_positions": active_positions,
-            "balance_history": balance_history
+            'id': row['id'],
+            'timestamp': row['timestamp'],
+            'equity': row['equity'], # Nome unificado
+            'equity_usdt': row['equity'], # Compatibilidade
+            'fluctuation': row['fluctuation'],
+            'positions': row['positions_count']
         }
 
     # ==============================================================================
     # ⚙️ MÉTODOS DE ESCRITA (Bot usa isso)
     # ==============================================================================
 
-    def add_position(self, symbol, price, amount, rsi, strategy_type='CONSERVATIVE'):
-        conn = self._get_conn()
-        conn.execute('''
-            INSERT OR REPLACE INTO positions (symbol, buy_price, highest_price, amount_usdt, rsi_at_entry, entry_time, strategy_type)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (symbol, price, price, amount, rsi, self.get_timestamp_brt(), strategy_type))
-        conn.commit()
-        conn.close()
+    def add_position(self, symbol, price, amount, rsi, strategy_type='CONSERVATIVE', base_qty=None, entry_fee=0.0):
+        """
+        price/amount/base_qty: preço médio, USDT gasto e moedas recebidas da execução real (base_qty padrão = amount / price)
+        entry_fee: comissão da compra em USDT (entra no fees_usdt do trade quando a posição fechar)
+        """
+        entry_time = self.get_timestamp_brt()
+        if base_qty is None:
+            base_qty = amount / price if price else 0.0
+        with self._lock:
+            # Copy-on-write: quem está iterando a visão antiga não vê o dict mudar de tamanho
+            positions = dict(self._positions)
+            positions[symbol] = {
+                'buy_price': price,
+                'highest_price': price,
+                'amount_usdt': amount,
+                'rsi_at_entry': rsi,
+                'entry_time': entry_time,
+                'stop_price': 0.0,
+                'status_label': 'HOLD',
+                'strategy_type': strategy_type,
+                'base_qty': base_qty,
+                'entry_fee_usdt': entry_fee
+            }
+            with self._durable_change(positions) as conn:
+                self._dirty_positions.discard(symbol)
+                self._emit('position', {'symbol': symbol, **positions[symbol]})
+                self._emit('summary', self._summary())
+                conn.execute('''
+                    INSERT OR REPLACE INTO positions (symbol, buy_price, highest_price, amount_usdt, rsi_at_entry, entry_time, strategy_type, base_qty, entry_fee_usdt)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (symbol, price, price, amount, rsi, entry_time, strategy_type, base_qty, entry_fee))
 
-    def remove_position(self, symbol):
-        conn = self._get_conn()
-        conn.execute("DELETE FROM positions WHERE symbol = ?", (symbol,))
-        conn.commit()
-        conn.close()
+    def remove_position(self, symbol, trade=None):
+        """Remove a posição; com `trade`, grava o trade fechado no MESMO commit (nunca um sem o outro)"""
+        with self._lock:
+            positions = dict(self._positions)
+            positions.pop(symbol, None)
+            with self._durable_change(positions) as conn:
+                self._dirty_positions.discard(symbol)
+                self._emit('position_closed', {'symbol': symbol})
+                self._emit('summary', self._summary())
+                if trade:
+                    self._insert_trade(symbol, trade)
+                conn.execute("DELETE FROM positions WHERE symbol = ?", (symbol,))
+
+    def _insert_trade(self, symbol, trade):
+        closed_at = self.get_timestamp_brt()
+        try:
+            hold = (datetime.fromisoformat(closed_at) - datetime.fromisoformat(trade['opened_at'])).total_seconds()
+        except (TypeError, ValueError):
+            hold = 0.0 # Posição importada sem entry_time válido
+
+        self.conn.execute('''
+            INSERT INTO trades (symbol, strategy_type, opened_at, closed_at, buy_price, sell_price, base_qty,
+                                cost_usdt, proceeds_usdt, fees_usdt, pnl_usdt, pnl_pct, reason, hold_seconds)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (symbol, trade['strategy_type'], trade['opened_at'], closed_at, trade['buy_price'],
+              trade['sell_price'], trade['base_qty'], trade['cost_usdt'], trade['proceeds_usdt'],
+              trade['fees_usdt'], trade['pnl_usdt'], trade['pnl_pct'], trade['reason'], hold))
+
+        # Agregados do dia e acumulado (O(1) por trade)
+        pnl = trade['pnl_usdt']
+        self.conn.executemany('''
+            INSERT INTO trade_stats (day, strategy_type, trades, wins, pnl_usdt, fees_usdt, cost_usdt,
+                                     hold_seconds, best_pnl_usdt, worst_pnl_usdt)
+            VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (day, strategy_type) DO UPDATE SET
+                trades = trades + 1,
+                wins = wins + excluded.wins,
+                pnl_usdt = pnl_usdt + excluded.pnl_usdt,
+                fees_usdt = fees_usdt + excluded.fees_usdt,
+                cost_usdt = cost_usdt + excluded.cost_usdt,
+                hold_seconds = hold_seconds + excluded.hold_seconds,
+                best_pnl_usdt = MAX(best_pnl_usdt, excluded.best_pnl_usdt),
+                worst_pnl_usdt = MIN(worst_pnl_usdt, excluded.worst_pnl_usdt)
+        ''', [(day, trade['strategy_type'], int(pnl > 0), pnl, trade['fees_usdt'], trade['cost_usdt'], hold, pnl, pnl)
+              for day in (closed_at[:10], '*')])
+
+    def apply_reconciliation(self, imports, removals, qty_updates, equity):
+        """
+        Aplica o plano do reconcile.py em UM commit durável: posições importadas, removidas,
+        quantidades corrigidas e o equity recalculado (nunca metade da sincronização no disco).
+        imports: {symbol: {'price', 'amount_usdt', 'base_qty'}} | removals: [symbol] | qty_updates: {symbol: base_qty}
+        """
+        entry_time = self.get_timestamp_brt()
+        with self._lock:
+            positions = dict(self._positions)
+            events = [] # Emitidos dentro da transação (rollback leva junto)
+            for symbol in removals:
+                positions.pop(symbol, None)
+                self._dirty_positions.discard(symbol)
+                events.append(('position_closed', {'symbol': symbol}))
+            for symbol, qty in qty_updates.items():
+                if symbol in positions:
+                    positions[symbol] = {**positions[symbol], 'base_qty': qty}
+                    events.append(('position', {'symbol': symbol, **positions[symbol]}))
+            for symbol, p in imports.items():
+                # RSI entra como 50 (neutro): o histórico da entrada original se perdeu
+                positions[symbol] = {
+                    'buy_price': p['price'],
+                    'highest_price': p['price'],
+                    'amount_usdt': p['amount_usdt'],
+                    'rsi_at_entry': 50.0,
+                    'entry_time': entry_time,
+                    'stop_price': 0.0,
+                    'status_label': 'HOLD',
+                    'strategy_type': 'CONSERVATIVE',
+                    'base_qty': p['base_qty']
+                }
+                self._dirty_positions.discard(symbol)
+                events.append(('position', {'symbol': symbol, **positions[symbol]}))
+            with self._durable_change(positions) as conn: # Wallet + summary + pendências do lote no mesmo commit
+                self._wallet = {'current_equity': equity, 'updated_at': entry_time}
+                self._wallet_dirty = True
+                for event in events:
+                    self._emit(*event)
+                if removals:
+                    conn.executemany("DELETE FROM positions WHERE symbol = ?", [(s,) for s in removals])
+                if qty_updates:
+                    conn.executemany("UPDATE positions SET base_qty = ? WHERE symbol = ?",
+                                     [(qty, s) for s, qty in qty_updates.items()])
+                if imports:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO positions (symbol, buy_price, highest_price, amount_usdt, rsi_at_entry, entry_time, strategy_type, base_qty)
+                        VALUES (?, ?, ?, ?, 50.0, ?, 'CONSERVATIVE', ?)
+                    ''', [(s, p['price'], p['price'], p['amount_usdt'], entry_time, p['base_qty']) for s, p in imports.items()])
+
+    # --- TRADES (jornal + estatísticas) ---
+    def get_trades(self, symbol=None, strategy_type=None, before=None, before_id=None, limit=50):
+        """
+        Trades fechados, mais recentes primeiro.
+        Paginação por chave (closed_at, id) do último item recebido: closed_at só tem resolução de segundo,
+        e trades fechados no mesmo segundo (swap, saídas em lote) não podem pular de página.
+        """
+        where, params = [], []
+        if symbol:
+            where.append("symbol = ?"); params.append(symbol)
+        if strategy_type:
+            where.append("strategy_type = ?"); params.append(strategy_type)
+        if before and before_id is not None:
+            where.append("(closed_at, id) < (?, ?)"); params += [before, before_id]
+        elif before:
+            where.append("closed_at < ?"); params.append(before)
+        sql = "SELECT * FROM trades"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY closed_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        with self.pool.reader() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def get_trade_stats(self, days=30):
+        """
+        Estatísticas só dos agregados: acumulado por estratégia + série diária dos últimos `days` dias.
+        Custo fixo por request (não depende de quantos trades existem).
+        """
+        since = (datetime.now(timezone.utc) - timedelta(hours=3, days=days)).strftime('%Y-%m-%d')
+        with self.pool.reader() as conn:
+            totals = [dict(r) for r in conn.execute("SELECT * FROM trade_stats WHERE day = '*'").fetchall()]
+            daily = [dict(r) for r in conn.execute(
+                "SELECT * FROM trade_stats WHERE day >= ? AND day != '*' ORDER BY day ASC", (since,)).fetchall()]
+
+        by_strategy = {r['strategy_type']: self._stats_view(r) for r in totals}
+        overall = self._stats_view({
+            'trades': sum(r['trades'] for r in totals),
+            'wins': sum(r['wins'] for r in totals),
+            'pnl_usdt': sum(r['pnl_usdt'] for r in totals),
+            'fees_usdt': sum(r['fees_usdt'] for r in totals),
+            'cost_usdt': sum(r['cost_usdt'] for r in totals),
+            'hold_seconds': sum(r['hold_seconds'] for r in totals),
+            'best_pnl_usdt': max((r['best_pnl_usdt'] for r in totals), default=0.0),
+            'worst_pnl_usdt': min((r['worst_pnl_usdt'] for r in totals), default=0.0),
+        })
+        return {
+            'overall': overall,
+            'by_strategy': by_strategy,
+            'daily': [{'day': r['day'], 'strategy_type': r['strategy_type'], **self._stats_view(r)} for r in daily],
+        }
+
+    @staticmethod
+    def _stats_view(r):
+        trades = r['trades'] or 0
+        return {
+            'trades': trades,
+            'wins': r['wins'],
+            'win_rate': round(r['wins'] / trades * 100, 2) if trades else 0.0,
+            'pnl_usdt': round(r['pnl_usdt'], 4),
+            'fees_usdt': round(r['fees_usdt'], 4),
+            'avg_pnl_usdt': round(r['pnl_usdt'] / trades, 4) if trades else 0.0,
+            'return_pct': round(r['pnl_usdt'] / r['cost_usdt'] * 100, 2) if r['cost_usdt'] else 0.0,
+            'avg_hold_minutes': round(r['hold_seconds'] / trades / 60, 1) if trades else 0.0,
+            'best_pnl_usdt': round(r['best_pnl_usdt'], 4),
+            'worst_pnl_usdt': round(r['worst_pnl_usdt'], 4),
+        }
+
+    def record_executions(self, symbol, side, fill):
+        """Grava os fills de uma ordem executada (ver trade_executor.summarize_order)"""
+        ts = self.get_timestamp_brt()
+        with self.pool.write() as conn:
+            conn.executemany('''
+                INSERT INTO executions (timestamp, order_id, symbol, side, price, qty, quote_qty, commission, commission_asset)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(ts, fill['order_id'], symbol, side, f['price'], f['qty'], f['price'] * f['qty'],
+                   f['commission'], f['commission_asset']) for f in fill['fills']])
 
     def update_position_high(self, symbol, new_high):
         """Atualiza o topo histórico para o Trailing Stop"""
-        conn = self._get_conn()
-        conn.execute("UPDATE positions SET highest_price = ? WHERE symbol = ?", (new_high, symbol))
-        conn.commit()
-        conn.close()
+        with self._lock:
+            pos = self._positions.get(symbol)
+            if not pos or pos['highest_price'] == new_high: return
+            pos['highest_price'] = new_high
+            self._dirty_positions.add(symbol)
+        self._maybe_flush()
 
     def update_wallet_summary(self, equity):
-        conn = self._get_conn()
-        ts = self.get_timestamp_brt()
-        conn.execute("UPDATE wallet SET current_equity = ?, updated_at = ? WHERE id = 1", (equity, ts))
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._wallet = {'current_equity': equity, 'updated_at': self.get_timestamp_brt()}
+            self._wallet_dirty = True
+        self._maybe_flush()
 
     def log_history(self, equity, fluctuation):
-        conn = self._get_conn()
-        
-        # Conta posições ativas para o log
-        cursor = conn.cursor()
-        cursor.execute("SELECT count(*) FROM positions")
-        count = cursor.fetchone()[0]
-        
-        conn.execute('''
-            INSERT INTO history (timestamp, equity, fluctuation, positions_count)
-            VALUES (?, ?, ?, ?)
-        ''', (self.get_timestamp_brt(), round(equity, 4), fluctuation, count))
-        
-        # Limpeza automática: Mantém apenas os últimos 2000 registros para o banco não explodir
-        conn.execute("DELETE FROM history WHERE id NOT IN (SELECT id FROM history ORDER BY id DESC LIMIT 2000)")
-        
-        conn.commit()
-        conn.close()
+        # Conta posições ativas para o log (memória, sem consulta)
+        count = len(self._positions)
+
+        point = {
+            'id': None,
+            'timestamp': self.get_timestamp_brt(),
+            'equity': round(equity, 4),
+            'equity_usdt': round(equity, 4),
+            'fluctuation': fluctuation,
+            'positions': count,
+        }
+        with self.pool.write() as conn:
+            cursor = conn.execute('''
+                INSERT INTO history (timestamp, equity, fluctuation, positions_count)
+                VALUES (?, ?, ?, ?)
+            ''', (point['timestamp'], point['equity'], fluctuation, count))
+            point['id'] = cursor.lastrowid
+            self._emit('history', point, conn)
 
     # Método auxiliar para limpar tudo (se precisar resetar)
     def reset_database(self):
-        if os.path.exists(DB_FILE):
-            os.remove(DB_FILE)
-        self._init_db()
+        with self._lock:
+            self.pool.close()
+            if os.path.exists(DB_FILE):
+                os.remove(DB_FILE)
+            self._init_db()
+            self.pool = ConnectionManager(DB_FILE)
+            self.conn = self.pool.writer
+            self._lock = self.pool.lock
+            self.retention.pool = self.pool
+            self._dirty_positions = set()
+            self._wallet_dirty = False
+            self._load_state()
+
+    def run_retention(self, force=False):
+        """Limpeza agendada das tabelas de log (ver RetentionManager). Retorna o relatório."""
+        return self.retention.run(force)
 
     # --- NOVOS MÉTODOS DE LOG ---
 
     def log_market_data(self, symbol, price, rsi, volume, rvol):
         """Salva dados de mercado para ML"""
-        conn = self._get_conn()
-        conn.execute('''
-            INSERT INTO market_data_history (timestamp, symbol, price, rsi, volume_24h, rvol)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (self.get_timestamp_brt(), symbol, price, rsi, volume, rvol))
-        
-        # Limpeza (Mantém últimos 10k registros)
-        # conn.execute("DELETE FROM market_data_history WHERE id NOT IN (SELECT id FROM market_data_history ORDER BY id DESC LIMIT 10000)")
-        conn.commit()
-        conn.close()
+        with self.pool.write() as conn:
+            conn.execute('''
+                INSERT INTO market_data_history (timestamp, symbol, price, rsi, volume_24h, rvol)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (self.get_timestamp_brt(), symbol, price, rsi, volume, rvol))
 
     def log_system_event(self, level, type, message):
         """Salva logs do sistema"""
-        conn = self._get_conn()
-        conn.execute('''
+        ts = self.get_timestamp_brt()
+        logs = getattr(self._local, 'logs', None)
+        if logs is not None:
+            logs.append((ts, level, type, message))
+            return
+        with self.pool.write():
+            self._insert_log(ts, level, type, message)
+
+    def _insert_log(self, ts, level, type, message):
+        cursor = self.conn.execute('''
             INSERT INTO system_logs (timestamp, level, type, message)
             VALUES (?, ?, ?, ?)
-        ''', (self.get_timestamp_brt(), level, type, message))
-        
-        # Limpeza (Mantém últimos 2000 logs)
-        conn.execute("DELETE FROM system_logs WHERE id NOT IN (SELECT id FROM system_logs ORDER BY id DESC LIMIT 2000)")
-        conn.commit()
-        conn.close()
+        ''', (ts, level, type, message))
+        self._emit('log', {'id': cursor.lastrowid, 'timestamp': ts, 'level': level, 'type': type, 'message': message})
 
     def update_position_status(self, symbol, stop_price, status_label):
-        """Atualiza status dinâmico da posição"""
-        conn = self._get_conn()
-        # Verifica se as colunas existem antes de tentar update (caso a migração tenha falhado silenciosamente, mas o _init_db deve garantir)
-        try:
-            conn.execute("UPDATE positions SET stop_price = ?, status_label = ? WHERE symbol = ?", 
-                         (stop_price, status_label, symbol))
-            conn.commit()
-        except Exception as e:
-            print(f"Erro ao atualizar status da posição: {e}")
-        conn.close()
+        """Atualiza status dinâmico da posição (write-behind; sem escrita se nada mudou)"""
+        with self._lock:
+            pos = self._positions.get(symbol)
+            if not pos: return
+            if pos['stop_price'] == stop_price and pos['status_label'] == status_label: return
+            pos['stop_price'] = stop_price
+            pos['status_label'] = status_label
+            self._dirty_positions.add(symbol)
+        self._maybe_flush()
 
     # --- CANDIDATES WATCHLIST ---
     def save_candidates(self, candidates):
-        """Salva a lista de candidatos (Top 10)"""
-        conn = self._get_conn()
-        
-        # Limpa tabela anterior (queremos apenas o snapshot atual)
-        conn.execute("DELETE FROM candidates")
-        
+        """
+        Grava a watchlist do scan como uma nova geração (um executemany) e vira o ponteiro ativo
+        no mesmo commit. Gerações fora da janela CANDIDATE_GENERATIONS_KEEP são descartadas.
+        """
         ts = self.get_timestamp_brt()
-        for c in candidates:
-            conn.execute('''
-                INSERT INTO candidates (symbol, price, rsi, rvol, status, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (c['symbol'], c['price'], c['rsi'], c['rvol'], c['status'], ts))
-            
-        conn.commit()
-        conn.close()
+        rows = [
+            {'symbol': c['symbol'], 'price': c['price'], 'rsi': c['rsi'], 'rvol': c['rvol'],
+             'change_pct': c.get('change', 0.0), 'status': c['status'], 'updated_at': ts}
+            for c in candidates
+        ]
 
-    def get_candidates(self):
-        """Retorna a lista de candidatos"""
-        conn = self._get_conn()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM candidates ORDER BY rsi ASC") # Ordena por RSI (menor = melhor oportunidade)
-        rows = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return rows
\ No newline at end of file
+        with self.pool.write() as conn:
+            generation = conn.execute("SELECT COALESCE(MAX(generation), 0) + 1 FROM candidate_snapshots").fetchone()[0]
+            conn.executemany('''
+                INSERT INTO candidate_snapshots (generation, symbol, price, rsi, rvol, change_pct, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(generation, r['symbol'], r['price'], r['rsi'], r['rvol'], r['change_pct'], r['status'], ts) for r in rows])
+            conn.execute("UPDATE candidate_generation SET active = ? WHERE id = 1", (generation,))
+            conn.execute("DELETE FROM candidate_snapshots WHERE generation <= ?",
+                         (generation - config.CANDIDATE_GENERATIONS_KEEP,))
+
+            # Mesmo formato/ordem do get_candidates
+            for r in rows: r['generation'] = generation
+            self._emit('candidates', sorted(rows, key=lambda r: r['rsi']), conn)
+        return generation
+
+    def get_candidates(self, generation=None):
+        """Watchlist de uma geração (padrão: a ativa). Uma única consulta = lote sempre completo."""
+        with self.pool.reader() as conn:
+            if generation is None:
+                cursor = conn.execute('''
+                    SELECT * FROM candidate_snapshots
+                    WHERE generation = (SELECT active FROM candidate_generation WHERE id = 1)
+                    ORDER BY rsi ASC
+                ''') # Ordena por RSI (menor = melhor oportunidade)
+            else:
+                cursor = conn.execute("SELECT * FROM candidate_snapshots WHERE generation = ? ORDER BY rsi ASC", (generation,))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_candidate_generations(self):
+        """Gerações guardadas (mais nova primeiro): [{generation, updated_at, count, active}]"""
+        with self.pool.reader() as conn:
+            active = conn.execute("SELECT active FROM candidate_generation WHERE id = 1").fetchone()[0]
+            rows = conn.execute('''
+                SELECT generation, MAX(updated_at) AS updated_at, COUNT(*) AS count
+                FROM candidate_snapshots GROUP BY generation ORDER BY generation DESC
+            ''').fetchall()
+        return [{**dict(r), 'active': r['generation'] == active} for r in rows]
+
+    def diff_candidates(self, old_generation, new_generation):
+        """O que mudou entre dois scans: pares que entraram, saíram e que mudaram de status"""
+        old = {c['symbol']: c for c in self.get_candidates(old_generation)}
+        new = {c['symbol']: c for c in self.get_candidates(new_generation)}
+        return {
+            'from': old_generation,
+            'to': new_generation,
+            'added': [new[s] for s in new if s not in old],
+            'removed': [old[s] for s in old if s not in new],
+            'changed': [
+                {'symbol': s, 'status': (old[s]['status'], new[s]['status']),
+                 'rsi': (old[s]['rsi'], new[s]['rsi']), 'price': (old[s]['price'], new[s]['price'])}
+                for s in new if s in old and old[s]['status'] != new[s]['status']
+            ],
+        }
+
+    # --- KLINE CACHE ---
+    def save_klines(self, symbol, interval, rows, keep_from=None):
+        """Grava velas [(open_time, close, volume)] e descarta as mais antigas que keep_from"""
+        with self.pool.write() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO kline_cache (symbol, interval, open_time, close, volume)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(symbol, interval, t, c, v) for t, c, v in rows])
+            if keep_from is not None:
+                conn.execute("DELETE FROM kline_cache WHERE symbol = ? AND interval = ? AND open_time < ?",
+                             (symbol, interval, keep_from))
+
+    def load_klines(self, symbol, interval, limit):
+        """Retorna as últimas `limit` velas em ordem cronológica"""
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT open_time, close, volume FROM kline_cache
+                WHERE symbol = ? AND interval = ? ORDER BY open_time DESC LIMIT ?
+            ''', (symbol, interval, limit)).fetchall()
+        return [tuple(r) for r in reversed(rows)]
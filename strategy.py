@@ -0,0 +1,173 @@
+import config
+
+# Regras da estratégia dual SEM I/O (sem API, sem banco).
+# O loop do bot, o motor de preços em tempo real e o backtester usam exatamente estas funções,
+# então as regras não podem divergir entre eles.
+# `params` é qualquer objeto com os mesmos atributos do config (o próprio módulo por padrão).
+
+
+def evaluate_exit(symbol, position, current_price, params=config):
+    """
+    Avalia uma posição aberta no preço atual.
+    Retorna dict com:
+      highest       -> novo topo (>= topo anterior)
+      pnl_pct       -> PnL atual (fração)
+      stop_price    -> stop vigente
+      status_label  -> rótulo para o dashboard
+      exit          -> None ou (nível_log, mensagem, motivo) se a posição deve ser vendida
+      alerts        -> [(chave, título, texto)] alertas de PnL para notificar (sem repetição: quem chama filtra)
+    """
+    buy_price = position['buy_price']
+    highest = max(position['highest_price'], current_price)
+    strategy_type = position.get('strategy_type', 'CONSERVATIVE')
+
+    pnl_pct = (current_price - buy_price) / buy_price
+    max_profit_pct = (highest - buy_price) / buy_price
+
+    decision = {'highest': highest, 'pnl_pct': pnl_pct, 'exit': None, 'alerts': []}
+
+    if strategy_type == 'SCALP':
+        # 🔥 SCALP: Stop Fixo -1% / Take Profit Fixo +2.5%
+        stop_price = buy_price * (1 - params.SCALP_STOP_LOSS)
+        tp_price = buy_price * (1 + params.SCALP_TAKE_PROFIT)
+
+        status_label = "SCALP"
+        if pnl_pct > 0: status_label = "SCALP_PROFIT"
+        if pnl_pct < 0: status_label = "SCALP_LOSS"
+
+        decision['stop_price'] = stop_price
+        decision['status_label'] = status_label
+
+        # Stop Loss Scalp (-1%)
+        if current_price <= stop_price:
+            decision['exit'] = ("INFO", f"⚡ SCALP STOP {symbol} | PnL: {pnl_pct*100:.2f}%", "Scalp Stop -1%")
+        # Take Profit Scalp (+2.5%)
+        elif current_price >= tp_price:
+            decision['exit'] = ("SUCCESS", f"⚡💰 SCALP TP {symbol} | PnL: {pnl_pct*100:.2f}%", "Scalp TP +2.5%")
+        return decision
+
+    # 🛡️ CONSERVATIVE: Trailing Stop Dinâmico (Escadinha)
+    if max_profit_pct < params.LADDER_1_THRESHOLD:
+        drop_limit = params.LADDER_1_STOP
+        mode = "🛡️ PROTEÇÃO"
+    elif max_profit_pct < params.LADDER_2_THRESHOLD:
+        drop_limit = params.LADDER_2_STOP
+        mode = "📈 TENDÊNCIA"
+    else:
+        drop_limit = params.LADDER_3_STOP
+        mode = "🚀 MOONSHOT"
+
+    stop_price = highest * (1 - drop_limit)
+
+    status_label = "HOLD"
+    if pnl_pct > 0.01: status_label = "PROFIT"
+    if pnl_pct < -0.01: status_label = "LOSS"
+
+    decision['stop_price'] = stop_price
+    decision['status_label'] = status_label
+
+    # Trailing Stop Loss Dinâmico
+    if current_price <= stop_price:
+        decision['exit'] = ("INFO", f"🔻 SAÍDA {symbol} | PnL: {pnl_pct*100:.2f}% | {mode}",
+                            f"Trailing Stop {mode} (Topo ${highest:.4f})")
+    # Stop Loss de Emergência
+    elif pnl_pct <= -params.STOP_LOSS_PERCENT:
+        decision['exit'] = ("WARNING", f"🛑 STOP LOSS {symbol} | PnL: {pnl_pct*100:.2f}%", "Stop Loss Fixo")
+    # Take Profit (Alvo Alto)
+    elif pnl_pct >= params.TAKE_PROFIT_PERCENT:
+        decision['exit'] = ("SUCCESS", f"💰 TAKE PROFIT {symbol} | PnL: {pnl_pct*100:.2f}%", "Take Profit Alvo")
+    else:
+        # Notificações de PnL (Telegram)
+        if pnl_pct > 0.03:
+            decision['alerts'].append((f"{symbol}_3%", "Lucro > 3%", f"📈 PnL: +{pnl_pct*100:.1f}%"))
+        if pnl_pct > 0.05:
+            decision['alerts'].append((f"{symbol}_5%", "Lucro > 5%", f"🚀 PnL: +{pnl_pct*100:.1f}%"))
+
+    return decision
+
+
+def classify_entry(rsi, ema, current_price, params=config):
+    """
+    Filtro dual do scan_market.
+    Retorna (conservative_ok, scalp_ok, status_reason).
+    """
+    conservative_ok = False
+    scalp_ok = False
+    status_reason = "WAIT"
+
+    # FILTRO 1: CONSERVATIVE (RSI < 23, segue EMA)
+    if rsi <= params.RSI_BUY_THRESHOLD:
+        conservative_ok = True
+        status_reason = "🛡️ CONSERVATIVE"
+
+        if ema and current_price < ema:
+            if rsi > 20:
+                conservative_ok = False
+                status_reason = "Downtrend"
+
+    # FILTRO 2: SCALP (RSI < 40, ignora EMA)
+    if params.SCALP_ENABLED and rsi <= params.SCALP_RSI_MAX:
+        scalp_ok = True
+        if not conservative_ok:  # Só marca como scalp se não for conservadora
+            status_reason = "⚡ SCALP"
+    elif rsi > params.RSI_BUY_THRESHOLD:
+        status_reason = f"RSI High ({rsi:.1f})"
+
+    return conservative_ok, scalp_ok, status_reason
+
+
+def wants_swap(strategy_type, rsi):
+    """Sistema Zombie: a oportunidade é boa o bastante para sacrificar uma posição?"""
+    return (strategy_type == 'CONSERVATIVE' and rsi < 20) or (strategy_type == 'SCALP' and rsi < 25)
+
+
+def zombie_min_hours(candidate_rsi):
+    """
+    Tempo mínimo de casa para uma posição virar zumbi.
+    Padrão: 2 horas de paciência. Urgência (RSI < 18): vende qualquer coisa negativa.
+    """
+    return 0.0 if candidate_rsi < 18.0 else 2.0
+
+
+def pick_zombie(holdings, candidate_rsi=100):
+    """
+    holdings: [(symbol, pnl_pct em %, horas de casa)]
+    Retorna o símbolo com PIOR PnL entre os que já cumpriram o tempo mínimo e estão no prejuízo.
+    """
+    min_hours = zombie_min_hours(candidate_rsi)
+    worst_symbol = None
+    worst_pnl = 0.0
+
+    for symbol, pnl_pct, duration in holdings:
+        # CRITÉRIO DE CORTE DINÂMICO:
+        # Se tem mais tempo que o minimo exigido E está no prejuízo
+        if duration >= min_hours and pnl_pct < -0.05: # -0.05% margem para não vender 0x0
+            # Queremos o PIOR desempenho para eliminar (Stop Loss tático)
+            if pnl_pct < worst_pnl:
+                worst_pnl = pnl_pct
+                worst_symbol = symbol
+
+    return worst_symbol
+
+
+# Custo mínimo operacional (Binance pede $5, usamos $5.5 para garantir taxas e flutuação)
+MIN_VIABLE_TRADE = 5.5
+
+
+def position_size(balance):
+    """
+    Gestão de capital para pequenas contas: abrir o máximo de posições possíveis.
+    Retorna o valor em USDT da compra, ou None se o saldo não comporta um trade.
+    """
+    if balance < MIN_VIABLE_TRADE:
+        return None
+
+    # Definimos o valor da compra.
+    amount = MIN_VIABLE_TRADE
+
+    # Trava de segurança: Se o saldo for tipo $5.80, usa tudo ($5.80) em vez de tentar guardar $0.30
+    if balance < (MIN_VIABLE_TRADE * 1.5):
+        amount = balance
+
+    # Arredonda para 2 casas para evitar erros de precisão na API
+    return round(amount - 0.1, 2) # Tira 10 centavos para garantir que não vai faltar taxa
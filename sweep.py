@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import config
+from backtest import Backtester, make_params, load_dataset
+
+# ==============================================================================
+# 🔬 OTIMIZADOR DE PARÂMETROS (grid / busca aleatória)
+# Cada configuração roda o Backtester (mesmas regras do bot) num pool de processos.
+# O dataset vai uma única vez para memória compartilhada: os workers só mapeiam os arrays.
+# Cada resultado é gravado assim que termina (results.jsonl, chave = hash dos parâmetros),
+# então um sweep interrompido continua de onde parou.
+# ==============================================================================
+
+RESULTS_FILE = 'results.jsonl'
+PARQUET_FILE = 'runs.parquet'
+
+# Arrays do dataset no worker (views sobre a memória compartilhada)
+_worker = {}
+
+
+# --- Espaço de busca ---
+def grid(space):
+    """{'RSI_BUY_THRESHOLD': [20, 23, 25], ...} -> todas as combinações"""
+    keys = sorted(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_search(space, n, seed=42):
+    """
+    Sorteia `n` configurações. Lista = escolha entre valores; tupla (min, max) = uniforme
+    (inteiros se os dois limites forem int). Sorteios repetidos são descartados.
+    """
+    rng = random.Random(seed)
+    keys = sorted(space)
+    seen, configs = set(), []
+    for _ in range(n * 20):
+        if len(configs) >= n: break
+        overrides = {}
+        for k in keys:
+            values = space[k]
+            if isinstance(values, tuple):
+                lo, hi = values
+                overrides[k] = rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else round(rng.uniform(lo, hi), 6)
+            else:
+                overrides[k] = rng.choice(values)
+        h = param_hash(overrides)
+        if h not in seen:
+            seen.add(h)
+            configs.append(overrides)
+    return configs
+
+
+def param_hash(overrides, salt=''):
+    """Hash estável dos parâmetros (+ identidade do dataset/saldo/taxa no salt)"""
+    payload = json.dumps(overrides, sort_keys=True, default=str) + salt
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+# --- Memória compartilhada ---
+def _share(arrays):
+    """Copia cada array para um bloco de memória compartilhada. Retorna (blocos, specs para os workers)."""
+    blocks, specs = [], {}
+    for name, arr in arrays.items():
+        arr = np.asarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        blocks.append(shm)
+        specs[name] = (shm.name, arr.shape, arr.dtype.str)
+    return blocks, specs
+
+
+def _init_worker(specs, symbols, interval, start_balance, fee):
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker[f"_{name}_shm"] = shm  # Mantém a referência viva enquanto o worker existir
+        _worker[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    _worker.update(symbols=symbols, interval=interval, start_balance=start_balance, fee=fee)
+
+
+def _run_one(h, overrides):
+    w = _worker
+    bt = Backtester(w['symbols'], w['times'], w['closes'], w['volumes'], w['interval'],
+                    make_params(**overrides), start_balance=w['start_balance'], fee=w['fee'])
+    return h, overrides, summarize(bt.run())
+
+
+def summarize(result):
+    """Linha plana (sem lista de trades) para a tabela/Parquet"""
+    row = {
+        'final_equity': result['final_equity'],
+        'return_pct': result['return_pct'],
+        'max_drawdown_pct': result['max_drawdown_pct'],
+        'trades': len(result['trades']),
+        'open_positions': len(result['open_positions']),
+        'elapsed': result['elapsed'],
+    }
+    for name, s in result['by_strategy'].items():
+        prefix = name.lower()
+        for key in ('trades', 'win_rate', 'pnl_usdt', 'avg_pnl_pct', 'max_drawdown_usdt'):
+            row[f"{prefix}_{key}"] = s[key]
+    return row
+
+
+# --- Cache / resultados ---
+def load_results(out_dir):
+    """{hash: {'hash', 'params', 'metrics'}} das rodadas já concluídas"""
+    path = os.path.join(out_dir, RESULTS_FILE)
+    done = {}
+    if not os.path.exists(path): return done
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # Linha cortada por uma interrupção no meio da escrita
+            done[rec['hash']] = rec
+    return done
+
+
+def write_parquet(records, out_dir):
+    import pandas as pd
+    rows = [{'hash': r['hash'], **r['params'], **r['metrics']} for r in records]
+    df = pd.DataFrame(rows)
+    path = os.path.join(out_dir, PARQUET_FILE)
+    df.to_parquet(path, engine='pyarrow', index=False)
+    return path
+
+
+def ranked(records, sort_by='return_pct', top=20):
+    reverse = sort_by != 'max_drawdown_pct'  # Drawdown: menor é melhor
+    return sorted(records, key=lambda r: r['metrics'][sort_by], reverse=reverse)[:top]
+
+
+def print_ranking(records, sort_by='return_pct', top=20):
+    print(f"\n🏆 TOP {top} por {sort_by}")
+    for pos, r in enumerate(ranked(records, sort_by, top), 1):
+        m = r['metrics']
+        params = ' '.join(f"{k}={v}" for k, v in sorted(r['params'].items()))
+        print(f"   {pos:>3}. {m['return_pct']:+7.2f}% | DD {m['max_drawdown_pct']:5.2f}% | "
+              f"{m['trades']:>5} trades | {params}")
+
+
+# --- Execução ---
+def run_sweep(dataset_dir, configs, out_dir=None, workers=None, start_balance=100.0, fee=None):
+    """Roda todas as configurações ainda não presentes no cache. Retorna todos os registros (antigos + novos)."""
+    out_dir = out_dir or config.SWEEP_RESULTS_DIR
+    workers = workers or config.SWEEP_WORKERS or os.cpu_count()
+    fee = config.BACKTEST_FEE if fee is None else fee
+    os.makedirs(out_dir, exist_ok=True)
+
+    symbols, times, closes, volumes, interval = load_dataset(dataset_dir)
+    salt = json.dumps([os.path.abspath(dataset_dir), list(closes.shape), start_balance, fee])
+
+    done = load_results(out_dir)
+    pending = {}
+    for overrides in configs:
+        make_params(**overrides)  # Valida os nomes antes de subir o pool
+        h = param_hash(overrides, salt)
+        if h not in done:
+            pending[h] = overrides
+    print(f"🔬 Sweep: {len(configs)} configurações | {len(configs) - len(pending)} em cache | "
+          f"{len(pending)} para rodar em {workers} processos")
+
+    if pending:
+        blocks, specs = _share({'times': times, 'closes': closes, 'volumes': volumes})
+        del closes, volumes
+        started = time.time()
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(specs, symbols, interval, start_balance, fee)) as pool, \
+                 open(os.path.join(out_dir, RESULTS_FILE), 'a') as out:
+                futures = [pool.submit(_run_one, h, o) for h, o in pending.items()]
+                for n, future in enumerate(as_completed(futures), 1):
+                    h, overrides, metrics = future.result()
+                    rec = {'hash': h, 'params': overrides, 'metrics': metrics}
+                    out.write(json.dumps(rec) + '\n')
+                    out.flush()  # Cada resultado já fica salvo para o resume
+                    done[h] = rec
+                    print(f"   [{n}/{len(pending)}] {metrics['return_pct']:+7.2f}% | "
+                          f"{(time.time() - started) / n:.1f}s/config | {overrides}")
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    wanted = {param_hash(o, salt) for o in configs}
+    records = [rec for h, rec in done.items() if h in wanted]
+    if records:
+        print(f"💾 Parquet: {write_parquet(records, out_dir)} ({len(records)} rodadas)")
+    return records
+
+
+def _parse_space(args, sampled):
+    """
+    CHAVE=v1,v2,v3 -> lista de valores; CHAVE=min:max (só na busca aleatória) -> intervalo.
+    Valores em JSON quando possível (25, 0.03, true).
+    """
+    def value(text):
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+    space = {}
+    for arg in args:
+        key, spec = arg.split('=', 1)
+        if sampled and ':' in spec:
+            lo, hi = spec.split(':', 1)
+            space[key] = (value(lo), value(hi))
+        else:
+            space[key] = [value(v) for v in spec.split(',')]
+    return space
+
+
+if __name__ == "__main__":
+    # Uso:
+    #   python sweep.py DATASET grid RSI_BUY_THRESHOLD=20,23,25 SCALP_RSI_MAX=35,40
+    #   python sweep.py DATASET random 500 RSI_BUY_THRESHOLD=18:28 LADDER_1_STOP=0.01:0.03
+    parser = argparse.ArgumentParser(description="Sweep de parâmetros sobre o backtester")
+    parser.add_argument('dataset', help="Diretório criado por backtest.py download")
+    parser.add_argument('mode', choices=['grid', 'random'])
+    parser.add_argument('space', nargs='+', help="[N] CHAVE=valores ...")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sort', default='return_pct')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.mode == 'grid':
+        configs = grid(_parse_space(args.space, sampled=False))
+    else:
+        if not args.space[0].isdigit():
+            parser.error("busca aleatória: informe a quantidade antes do espaço (ex: random 500 ...)")
+        configs = random_search(_parse_space(args.space[1:], sampled=True), int(args.space[0]), args.seed)
+
+    records = run_sweep(args.dataset, configs, out_dir=args.out, workers=args.workers)
+    if not records:
+        sys.exit(1)
+    print_ranking(records, args.sort, args.top)
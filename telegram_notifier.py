@@ -1,16 +1,58 @@
 import requests
 import logging
 import time
+import heapq
+import atexit
+import itertools
+import threading
 from typing import Optional
+import config
+from metrics import metrics
 
 # Configuração de Logs específica para este módulo
 logger = logging.getLogger(__name__)
 
+# Prioridades da fila (menor = mais importante)
+PRIORITY_HIGH = 0    # Compras e vendas
+PRIORITY_NORMAL = 1  # Mensagens gerais
+PRIORITY_LOW = 2     # Alertas informativos (PnL)
+
+TELEGRAM_MAX_LENGTH = 4096  # Em unidades UTF-16 (cada emoji conta 2)
+DIGEST_HEADER = "📬 **Resumo ({count} alertas)**\n\n"
+DIGEST_SEPARATOR = "\n\n〰️〰️〰️\n\n"
+
+
+def _tg_len(text):
+    """Tamanho do texto como o Telegram conta (unidades UTF-16)."""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _split_message(message):
+    """Quebra uma mensagem longa em partes que cabem no Telegram, sempre entre linhas (não corta um `**` no meio)."""
+    if _tg_len(message) <= TELEGRAM_MAX_LENGTH:
+        return [message]
+    parts, current = [], ""
+    for line in message.split("\n"):
+        # Linha sozinha maior que o limite: fatia em pedaços seguros (2 unidades UTF-16 por caractere no pior caso)
+        pieces = [line[i:i + TELEGRAM_MAX_LENGTH // 2] for i in range(0, len(line), TELEGRAM_MAX_LENGTH // 2)] or [""]
+        for piece in pieces:
+            candidate = f"{current}\n{piece}" if current else piece
+            if current and _tg_len(candidate) > TELEGRAM_MAX_LENGTH:
+                parts.append(current)
+                candidate = piece
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
 class TelegramNotifier:
     def __init__(self, bot_token: str, chat_id: str):
         """
         Inicializa o notificador do Telegram.
-        
+        As mensagens vão para uma fila e são entregues por uma thread em segundo plano,
+        então o loop de trading nunca espera pela API do Telegram.
+
         Args:
             bot_token (str): O token gerado pelo @BotFather.
             chat_id (str): O ID numérico do seu usuário ou grupo.
@@ -18,50 +60,62 @@ class TelegramNotifier:
         self.base_url = f"https://api.telegram.org/bot{bot_token}"
         self.chat_id = chat_id
         self.disabled = False
-        
+
+        # Fila limitada com prioridade: (prioridade, sequência, mensagem)
+        self.max_queue = config.TELEGRAM_QUEUE_SIZE
+        self.coalesce_window = config.TELEGRAM_COALESCE_WINDOW
+        self.max_retries = config.TELEGRAM_MAX_RETRIES
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._stopping = False
+        self._worker = None
+        self.dropped = 0
+
         # Validação simples de inicialização
         if not bot_token or not chat_id:
             logger.warning("TelegramNotifier: Token ou Chat ID não configurados. Notificações desativadas.")
             self.disabled = True
         else:
-            # Tenta enviar mensagem de boas vindas para validar
-            try:
-                self.send_message("🤖 Bot de Trading Iniciado! Sistema de notificação online.")
-            except Exception as e:
-                logger.error(f"Erro ao inicializar Telegram: {e}")
-                self.disabled = True
+            self._worker = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+            self._worker.start()
+            atexit.register(self.close)
+            self.send_message("🤖 Bot de Trading Iniciado! Sistema de notificação online.")
 
-    def send_message(self, message: str) -> bool:
+    def send_message(self, message: str, priority: int = PRIORITY_NORMAL) -> bool:
         """
-        Envia uma mensagem de texto para o chat configurado.
-        Retorna True se sucesso, False caso contrário.
+        Enfileira uma mensagem de texto para o chat configurado (não bloqueia).
+        Retorna True se a mensagem entrou na fila, False se foi descartada.
         """
         if self.disabled:
             return False
 
-        url = f"{self.base_url}/sendMessage"
-        payload = {
-            "chat_id": self.chat_id,
-            "text": message,
-            "parse_mode": "Markdown" # Permite usar negrito, itálico, monospaced
-        }
-
-        try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            return True
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Falha ao enviar mensagem Telegram: {e}")
-            return False
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                # Fila cheia: descarta a de menor prioridade (a mais nova entre as piores)
+                worst = max(self._queue)
+                if worst[0] <= priority:
+                    self.dropped += 1
+                    logger.warning("Fila do Telegram cheia: mensagem descartada.")
+                    return False
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                self.dropped += 1
+                logger.warning("Fila do Telegram cheia: mensagem de baixa prioridade descartada.")
 
-    def send_alert(self, symbol: str, strategy: str, action: str, price: float, extra_info: str = ""):
+            heapq.heappush(self._queue, (priority, next(self._seq), message))
+            self._cond.notify()
+        return True
+
+    def send_alert(self, symbol: str, strategy: str, action: str, price: float, extra_info: str = "",
+                   priority: Optional[int] = None):
         """
         Formata um alerta padrão de trading e envia.
         Ex: 🚨 COMPRA DETECTADA: BTCUSDT
         """
         emoji = "🟢" if "BUY" in action.upper() else "🔴" if "SELL" in action.upper() else "⚠️"
-        
+
         formatted_msg = (
             f"{emoji} **SINAL DE {action.upper()}**\n\n"
             f"🪙 Ativo: `{symbol}`\n"
@@ -69,5 +123,124 @@ class TelegramNotifier:
             f"🧠 Estratégia: _{strategy}_\n"
             f"{extra_info}"
         )
-        
-        self.send_message(formatted_msg)
+
+        if priority is None:
+            priority = PRIORITY_HIGH if action.upper() in ("BUY", "SELL") else PRIORITY_LOW
+
+        self.send_message(formatted_msg, priority)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Espera a fila esvaziar (útil em scripts e no encerramento)."""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._queue or self._inflight:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Entrega o que der dentro do timeout e encerra a thread."""
+        if not self._worker: return
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    # --- Entrega em segundo plano ---
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+
+            # Janela curta para juntar rajadas (ex: várias vendas no mesmo ciclo) em um resumo
+            time.sleep(self.coalesce_window)
+
+            with self._cond:
+                batch = self._take_batch()
+                self._inflight = len(batch)
+
+            try:
+                self._send_batch(batch)
+            except Exception as e:
+                # Qualquer erro inesperado (JSON estranho, retry_after inválido) perde só este lote, nunca a thread
+                logger.error(f"Erro inesperado ao enviar lote do Telegram ({len(batch)} mensagens): {e}")
+            finally:
+                with self._cond:
+                    self._inflight = 0
+                    self._cond.notify_all()
+
+    def _take_batch(self):
+        """Retira mensagens em ordem de prioridade enquanto o resumo inteiro couber no limite do Telegram."""
+        batch, size = [], _tg_len(DIGEST_HEADER.format(count=len(self._queue)))
+        while self._queue:
+            message = self._queue[0][2]
+            extra = _tg_len(message) + (_tg_len(DIGEST_SEPARATOR) if batch else 0)
+            if batch and size + extra > TELEGRAM_MAX_LENGTH:
+                break
+            heapq.heappop(self._queue)
+            batch.append(message)
+            size += extra
+        return batch
+
+    @staticmethod
+    def _format_batch(batch):
+        if len(batch) == 1:
+            return batch[0]
+        return DIGEST_HEADER.format(count=len(batch)) + DIGEST_SEPARATOR.join(batch)
+
+    def _send_batch(self, batch):
+        """Envia o lote como um resumo; se o Telegram recusar (4xx), reenvia mensagem por mensagem."""
+        if len(batch) > 1:
+            if self._deliver(self._format_batch(batch)) is not None:
+                return
+            logger.warning(f"Telegram recusou o resumo de {len(batch)} alertas: reenviando um a um")
+
+        for message in batch:
+            for part in _split_message(message):
+                if self._deliver(part) is None:
+                    # Markdown inválido nesta mensagem: manda como texto puro em vez de perder
+                    self._deliver(part, parse_mode=None)
+
+    def _deliver(self, message: str, parse_mode: Optional[str] = "Markdown") -> Optional[bool]:
+        """
+        Envia de fato, com retry exponencial e respeito ao retry_after do 429.
+        Retorna True se entregou, False se esgotou as tentativas e None se o Telegram recusou (4xx).
+        """
+        url = f"{self.base_url}/sendMessage"
+        payload = {"chat_id": self.chat_id, "text": message}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode # Permite usar negrito, itálico, monospaced
+
+        delay = 1.0
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                started = time.perf_counter()
+                response = requests.post(url, json=payload, timeout=10)
+                metrics.observe('telegram_send_seconds', time.perf_counter() - started)
+
+                if response.status_code == 429:
+                    retry_after = response.json().get('parameters', {}).get('retry_after', delay)
+                    logger.warning(f"Telegram 429: aguardando {retry_after}s")
+                    time.sleep(float(retry_after))
+                    continue
+
+                if 400 <= response.status_code < 500:
+                    # Erro do pedido (ex: Markdown inválido): repetir não resolve
+                    logger.error(f"Telegram recusou a mensagem [{response.status_code}]: {response.text}")
+                    return None
+
+                response.raise_for_status()
+                return True
+
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Falha ao enviar mensagem Telegram (tentativa {attempt}): {e}")
+
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+        return False
@@ -6,58 +6,113 @@ import config
 # Configuração de Logs
 logger = logging.getLogger(__name__)
 
+
+def summarize_order(symbol, order):
+    """
+    Execução real de uma ordem a mercado (resposta FULL do /api/v3/order):
+    preço médio, qty base, USDT movimentado e comissões por fill.
+    Retorna None se a resposta não trouxer a execução (ex: status NEW sem fills).
+    """
+    if not order or not float(order.get('executedQty', 0) or 0):
+        return None
+    base = symbol[:-len(config.SYMBOL_QUOTE)]
+    qty = float(order['executedQty'])
+    quote_qty = float(order['cummulativeQuoteQty'])
+    price = quote_qty / qty
+
+    fills = [{
+        'price': float(f['price']),
+        'qty': float(f['qty']),
+        'commission': float(f['commission']),
+        'commission_asset': f['commissionAsset'],
+    } for f in order.get('fills', [])]
+    if not fills:
+        fills = [{'price': price, 'qty': qty, 'commission': 0.0, 'commission_asset': config.SYMBOL_QUOTE}]
+
+    base_fee = sum(f['commission'] for f in fills if f['commission_asset'] == base)
+    quote_fee = sum(f['commission'] for f in fills if f['commission_asset'] == config.SYMBOL_QUOTE)
+    return {
+        'order_id': order.get('orderId'),
+        'qty': qty,
+        'quote_qty': quote_qty,
+        'price': price,
+        'base_fee': base_fee,
+        'quote_fee': quote_fee,
+        'fees_usdt': quote_fee + base_fee * price,  # Comissão em BNB fica só no ledger
+        'fills': fills,
+    }
+
+
 class TradeExecutor:
-    def __init__(self, api_client, db_manager, notifier):
+    def __init__(self, api_client, db_manager, notifier, prices=None, filters=None, account=None):
         self.api = api_client
         self.db = db_manager
         self.notifier = notifier
+        self.prices = prices # PriceSnapshot compartilhado (opcional)
+        self.filters = filters # SymbolFilters: normaliza quantidade sem chamar exchangeInfo
+        self.account = account # AccountState: saldo local da conta (sem ele, consulta /account a cada venda)
 
     def sell_position(self, symbol, reason):
         """
         Executa a venda de uma posição:
         1. Verifica saldo na Binance
-        2. Normaliza quantidade (Step Size)
+        2. Normaliza quantidade (Step Size); abaixo do minQty/minNotional encerra como poeira
         3. Envia ordem de venda
-        4. Calcula PnL
+        4. Calcula PnL realizado pelos fills da ordem (sem consultar preço de novo)
         5. Notifica Telegram
-        6. Remove do Banco de Dados
+        6. Remove do Banco de Dados + grava o trade fechado
         """
         print(f"   ⚠️ Tentando vender {symbol} ({reason})...")
         
         # 1. Recupera Saldo Bruto
         asset_name = symbol.replace(config.SYMBOL_QUOTE, '')
         balance = 0.0
+        data = self.db.data['active_positions'].get(symbol)
+        fill = None
         
         if not config.SIMULATION_MODE:
-            acc = self.api.get_account()
-            
-            if not acc:
+            balance = self._free_balance(asset_name)
+            if balance is None:
                 print(f"   ❌ Erro de Conexão ao verificar saldo de {symbol}.")
                 return False
 
-            for b in acc['balances']:
-                if b['asset'] == asset_name:
-                    balance = float(b['free'])
-                    break
+            if balance == 0 and self.account:
+                # Confirma na Binance antes de apagar a posição (o estado local pode estar velho)
+                if not self.account.refresh():
+                    print(f"   ❌ Erro de Conexão ao confirmar saldo de {symbol}.")
+                    return False
+                balance = self.account.free(asset_name)
             
             if balance == 0:
                 print(f"   ⚠️ Alerta: Saldo de {symbol} é zero na Binance. Removendo do registro local.")
                 self.db.remove_position(symbol)
                 return True # Considera "resolvido" pois removeu do DB
 
-            # 2. Normalização de Quantidade
-            step_size = self.api.get_symbol_step_size(symbol)
-            qty_to_sell = balance
-            
+            # Só a quantidade da posição (moedas fora do bot ficam na conta)
+            if data and data.get('base_qty'):
+                balance = min(balance, data['base_qty'])
+
+            # 2. Normalização de Quantidade (índice local; sem ele, consulta o exchangeInfo do par)
+            if self.filters:
+                step_size = self.filters.step_size(symbol)
+                qty_to_sell = self.filters.normalize_qty(symbol, balance)
+            else:
+                step_size = self.api.get_symbol_step_size(symbol)
+                qty_to_sell = balance
+                if step_size:
+                    precision = int(round(-math.log(step_size, 10), 0))
+                    qty_to_sell = math.floor(balance / step_size) * step_size
+                    qty_to_sell = round(qty_to_sell, precision)
+
             if step_size:
-                precision = int(round(-math.log(step_size, 10), 0))
-                qty_to_sell = math.floor(balance / step_size) * step_size
-                qty_to_sell = round(qty_to_sell, precision)
                 print(f"   📐 Ajuste de Precisão: {balance} -> {qty_to_sell} (Step: {step_size})")
             
-            if qty_to_sell == 0:
-                print("   ❌ Saldo insuficiente após ajuste de precisão.")
-                return False
+            # Abaixo do LOT_SIZE/NOTIONAL a Binance rejeita a ordem: encerra como poeira em vez de tentar a cada ciclo
+            if self._is_dust(symbol, qty_to_sell):
+                print(f"   🧹 {symbol}: {qty_to_sell} abaixo do mínimo do par. Encerrando como poeira (saldo fica na conta).")
+                trade = self._realized(symbol, data, None, f"POEIRA ({reason})") if data else None
+                self.db.remove_position(symbol, trade)
+                return True
 
             # 3. Envia Ordem
             params = {
@@ -72,25 +127,23 @@ class TradeExecutor:
             if not res or 'status' not in res or res['status'] not in ['FILLED', 'NEW']:
                 print(f"   ❌ FALHA CRÍTICA NA VENDA DE {symbol}!")
                 if res: print(f"   🔍 Resposta da API: {res}")
+                if self.account: self.account.invalidate()
                 return False
 
+            if self.account:
+                self.account.apply_fill(symbol, 'SELL', res)
+
+            fill = summarize_order(symbol, res)
+            if fill:
+                self.db.record_executions(symbol, 'SELL', fill)
+
             print(f"   ✅ Venda Confirmada na Binance: {res.get('orderId')}")
 
         # 4. PnL Realizado & Notificação
-        # Recupera dados ANTES de remover
-        data = self.db.data['active_positions'].get(symbol)
-        current_price = self.api.get_price(symbol) or 0.0
-        
+        trade = None
         if data:
-            buy_price = data['buy_price']
-            amount_usdt = data['amount_usdt']
-            
-            # Se for simulação ou se não conseguimos pegar preço atual, usa o do DB ou 0
-            # Na verdade, se vendeu a mercado, o preço exato vem da ordem, mas aqui simplificamos usando o ticker atual
-            
-            profit_usd = 0.0
-            if buy_price > 0:
-                profit_usd = amount_usdt * ((current_price - buy_price) / buy_price)
+            trade = self._realized(symbol, data, fill, reason)
+            profit_usd = trade['pnl_usdt']
             
             print(f"   💰 VENDIDO: {symbol} | Lucro: ${profit_usd:.2f} | Motivo: {reason}")
             
@@ -100,10 +153,69 @@ class TradeExecutor:
                     symbol, 
                     "Trailing Stop / Manual", 
                     "SELL", 
-                    current_price, 
+                    trade['sell_price'], 
                     f"💰 Lucro: ${profit_usd:.2f}\n📝 Motivo: {reason}"
                 )
         
-        # 5. Remove do DB
-        self.db.remove_position(symbol)
+        # 5. Remove do DB (e grava o trade no mesmo commit)
+        self.db.remove_position(symbol, trade)
         return True
+
+    def _realized(self, symbol, data, fill, reason):
+        """PnL realizado: custo da compra vs USDT líquido recebido na venda"""
+        cost = data['amount_usdt']
+        qty = data.get('base_qty') or (cost / data['buy_price'] if data['buy_price'] else 0.0)
+
+        if fill:
+            sell_price = fill['price']
+            qty = fill['qty']
+            proceeds = fill['quote_qty'] - fill['quote_fee']
+            fees = fill['fees_usdt']
+        else:
+            # Simulação (ou ordem sem fills na resposta): marca pelo preço atual
+            if self.prices:
+                sell_price = self.prices.get(symbol) or 0.0
+            else:
+                sell_price = self.api.get_price(symbol) or 0.0
+            proceeds = qty * sell_price
+            fees = 0.0
+
+        # Comissão da compra entra no total do trade (no PnL ela já pesa: a Binance cobra a compra em moedas, base_qty menor)
+        fees += data.get('entry_fee_usdt') or 0.0
+        pnl = proceeds - cost
+        return {
+            'strategy_type': data.get('strategy_type', 'CONSERVATIVE'),
+            'opened_at': data.get('entry_time', ''),
+            'buy_price': data['buy_price'],
+            'sell_price': sell_price,
+            'base_qty': qty,
+            'cost_usdt': cost,
+            'proceeds_usdt': proceeds,
+            'fees_usdt': fees,
+            'pnl_usdt': pnl,
+            'pnl_pct': (pnl / cost * 100) if cost else 0.0,
+            'reason': reason,
+        }
+
+    def _is_dust(self, symbol, qty):
+        """Quantidade zero ou abaixo do minQty / minNotional do par (índice local; sem preço, só o minQty conta)."""
+        if qty <= 0: return True
+        if not self.filters: return False
+        if qty < self.filters.min_qty(symbol): return True
+        price = self.prices.get(symbol) if self.prices else self.api.get_price(symbol)
+        return bool(price) and qty * price < self.filters.min_notional(symbol)
+
+    def _free_balance(self, asset):
+        """Saldo livre do ativo (estado local da conta se houver). None se a Binance não respondeu."""
+        if self.account:
+            if not self.account.loaded and not self.account.refresh():
+                return None
+            return self.account.free(asset)
+
+        acc = self.api.get_account()
+        if not acc:
+            return None
+        for b in acc['balances']:
+            if b['asset'] == asset:
+                return float(b['free'])
+        return 0.0
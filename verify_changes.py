@@ -1,9 +1,11 @@
 import os
+import random
 import sqlite3
 import config
 from trade_executor import TradeExecutor
 from main import BotController
 from api import app
+from indicators import IndicatorState, IndicatorEngine
 
 def verify():
     print("🔍 Verifying Codebase Optimization...")
@@ -38,5 +40,393 @@ def verify():
     except Exception as e:
         print(f"   ❌ DB Check Failed: {e}")
 
+def verify_indicators(runs=300, seed=42):
+    """Propriedade: o motor incremental bate bit a bit com as funções escalares do BotController."""
+    rng = random.Random(seed)
+    for _ in range(runs):
+        n = rng.randint(1, 160)
+        price = rng.uniform(0.0001, 50000)
+        prices, volumes = [], []
+        for _ in range(n):
+            # Inclui velas paradas (delta 0) e volumes zerados
+            if rng.random() > 0.1:
+                price = max(price * (1 + rng.gauss(0, 0.02)), 1e-8)
+            prices.append(price)
+            volumes.append(0.0 if rng.random() < 0.05 else rng.uniform(0, 1e6))
+
+        state = IndicatorState()
+        for p, v in zip(prices[:-1], volumes[:-1]):
+            state.update(p, v)
+
+        expected = (
+            BotController.calculate_rsi(None, prices),
+            BotController.calculate_ema(None, prices, period=100),
+            BotController.calculate_rvol(None, volumes),
+        )
+        if state.provisional(prices[-1], volumes[-1]) != expected:
+            print(f"   ❌ Indicadores divergentes (provisório) para n={n}")
+            return False
+
+        state.update(prices[-1], volumes[-1])
+        if state.values() != expected:
+            print(f"   ❌ Indicadores divergentes (fechado) para n={n}")
+            return False
+
+    # Motor aquecido: janela de 110 velas deslizando a cada scan (como o KlineCache entrega)
+    engine = IndicatorEngine(max_symbols=1)
+    closes, volumes, price = [], [], 100.0
+    for _ in range(400):
+        price = max(price * (1 + rng.gauss(0, 0.02)), 1e-8)
+        closes.append(price)
+        volumes.append(rng.uniform(0, 1e6))
+    for end in range(110, 400):
+        for partial in (0.99, 1.01):  # Dois scans na mesma vela (estado reaproveitado)
+            window = [(t * 3_600_000, c, v) for t, c, v in zip(range(end - 110, end), closes[end - 110:end], volumes[end - 110:end])]
+            window[-1] = (window[-1][0], window[-1][1] * partial, window[-1][2])
+            prices = [c for _, c, _ in window]
+            expected = (
+                BotController.calculate_rsi(None, prices),
+                BotController.calculate_ema(None, prices, period=100),
+                BotController.calculate_rvol(None, [v for _, _, v in window]),
+            )
+            if engine.sync('XUSDT', window) != expected:
+                print(f"   ❌ Motor aquecido divergiu da janela após {end - 110} velas novas")
+                return False
+        if end == 250:
+            engine.sync('YUSDT', window)  # Evicção do LRU no meio do caminho
+
+    print(f"   ✅ Motor incremental idêntico às funções escalares ({runs} séries aleatórias + 290 scans com janela deslizante)")
+    return True
+
+def verify_backtest_indicators(runs=20, seed=7):
+    """Propriedade: RSI/EMA do backtester batem bit a bit com o IndicatorEngine sobre a janela que o scanner buscaria."""
+    import numpy as np
+    from backtest import Backtester
+
+    rng = random.Random(seed)
+    window = config.KLINE_LIMIT - 1  # Velas fechadas da série (a última é a vela em formação)
+    for _ in range(runs):
+        n = rng.randint(config.KLINE_LIMIT + 20, 400)
+        rows = []
+        for _ in range(2):
+            price = rng.uniform(0.0001, 50000)
+            row = []
+            for _ in range(n):
+                price = max(price * (1 + rng.gauss(0, 0.02)), 1e-8)
+                row.append(price)
+            rows.append(row)
+        listed = rng.randint(1, n - 20)  # Segundo par listado no meio do histórico
+        rows[1][:listed] = [float('nan')] * listed
+
+        times = np.arange(n, dtype=np.int64) * 3_600_000
+        bt = Backtester(['XUSDT', 'YUSDT'], times, np.array(rows), np.ones((2, n)), interval='1h')
+
+        for prev in rng.sample(range(n - 1), 15):
+            current = [r[prev] * (1 + rng.gauss(0, 0.01)) for r in rows]
+            rsi, ema = bt._provisional(np.array([0, 1]), prev, np.array(current))
+            for i, row in enumerate(rows):
+                start = max(0, prev - window + 1, listed if i else 0)
+                if start > prev: continue
+                series = [(int(times[j]), row[j], 1.0) for j in range(start, prev + 1)]
+                series.append((int(times[prev + 1]), current[i], 1.0))
+                expected_rsi, expected_ema, _ = IndicatorEngine().sync('X', series)
+                got = (rsi[i] if rsi[i] == rsi[i] else None, ema[i] if ema[i] == ema[i] else None)
+                if got != (expected_rsi, expected_ema):
+                    print(f"   ❌ Backtester divergente do IndicatorEngine (n={n}, vela={prev}, par={i}): {got} != {(expected_rsi, expected_ema)}")
+                    return False
+
+    print(f"   ✅ Indicadores do backtester idênticos ao IndicatorEngine ({runs} séries > KLINE_LIMIT)")
+    return True
+
+def verify_rate_limiter():
+    """BinanceClient + RateLimiter contra um servidor mock local (headers de peso, 429 + Retry-After, prioridades)."""
+    import json
+    import time
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from binance_api import BinanceClient
+    from rate_limiter import RateLimiter, PRIORITY_EXIT, PRIORITY_SCAN
+
+    state = {'used': 0, 'ban': False}
+
+    class MockBinance(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if state['ban']:
+                state['ban'] = False
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.end_headers()
+                return
+            state['used'] += 2
+            body = json.dumps({'serverTime': int(time.time() * 1000), 'symbol': 'BTCUSDT', 'price': '1.0'}).encode()
+            self.send_response(200)
+            self.send_header('X-MBX-USED-WEIGHT-1m', str(state['used']))
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args): pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockBinance)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    limiter = RateLimiter(limit=100, reserves={'exit': 0.0, 'normal': 0.1, 'scan': 0.4},
+                          max_wait={'exit': 5, 'normal': 2, 'scan': 0.1})
+    client = BinanceClient(base_url=f"http://127.0.0.1:{server.server_port}", limiter=limiter)
+
+    ok = True
+    client.get_price('BTCUSDT')
+    if limiter.server_used != state['used'] or limiter.tokens > 100 - state['used']:
+        print("   ❌ Limitador não sincronizou com X-MBX-USED-WEIGHT-1m"); ok = False
+
+    # Servidor diz que já gastamos quase tudo: scanner recua, saída ainda passa
+    state['used'] = 70
+    client.get_price('BTCUSDT')
+    with limiter.priority(PRIORITY_SCAN):
+        if limiter.available(PRIORITY_SCAN) != 0 or client.get_price('BTCUSDT') is not None:
+            print("   ❌ Scanner deveria ter sido barrado pela reserva"); ok = False
+    with limiter.priority(PRIORITY_EXIT):
+        if client.get_price('BTCUSDT') is None:
+            print("   ❌ Saída deveria ter passado"); ok = False
+
+    # 429 + Retry-After: a próxima chamada espera o tempo pedido
+    state['ban'] = True
+    client.get_price('BTCUSDT')
+    started = time.time()
+    with limiter.priority(PRIORITY_EXIT):
+        client.get_price('BTCUSDT')
+    if time.time() - started < 0.9:
+        print("   ❌ Retry-After ignorado"); ok = False
+
+    server.shutdown()
+    if ok:
+        print("   ✅ Limitador de peso respeita headers, Retry-After e prioridades (mock local)")
+    return ok
+
+def verify_async_client():
+    """AsyncBinanceClient contra um mock lento: klines concorrentes no pool keep-alive, mesmo resultado do cliente síncrono, timeout."""
+    import json
+    import time
+    import asyncio
+    import threading
+    from urllib.parse import urlparse, parse_qs
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from binance_api import BinanceClient
+    from async_binance_api import AsyncBinanceClient
+    from rate_limiter import RateLimiter, PRIORITY_EXIT, PRIORITY_SCAN
+
+    class MockBinance(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == '/api/v3/time':
+                payload = {'serverTime': int(time.time() * 1000)}
+            elif url.path == '/api/v3/klines':
+                time.sleep(0.2)  # Latência da Binance
+                seed = sum(map(ord, query['symbol'][0]))
+                payload = [[i * 3_600_000, "0", "0", "0", str(seed + i), "10"] for i in range(int(query['limit'][0]))]
+            else:
+                time.sleep(2)  # Endpoint travado
+                payload = {}
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Cliente já desistiu (timeout)
+
+        def log_message(self, *args): pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockBinance)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    limiter = RateLimiter(limit=6000)
+    symbols = [f"C{i}USDT" for i in range(10)]
+
+    async def scenario():
+        async with AsyncBinanceClient(base_url=base_url, limiter=limiter, timeout=1) as api:
+            started = time.time()
+            series = await asyncio.gather(*(api.get_klines_since(s, '1h', limit=50) for s in symbols))
+            elapsed = time.time() - started
+            timed_out = await api.get_ticker_24hr()
+
+            # Prioridade por task: uma task de saída não vaza para a task do scanner
+            async def seen(priority):
+                with limiter.priority(priority):
+                    await asyncio.sleep(0.01)
+                    return limiter.current_priority()
+            priorities = await asyncio.gather(seen(PRIORITY_EXIT), seen(PRIORITY_SCAN))
+        return series, elapsed, timed_out, priorities
+
+    series, elapsed, timed_out, priorities = asyncio.run(scenario())
+    sync_client = BinanceClient(base_url=base_url, limiter=limiter)
+    expected = [sync_client.get_klines_since(s, '1h', limit=50) for s in symbols]
+    server.shutdown()
+
+    ok = True
+    if series != expected:
+        print("   ❌ Cliente async divergiu do síncrono"); ok = False
+    if elapsed > 0.2 * len(symbols) / 2:
+        print(f"   ❌ Klines não rodaram em paralelo ({elapsed:.2f}s)"); ok = False
+    if timed_out is not None:
+        print("   ❌ Timeout por chamada não foi respeitado"); ok = False
+    if priorities != [PRIORITY_EXIT, PRIORITY_SCAN]:
+        print("   ❌ Prioridade vazou entre tasks"); ok = False
+    if ok:
+        print(f"   ✅ Cliente async: {len(symbols)} klines em {elapsed:.2f}s (sequencial ~{0.2 * len(symbols):.1f}s), timeout e prioridade por task")
+    return ok
+
+def verify_price_cache():
+    """PriceSnapshot single-flight: 20 leitores simultâneos com snapshot velho geram uma única busca."""
+    import time
+    import threading
+    from price_snapshot import PriceSnapshot
+
+    class SlowApi:
+        calls = 0
+        def get_all_prices(self):
+            SlowApi.calls += 1
+            time.sleep(0.2)
+            return {'BTCUSDT': 50000.0}
+        def get_price(self, symbol):
+            return None
+
+    snapshot = PriceSnapshot(SlowApi(), max_age=10)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(snapshot.get('BTCUSDT'))) for _ in range(20)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    ok = SlowApi.calls == 1 and seen == [50000.0] * 20
+    if ok:
+        print("   ✅ Cache de preços: 20 requests simultâneos, 1 chamada à Binance")
+    else:
+        print(f"   ❌ Cache de preços: {SlowApi.calls} chamadas, valores {set(seen)}")
+    return ok
+
+def verify_stream_replay(ticks=200):
+    """Replay local (serve_replay) -> PriceStreamEngine: saída que falha não é retentada a cada tick."""
+    import json
+    import time
+    import socket
+    import tempfile
+    import threading
+    from price_stream import PriceStreamEngine, WebSocketTransport, serve_replay
+
+    with socket.socket() as sock:  # Porta livre para o servidor de replay
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    path = os.path.join(tempfile.mkdtemp(), 'ticks.jsonl')
+    with open(path, 'w') as f:
+        for _ in range(ticks):  # bookTicker abaixo do stop do SCALP (-1%)
+            f.write(json.dumps({'stream': 'xusdt@bookTicker', 'data': {'s': 'XUSDT', 'b': '98.0', 'a': '98.1'}}) + '\n')
+    threading.Thread(target=serve_replay, args=(path, '127.0.0.1', port), daemon=True).start()
+
+    class Db:
+        position = {'buy_price': 100.0, 'highest_price': 100.0, 'strategy_type': 'SCALP'}
+        data = {'active_positions': {'XUSDT': position}}
+        def get_position(self, symbol): return self.position
+        def update_position_high(self, symbol, high): pass
+
+    attempts = []
+    def failing_exit(symbol, price, decision):
+        attempts.append(symbol)
+        return False  # Ex: quantidade abaixo do LOT_SIZE
+
+    engine = PriceStreamEngine(Db(), failing_exit, transport=WebSocketTransport(f"ws://127.0.0.1:{port}"), exit_retry=60)
+    engine.start()
+    deadline = time.time() + 10
+    while engine.ticks < ticks and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)  # Threads de saída terminam
+    engine.stop()
+
+    ok = engine.ticks == ticks and attempts == ['XUSDT']
+    if ok:
+        print(f"   ✅ Replay do stream: {ticks} ticks abaixo do stop, 1 tentativa de saída (falhou, aguardando retry)")
+    else:
+        print(f"   ❌ Replay do stream: {engine.ticks} ticks, {len(attempts)} tentativas de saída")
+    return ok
+
+def verify_reconcile():
+    """reconcile.diff: importa, limpa, corrige qty e ignora poeira / pares sem USDT, sem nenhuma chamada por ativo."""
+    from reconcile import diff
+
+    class Filters:
+        symbols = {'BTCUSDT': {}, 'ETHUSDT': {}, 'SHIBUSDT': {}, 'XRPUSDT': {}}
+        def is_trading(self, symbol): return symbol in self.symbols
+
+    balances = {
+        'USDT': {'free': 90.0, 'locked': 10.0},
+        'BTC': {'free': 0.01, 'locked': 0.0},
+        'ETH': {'free': 0.5, 'locked': 0.0},
+        'LDBTC': {'free': 1.0, 'locked': 0.0},    # Sem par USDT (-1121 no sync antigo)
+        'SHIB': {'free': 10.0, 'locked': 0.0},    # Poeira
+    }
+    prices = {'BTCUSDT': 50000.0, 'ETHUSDT': 2000.0, 'SHIBUSDT': 0.00001, 'XRPUSDT': 0.5}
+    positions = {'ETHUSDT': {'base_qty': 1.0}, 'XRPUSDT': {'base_qty': 20.0}}
+
+    plan = diff(balances, prices, Filters(), positions, dust=1.0)
+    ok = (list(plan['imports']) == ['BTCUSDT'] and plan['removals'] == ['XRPUSDT']
+          and plan['qty_updates'] == {'ETHUSDT': 0.5} and abs(plan['equity'] - 1600.0) < 1e-9)
+
+    # Saldo sem preço no snapshot não é "fora da conta": a posição fica
+    positions['BTCUSDT'] = {'base_qty': 0.01, 'buy_price': 40000.0}
+    del prices['BTCUSDT']
+    plan = diff(balances, prices, Filters(), positions, dust=1.0)
+    ok = ok and 'BTCUSDT' not in plan['removals'] and abs(plan['equity'] - 1500.0) < 1e-9
+    if ok:
+        print("   ✅ Reconciliação: 1 import, 1 limpeza, 1 ajuste de qty, poeira e LD* ignorados, sem preço não apaga")
+    else:
+        print(f"   ❌ Reconciliação: plano inesperado {plan}")
+    return ok
+
+def verify_dust_sell():
+    """sell_position: quantidade abaixo do minQty/minNotional encerra a posição como poeira sem enviar ordem (com a comissão da compra no trade)."""
+    from exchange_info import SymbolFilters
+
+    class Api:
+        sent = []
+        def get_account(self): return {'balances': [{'asset': 'XRP', 'free': '3.0'}]}
+        def get_price(self, symbol): return 0.5
+        def _send(self, *args, **kwargs):
+            self.sent.append(args)
+
+    class Db:
+        removed = []
+        data = {'active_positions': {'XRPUSDT': {'buy_price': 0.6, 'amount_usdt': 1.8, 'base_qty': 3.0, 'entry_fee_usdt': 0.002}}}
+        def remove_position(self, symbol, trade=None): self.removed.append((symbol, trade))
+
+    api, db = Api(), Db()
+    filters = SymbolFilters(api, cache_file=os.devnull)
+    filters.symbols = {'XRPUSDT': {'status': 'TRADING', 'step_size': 0.1, 'min_qty': 0.1, 'tick_size': 0.0001, 'min_notional': 5.0}}
+    simulation, config.SIMULATION_MODE = config.SIMULATION_MODE, False
+    try:
+        done = TradeExecutor(api, db, None, filters=filters).sell_position('XRPUSDT', 'TESTE')
+    finally:
+        config.SIMULATION_MODE = simulation
+
+    ok = (done and not api.sent and len(db.removed) == 1
+          and db.removed[0][1]['reason'] == 'POEIRA (TESTE)' and abs(db.removed[0][1]['proceeds_usdt'] - 1.5) < 1e-9
+          and db.removed[0][1]['fees_usdt'] == 0.002)  # Comissão da compra carregada na posição
+    if ok:
+        print("   ✅ Venda abaixo do mínimo: nenhuma ordem enviada, posição encerrada como poeira")
+    else:
+        print(f"   ❌ Venda abaixo do mínimo: enviadas={api.sent} removidas={db.removed}")
+    return ok
+
 if __name__ == "__main__":
     verify()
+    verify_indicators()
+    verify_backtest_indicators()
+    verify_rate_limiter()
+    verify_async_client()
+    verify_price_cache()
+    verify_stream_replay()
+    verify_reconcile()
+    verify_dust_sell()